@@ -9,19 +9,10 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-# from channels.auth import AuthMiddlewareStack
-from channels.routing import ProtocolTypeRouter, URLRouter
-from django.core.asgi import get_asgi_application   
-
-from .urls import websocket_urlpatterns
+from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings')
+# Read by settings to pick defaults that suit ASGI (see CONN_MAX_AGE)
+os.environ.setdefault('DJANGO_SERVER_INTERFACE', 'asgi')
 
 application = get_asgi_application()
-
-application = ProtocolTypeRouter(
-    {
-        "http": application,
-        "websocket": URLRouter(websocket_urlpatterns),
-    }
-)
@@ -12,8 +12,10 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from datetime import timedelta
 from decouple import config
+from celery.schedules import crontab
 
 
 
@@ -56,6 +58,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'store.profiling.RequestProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
 
     "corsheaders.middleware.CorsMiddleware",
@@ -86,7 +89,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'Backend.wsgi.application'
-# ASGI_APPLICATION = 'Backend.asgi.application'
+ASGI_APPLICATION = 'Backend.asgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -95,9 +98,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests under WSGI. Under ASGI (Backend.asgi sets
+        # DJANGO_SERVER_INTERFACE) sync work runs in short-lived executor threads, so a
+        # persistent connection would be opened per thread and never reused; default to 0 there
+        'CONN_MAX_AGE': config(
+            'DB_CONN_MAX_AGE', default=0 if config('DJANGO_SERVER_INTERFACE', default='wsgi') == 'asgi' else 600, cast=int,
+        ),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional read replica for list and search endpoints (store.db.ReadReplicaRouter). Locally this
+# is a second SQLite file refreshed from db.sqlite3 with `manage.py snapshot_replica`.
+DATABASE_REPLICA_ALIAS = 'replica'
+if config('DATABASE_REPLICA_NAME', default=''):
+    DATABASES[DATABASE_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': config('DATABASE_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['store.db.ReadReplicaRouter']
+
+# Applied to every new SQLite connection (store.db.configure_sqlite): WAL so readers and the
+# writer do not block each other, a 64 MB page cache and 256 MB of memory-mapped I/O
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
 
 # DATABASES = {
 #     'default': {
@@ -116,6 +147,83 @@ DATABASES = {
 
 
 
+# Cache
+# Local memory by default; point CACHE_BACKEND / CACHE_LOCATION at redis or memcached to share across workers
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='product-management'),
+    },
+    # Login attempt counters (account.api.throttles) must be shared by every web process or each
+    # one allows the full rate. The file cache is shared by the processes of one host without an
+    # extra service or queries on the primary database; point THROTTLE_CACHE_BACKEND at redis or
+    # memcached when the web processes run on several hosts.
+    'throttle': {
+        'BACKEND': config('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'product-management-throttle')),
+    },
+    # Change counters of cached JWT users (account.authentication). Every web process must see
+    # the same counters, or a deactivated or edited user is served from another worker's copy;
+    # a process-local backend fails the account.W001 check.
+    'user_versions': {
+        'BACKEND': config('USER_VERSION_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config(
+            'USER_VERSION_CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'product-management-user-versions'),
+        ),
+    },
+}
+
+STORE_CACHE_ALIAS = 'default'
+STORE_REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Background tasks
+# Set CELERY_BROKER_URL (e.g. redis://localhost:6379/0) and run `celery -A Backend worker` to use
+# celery workers. Without a broker, jobs run on a small thread pool inside the web process
+# (STORE_TASK_MODE = 'thread'); 'eager' runs them inline. Status, progress and results are
+# stored by django_celery_results in every mode.
+
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='')
+CELERY_RESULT_BACKEND = 'django-db'
+CELERY_RESULT_EXTENDED = True
+CELERY_TASK_TRACK_STARTED = True
+CELERY_TASK_STORE_EAGER_RESULT = True
+
+STORE_TASK_MODE = config('STORE_TASK_MODE', default='celery' if CELERY_BROKER_URL else 'thread')
+STORE_TASK_THREADS = config('STORE_TASK_THREADS', default=2, cast=int)
+
+# Periodic tasks for `celery -A Backend beat`; without beat, run `manage.py prune_tokens` from cron
+CELERY_BEAT_SCHEDULE = {
+    'prune-expired-tokens': {
+        'task': 'account.tasks.prune_tokens',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# POS sales posted within STORE_SALE_FLUSH_MS of each other (up to STORE_SALE_BATCH_SIZE) are
+# committed in one transaction with one stock decrement per product (store.sales.SaleBatcher)
+STORE_SALE_FLUSH_MS = config('STORE_SALE_FLUSH_MS', default=20, cast=int)
+STORE_SALE_BATCH_SIZE = config('STORE_SALE_BATCH_SIZE', default=200, cast=int)
+
+# Label sheets of up to STORE_LABEL_SHEET_SYNC_LABELS labels (products x copies) are rendered in the
+# request; larger ones are rendered by a background job, and more than STORE_LABEL_SHEET_MAX_LABELS
+# labels are refused. 24 labels fit on a page.
+STORE_LABEL_SHEET_SYNC_LABELS = config('STORE_LABEL_SHEET_SYNC_LABELS', default=240, cast=int)
+STORE_LABEL_SHEET_MAX_LABELS = config('STORE_LABEL_SHEET_MAX_LABELS', default=24000, cast=int)
+
+
+# Request profiling
+# 'request' profiles only requests sending `X-Profile: 1` or `?_profile=1`, 'always' profiles every
+# request and 'off' disables it. Profiled responses carry a Server-Timing header; per-process
+# rolling timings are served to admin users at store/profiling/stats/.
+
+STORE_PROFILING = config('STORE_PROFILING', default='request')
+STORE_PROFILING_WINDOW = config('STORE_PROFILING_WINDOW', default=200, cast=int)
+STORE_PROFILING_TOP_N = config('STORE_PROFILING_TOP_N', default=20, cast=int)
+
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -134,6 +242,20 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# New and upgraded hashes use PBKDF2 with PASSWORD_PBKDF2_ITERATIONS. Stored hashes with a different
+# iteration count or one of the older hashers below still verify and are re-hashed on the next login.
+
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=720000, cast=int)
+
+PASSWORD_HASHERS = [
+    'account.hashers.ConfiguredPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -185,10 +307,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
 
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'account.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5  ,
+    # Login attempts per username (account.api.throttles.LoginRateThrottle)
+    'DEFAULT_THROTTLE_RATES': {
+        'login': config('LOGIN_RATE_LIMIT', default='10/min'),
+    },
 }
 
 SIMPLE_JWT = {
@@ -222,7 +348,7 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "accounts.api.serializers.MyTokenObtainPairSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "account.api.serializers.MyTokenObtainPairSerializer",
     "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
@@ -230,6 +356,13 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# How CachedJWTAuthentication resolves request.user: 'cache' keeps recently seen users in a
+# per-process LRU keyed by user id and version, 'token' uses a TokenUser built from the token
+# claims without any lookup, 'db' queries the user on every request.
+JWT_USER_MODE = config('JWT_USER_MODE', default='cache')
+JWT_USER_CACHE_SIZE = config('JWT_USER_CACHE_SIZE', default=1024, cast=int)
+JWT_USER_CACHE_TIMEOUT = config('JWT_USER_CACHE_TIMEOUT', default=60, cast=int)
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWED_ORIGIN = '*'
 
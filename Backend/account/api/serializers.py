@@ -4,7 +4,6 @@ from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
 from rest_framework_simplejwt.tokens import RefreshToken, Token,AccessToken
 from django.contrib.auth import get_user_model
-from account.models import Order
 
 User = get_user_model()
 
@@ -14,8 +13,12 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user):
         token = super().get_token(user)
 
-        # Add custom claims
+        # Add custom claims; the user fields are also what a TokenUser reads (JWT_USER_MODE = 'token')
         token['first_name'] = user.first_name
+        token['username'] = user.get_username()
+        token['email'] = user.email
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
         # ...
         
         return token
@@ -0,0 +1,19 @@
+import hashlib
+
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+# Limits login attempts per username (rate: DEFAULT_THROTTLE_RATES['login']), so a burst against one
+# account is rejected before any user lookup or password hashing. Counters live in the 'throttle'
+# cache, which every process shares, so the limit holds across workers.
+class LoginRateThrottle(SimpleRateThrottle):
+    scope = 'login'
+    cache = caches['throttle']
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username:
+            return None
+        ident = hashlib.sha256(str(username).encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -1,3 +1,4 @@
+import logging
 import datetime
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
@@ -37,7 +38,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
 
+from django.contrib.auth.signals import user_login_failed
+from .serializers import MyTokenObtainPairSerializer
+from .throttles import LoginRateThrottle
+
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 
@@ -50,33 +56,34 @@ class generateKey:
 
 
 
+# Login makes one user query and one password check; check_password re-hashes the password when the
+# configured hasher or iteration count has changed. Attempts are rate limited per username.
 class UserLogin(APIView):
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request):
         try:
             username = request.data['username']
             password = request.data['password']
-            print(username, password)
 
         except KeyError:
             raise ParseError('All Fields Are Required')
 
-        if not User.objects.filter(username=username).exists():
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
             # raise AuthenticationFailed('Invalid Email Address')
             return Response({'detail': 'Email Does Not Exist'}, status=status.HTTP_403_FORBIDDEN)
 
-        if not User.objects.filter(username=username, is_active=True).exists():
+        if not user.is_active:
             raise AuthenticationFailed(
                 'You are blocked by admin ! Please contact admin')
 
-        user = authenticate(username=username, password=password)
-        if user is None:
+        if not user.check_password(password):
+            user_login_failed.send(sender=__name__, credentials={'username': username}, request=request)
             raise AuthenticationFailed('Invalid Password')
 
-        refresh = RefreshToken.for_user(user)
-        print(request.data)
-
-        refresh["first_name"] = str(user.first_name)
+        refresh = MyTokenObtainPairSerializer.get_token(user)
         # refresh["is_admin"] = str(user.is_superuser)
         
 
@@ -85,7 +92,6 @@ class UserLogin(APIView):
             'access': str(refresh.access_token),
             'isAdmin': user.is_superuser,
         }
-        print(content)
         return Response(content, status=status.HTTP_200_OK)
     
 
@@ -104,7 +110,7 @@ class LogoutView(APIView):
             return Response({"detail": "Successfully logged out."}, status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             # Log the exception for debugging purposes
-            print(f"Logout failed: {str(e)}")
+            logger.info("Logout failed: %s", e)
             return Response({"error": "Invalid token or token blacklisting failed."}, status=status.HTTP_401_UNAUTHORIZED)
 
 
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+# Cache alias holding the user versions; shared by every process (see account.checks)
+USER_VERSION_CACHE_ALIAS = 'user_versions'
+
+
+def _version_key(user_id):
+    return f'account:user-version:{user_id}'
+
+
+def user_version(user_id):
+    """
+    Change counter of one user row, kept in the shared 'user_versions' cache.
+
+    Like the store table versions, a missing counter starts from the clock so an evicted
+    counter never comes back at a value older entries were cached under.
+    """
+    cache = caches[USER_VERSION_CACHE_ALIAS]
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    cache = caches[USER_VERSION_CACHE_ALIAS]
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+class UserCache:
+    """
+    Per-process LRU of user rows keyed by ``(user_id, version)`` with a short TTL.
+
+    Only the row's field values are kept and every hit builds a new user instance from
+    them, so nothing one request sets on ``request.user`` (cached permissions, backend,
+    edited fields) leaks into another request, and concurrent requests never share one.
+
+    Saving or deleting a user moves its version, so every process misses on its next
+    request; the TTL bounds staleness if the shared counter is lost.
+    """
+
+    def __init__(self, size=1024, timeout=60):
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._users.get(key)
+            if entry is None:
+                return None
+            row, expires = entry
+            if expires < time.monotonic():
+                del self._users[key]
+                return None
+            self._users.move_to_end(key)
+        model, db, field_names, values = row
+        return model.from_db(db, field_names, values)
+
+    def set(self, key, user):
+        field_names = tuple(field.attname for field in user._meta.concrete_fields)
+        row = (type(user), user._state.db, field_names, tuple(getattr(user, name) for name in field_names))
+        with self._lock:
+            self._users[key] = (row, time.monotonic() + self.timeout)
+            self._users.move_to_end(key)
+            while len(self._users) > self.size:
+                self._users.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache(
+    size=getattr(settings, 'JWT_USER_CACHE_SIZE', 1024),
+    timeout=getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that avoids the per-request user query.
+
+    In 'cache' mode a request costs one cache read for the user's version instead of a
+    database query while the user is in ``user_cache``. In 'token' mode no lookup is made
+    at all and ``request.user`` is a TokenUser built from the token's claims (see
+    MyTokenObtainPairSerializer.get_token), so deactivation only takes effect when the
+    access token expires.
+    """
+
+    def get_user(self, validated_token):
+        mode = getattr(settings, 'JWT_USER_MODE', 'cache')
+        if mode == 'token':
+            if api_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken(_('Token contained no recognizable user identification'))
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        if mode != 'cache':
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        key = (user_id, user_version(user_id))
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        return user
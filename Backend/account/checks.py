@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from account.authentication import USER_VERSION_CACHE_ALIAS
+
+# Backends whose entries are only visible to the process that wrote them
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_user_version_cache(app_configs, **kwargs):
+    if getattr(settings, 'JWT_USER_MODE', 'cache') != 'cache':
+        return []
+    backend = settings.CACHES.get(USER_VERSION_CACHE_ALIAS, {}).get('BACKEND')
+    if backend is None:
+        return [Warning(
+            f"CACHES has no '{USER_VERSION_CACHE_ALIAS}' alias for the cached JWT user versions.",
+            hint="Add it, pointing at a cache every web process shares, or set JWT_USER_MODE to 'db'.",
+            id='account.W001',
+        )]
+    if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+        return [Warning(
+            f"CACHES['{USER_VERSION_CACHE_ALIAS}'] uses {backend}, which other processes cannot see; "
+            "a deactivated or edited user stays cached in them until JWT_USER_CACHE_TIMEOUT.",
+            hint='Use the file, database, redis or memcached cache backend.',
+            id='account.W001',
+        )]
+    return []
@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+# Same algorithm name as Django's PBKDF2 hasher, so existing hashes verify; hashes with another
+# iteration count report must_update and are re-hashed by check_password on the next login
+class ConfiguredPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
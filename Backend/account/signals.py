@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from account.authentication import bump_user_version
+
+User = get_user_model()
+
+
+# Cached JWT users are keyed by the user's version; move it on every committed change
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_cached_user_version(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: bump_user_version(user_id))
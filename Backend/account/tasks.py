@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from account.tokens import prune_expired_tokens
+
+
+# Scheduled through CELERY_BEAT_SCHEDULE; also runnable as `manage.py prune_tokens`
+@shared_task
+def prune_tokens():
+    return {'deleted': prune_expired_tokens()}
@@ -1,3 +1,143 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.api.serializers import MyTokenObtainPairSerializer
+from account.api.throttles import LoginRateThrottle
+from account.authentication import user_cache
+from account.checks import check_user_version_cache
+from account.tokens import prune_expired_tokens
+from store.tests import EndpointQueryTestCase
+
+# Query budgets for the auth endpoints; see store.tests for how they are measured
+ACCOUNT_QUERY_BUDGETS = {
+    'token_obtain_pair': 2,
+    'token_refresh': 6,
+    'user-login': 2,
+    'user-details': 0,
+    'logout': 6,
+}
+
+
+class AccountEndpointQueryTests(EndpointQueryTestCase):
+
+    def setUp(self):
+        # The throttle's file cache outlives a test, unlike the test database
+        caches['throttle'].clear()
+        super().setUp()
+
+    def test_account_endpoint_query_budgets(self):
+        self.assertQueryBudgets(ACCOUNT_QUERY_BUDGETS)
+
+    def test_every_account_endpoint_has_a_budget(self):
+        from account.api.urls import urlpatterns
+
+        self.assertEqual({pattern.name for pattern in urlpatterns} - set(ACCOUNT_QUERY_BUDGETS), set())
+
+
+class UserLoginTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        self.user = get_user_model().objects.create_user('cashier', password='old-password')
+
+    def login(self, password):
+        return self.client.post(
+            reverse('user-login'), {'username': 'cashier', 'password': password}, content_type='application/json',
+        )
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_login_rehashes_password_with_configured_iterations(self):
+        self.user.password = make_password('old-password', hasher='pbkdf2_sha1')
+        self.user.save(update_fields=['password'])
+
+        self.assertEqual(self.login('old-password').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    @mock.patch.object(LoginRateThrottle, 'THROTTLE_RATES', {'login': '3/min'})
+    def test_login_attempts_are_rate_limited_per_username(self):
+        for attempt in range(3):
+            self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login('old-password').status_code, 429)
+        # Counters are in the shared throttle cache, not in this process's default cache
+        cache.clear()
+        self.assertEqual(self.login('old-password').status_code, 429)
+
+
+class JWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = get_user_model().objects.create_user('manager', password='password', is_staff=True)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {MyTokenObtainPairSerializer.get_token(self.user).access_token}'}
+
+    def user_details(self):
+        return self.client.get(reverse('user-details'), **self.headers)
+
+    def test_cached_user_is_reloaded_after_the_user_changes(self):
+        self.assertEqual(self.user_details().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.user_details().status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.user_details().status_code, 401)
+
+    def test_a_version_bumped_by_another_process_reloads_the_user(self):
+        self.assertEqual(self.user_details().status_code, 200)
+        # Another worker deactivates the user: the row and the shared counter change, nothing in this process
+        get_user_model().objects.filter(id=self.user.id).update(is_active=False)
+        other_process = FileBasedCache(settings.CACHES['user_versions']['LOCATION'], {})
+        other_process.incr(f'account:user-version:{self.user.id}')
+        cache.clear()
+
+        self.assertEqual(self.user_details().status_code, 401)
+
+    def test_a_process_local_version_cache_is_reported(self):
+        caches_setting = {**settings.CACHES, 'user_versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=caches_setting):
+            self.assertEqual([warning.id for warning in check_user_version_cache(None)], ['account.W001'])
+        self.assertEqual(check_user_version_cache(None), [])
+
+    def test_each_request_gets_its_own_user_instance(self):
+        key = (self.user.id, 1)
+        user_cache.set(key, self.user)
+        first = user_cache.get(key)
+        first.username = 'changed by one request'
+        first._perm_cache = {'store.delete_product'}
+
+        second = user_cache.get(key)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.username, 'manager')
+        self.assertFalse(hasattr(second, '_perm_cache'))
+        self.assertFalse(second._state.adding)
+
+    @override_settings(JWT_USER_MODE='token')
+    def test_token_mode_reads_the_user_from_claims(self):
+        with self.assertNumQueries(0):
+            response = self.user_details()
+        self.assertEqual(response.json()['username'], 'manager')
+
+    def test_prune_tokens_deletes_expired_tokens_only(self):
+        RefreshToken.for_user(self.user).blacklist()
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(prune_expired_tokens(batch_size=1), 1)
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
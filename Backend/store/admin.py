@@ -1,7 +1,47 @@
 from django.contrib import admin
-from .models import Product, TotalStock
+from .models import Product, ProductInTransaction, ProductInTransactionDetail, TotalStock
 
-admin.site.register(Product)
-admin.site.register(TotalStock)
+
+# list_select_related keeps the changelists at one query per page: __str__ and the
+# related columns below would otherwise load the supplier / product row by row
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('product_code', 'name', 'category', 'brand', 'barcode')
+    list_select_related = ('category', 'brand')
+    search_fields = ('product_code', 'barcode', 'name')
+
+
+class ProductInTransactionDetailInline(admin.TabularInline):
+    model = ProductInTransactionDetail
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+# View only: receipts change stock, so edits must go through the API's stock bookkeeping
+class ProductInTransactionAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'supplier', 'supplier_invoice_number', 'purchase_date')
+    list_select_related = ('supplier',)
+    inlines = (ProductInTransactionDetailInline,)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class TotalStockAdmin(admin.ModelAdmin):
+    list_display = ('product', 'total_quantity')
+    list_select_related = ('product',)
+    raw_id_fields = ('product',)
+
+
+admin.site.register(Product, ProductAdmin)
+admin.site.register(ProductInTransaction, ProductInTransactionAdmin)
+admin.site.register(TotalStock, TotalStockAdmin)
 
 # Register your models here.
@@ -0,0 +1,128 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from account.authentication import CachedJWTAuthentication
+from store.db import replica_reads
+from store.inventory import INVENTORY_FIELDS, inventory_queryset
+from store.models import Brand, Category, Product, ProductInTransaction, ProductInTransactionDetail, Supplier, TotalStock
+from store.search import product_search_index
+
+from .mixins import compute_etag
+
+
+# Base for the async read endpoints. DRF 3.14 views are synchronous, so these are plain Django
+# views: under ASGI they run on the event loop and only blocking work hops to a worker thread.
+# Authentication and the conditional GET check share one hop; the queries use the async ORM
+# and, like the sync list and search views, go to the read replica when one is configured.
+class AsyncStoreView(View):
+    http_method_names = ['get', 'head', 'options']
+    etag_models = ()
+    authenticator = CachedJWTAuthentication()
+
+    def prepare(self, request):
+        # Same outcome as a DRF view: a missing token is anonymous, a bad one is rejected
+        try:
+            self.authenticator.authenticate(request)
+        except AuthenticationFailed as error:
+            detail = error.detail if isinstance(error.detail, dict) else {'detail': error.detail}
+            response = JsonResponse(detail, status=error.status_code)
+            response['WWW-Authenticate'] = self.authenticator.authenticate_header(request)
+            return response, None
+        return None, compute_etag(self.etag_models, request)
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method.lower() not in self.http_method_names:
+            return await super().dispatch(request, *args, **kwargs)
+
+        with replica_reads():
+            response, etag = await sync_to_async(self.prepare)(request)
+            if response is not None:
+                return response
+            if etag in request.headers.get('If-None-Match', ''):
+                response = HttpResponse(status=304)
+            else:
+                response = await super().dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class AsyncGetTotalStockView(AsyncStoreView):
+    etag_models = (Product, TotalStock)
+
+    async def get(self, request, product_code):
+        try:
+            total_stock = await TotalStock.objects.only('total_quantity').aget(product__product_code=product_code)
+        except TotalStock.DoesNotExist:
+            return JsonResponse({'error': 'Product not found or stock not available'}, status=404)
+        return JsonResponse({'total_stock': total_stock.total_quantity})
+
+
+# A lookup may have to (re)load the search index from the database, so the whole lookup runs
+# in one worker thread hop and never blocks the event loop
+class AsyncProductCodeSearchView(AsyncStoreView):
+    etag_models = (Product, Category, Brand)
+    max_limit = 50
+
+    async def get(self, request):
+        query = request.GET.get('query', '')
+        if not query:
+            return JsonResponse({'error': 'No query provided'}, status=400)
+        try:
+            limit = min(int(request.GET.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+        products = await sync_to_async(product_search_index.search)(query, limit=max(limit, 1))
+        return JsonResponse(products, safe=False)
+
+
+# Page-number inventory listing with the same parameters and response as InventoryListView
+# (?expired=, ?page=, ?page_size=, ?count=false); rows are streamed with aiterator
+class AsyncInventoryListView(AsyncStoreView):
+    etag_models = (ProductInTransactionDetail, ProductInTransaction, Product, Category, Brand, Supplier)
+    max_page_size = 200
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET.get('page_size', api_settings.PAGE_SIZE))
+        except ValueError:
+            page_size = api_settings.PAGE_SIZE
+        return min(page_size, self.max_page_size) if page_size > 0 else api_settings.PAGE_SIZE
+
+    async def get(self, request):
+        try:
+            page = int(request.GET.get('page', 1))
+        except ValueError:
+            page = 0
+        if page < 1:
+            return JsonResponse({'detail': 'Invalid page.'}, status=404)
+        page_size = self.get_page_size(request)
+
+        queryset = inventory_queryset(request.GET.get('expired') == 'true').order_by('id').values(*INVENTORY_FIELDS)
+        count = None
+        if request.GET.get('count', '').lower() not in ('false', '0'):
+            count = await queryset.acount()
+
+        # Fetch one extra row to know whether a next page exists
+        offset = (page - 1) * page_size
+        rows = [row async for row in queryset[offset:offset + page_size + 1].aiterator()]
+        if page > 1 and not rows:
+            return JsonResponse({'detail': 'Invalid page.'}, status=404)
+
+        url = request.build_absolute_uri()
+        previous = None
+        if page == 2:
+            previous = remove_query_param(url, 'page')
+        elif page > 2:
+            previous = replace_query_param(url, 'page', page - 1)
+        return JsonResponse({
+            'count': count,
+            'next': replace_query_param(url, 'page', page + 1) if len(rows) > page_size else None,
+            'previous': previous,
+            'results': rows[:page_size],
+        })
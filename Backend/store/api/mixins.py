@@ -0,0 +1,87 @@
+import hashlib
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from store.cache import request_fingerprint, store_cache, table_versions
+from store.db import replica_reads
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+def compute_etag(models, request, salt=''):
+    versions = table_versions(models)
+    fingerprint = f'{versions}:{request_fingerprint(request)}:{salt}'
+    digest = hashlib.md5(fingerprint.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+# Conditional GET for store views. The ETag is derived from the change counters of the tables
+# a view reads (``etag_models``, one query on store.models.TableVersion) and the request URL,
+# so it is computed without running the view's queries or serializing anything; a matching
+# If-None-Match short-circuits to 304.
+class ConditionalGetMixin:
+    etag_models = None
+
+    def get_etag_models(self):
+        if self.etag_models is not None:
+            return self.etag_models
+        return (self.get_queryset().model,)
+
+    def get_etag_salt(self, request):
+        # Extra input for views whose output also depends on something other than table contents
+        return ''
+
+    def get_etag(self, request):
+        return compute_etag(self.get_etag_models(), request, self.get_etag_salt(request))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ('GET', 'HEAD'):
+            self.etag = self.get_etag(request)
+            if self.etag in request.headers.get('If-None-Match', ''):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.etag
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+
+# Read-through cache for small, rarely changing lists (categories, brands, branches, suppliers).
+# Entries are keyed by the ETag, which comes from the TableVersion rows in the database, so a
+# write committed by any process makes them unreachable; the timeout only bounds memory use.
+class CachedReferenceListMixin(ConditionalGetMixin):
+
+    def list(self, request, *args, **kwargs):
+        cache = store_cache()
+        key = f'store:list:{self.get_queryset().model._meta.label_lower}:{self.etag}'
+        data = cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            cache.set(key, response.data, getattr(settings, 'STORE_REFERENCE_CACHE_TIMEOUT', 86400))
+            return response
+        return Response(data)
+
+
+# Serves GET and HEAD requests of read-only list and search views from the read replica
+# (store.db.ReadReplicaRouter) when one is configured; other methods use the primary.
+class ReplicaReadMixin:
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,179 @@
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# Page-number pagination with ?page_size= and an optional ?count=false that skips COUNT(*)
+class StorePageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.skip_count = request.query_params.get(self.count_query_param, '').lower() in ('false', '0')
+        if not self.skip_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+
+        # Fetch one extra row to know whether a next page exists
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if self.page_number > 1 and not rows:
+            raise NotFound(self.invalid_page_message)
+        self.has_next = len(rows) > page_size
+        self.request = request
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.skip_count:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.skip_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if not self.skip_count:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+
+# Keyset pagination; the view lists the indexed, non-null columns clients may order by in
+# `cursor_ordering_fields`. DRF's CursorPagination positions a cursor on the first ordering
+# column only and falls back to an offset for ties, which stops advancing once more than
+# offset_cutoff rows share a value. Here a position holds every ordering column (always
+# ending in id), so it is unique and the next page is a true keyset condition.
+class StoreCursorPagination(CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-id'
+    ordering_param = 'ordering'
+
+    def get_ordering(self, request, queryset, view):
+        allowed_fields = getattr(view, 'cursor_ordering_fields', ('id',))
+        ordering = request.query_params.get(self.ordering_param, self.ordering)
+        if ordering.lstrip('-') not in allowed_fields:
+            ordering = self.ordering
+
+        # Break ties on id so rows sharing a date keep a stable order across pages
+        if ordering.lstrip('-') == 'id':
+            return (ordering,)
+        return (ordering, '-id' if ordering.startswith('-') else 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(order[1:] if order.startswith('-') else f'-{order}' for order in ordering)
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, self.decode_position(current_position)))
+
+        # One extra row tells whether a page follows
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position, self.previous_position = following_position, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        """
+        Rows after ``values`` in ``ordering``: (a > x) OR (a = x AND id > y), with the
+        comparison flipped for descending columns.
+        """
+        condition, equal = Q(), Q()
+        for order, value in zip(ordering, values):
+            field = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = [order.lstrip('-') for order in ordering]
+        if isinstance(instance, dict):
+            values = [instance[field] for field in fields]
+        else:
+            values = [getattr(instance, field) for field in fields]
+        return json.dumps([str(value) for value in values])
+
+
+# Uses keyset pagination for ?pagination=cursor requests and page numbers otherwise
+class StorePagination(BasePagination):
+    cursor_class = StoreCursorPagination
+    page_number_class = StorePageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        use_cursor = request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params
+        self.paginator = self.cursor_class() if use_cursor else self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_results(self, data):
+        return data['results']
@@ -1,9 +1,16 @@
+from django.conf import settings
 from rest_framework import serializers
 from store.models import (
     Supplier, Category, Brand, Product, Branch,
-    ProductInTransaction, ProductInTransactionDetail,TotalStock
+    ProductInTransaction, ProductInTransactionDetail, StockLedger,
+    BranchStock, StockTransfer, StockTransferLine, Sale, SaleLine,
 )
-from django.utils.crypto import get_random_string
+from django.db import transaction as db_transaction
+from django.db.models import Prefetch
+from store.stock import (
+    InsufficientStock, apply_expiry_summary_deltas, apply_lot_changes, apply_stock_deltas, lot_value, net_deltas, transfer_stock,
+)
+from store.cache import bump_table_version
 
 # Supplier Serializer
 class SupplierSerializer(serializers.ModelSerializer):
@@ -40,12 +47,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         if not validated_data.get('product_code'):
-            last_product = Product.objects.filter(product_code__startswith='P').order_by('-id').first()
-            if last_product and last_product.product_code:
-                last_code = int(last_product.product_code[1:])  # Strip the 'P' and convert to int
-                validated_data['product_code'] = f'P{last_code + 1}'
-            else:
-                validated_data['product_code'] = 'P5001'  # Start from P5001 if no products exist
+            validated_data['product_code'] = Product.allocate_product_codes()[0]
         return super().create(validated_data)
     
 # Branch Serializer
@@ -54,13 +56,35 @@ class BranchSerializer(serializers.ModelSerializer):
         model = Branch
         fields = '__all__'
 
+# Detail lines of one invoice: every referenced product is loaded in one query before the lines are validated
+class ProductInTransactionDetailListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            product_ids = {item.get('product') for item in data if isinstance(item, dict)}
+            product_ids = {product_id for product_id in product_ids if str(product_id).isdigit()}
+            self.context['preloaded_products'] = Product.objects.in_bulk(product_ids)
+        return super().to_internal_value(data)
+
+
+class PreloadedProductField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        product = self.context.get('preloaded_products', {}).get(int(data) if str(data).isdigit() else None)
+        if product is not None:
+            return product
+        return super().to_internal_value(data)
+
+
 # Product In Transaction Detail Serializer
 class ProductInTransactionDetailSerializer(serializers.ModelSerializer):
+    # Writable so an update can address the line it changes; ignored on create
+    id = serializers.IntegerField(required=False)
     product_name = serializers.CharField(source='product.name', read_only=True)
+    product = PreloadedProductField(queryset=Product.objects.all())
 
     class Meta:
         model = ProductInTransactionDetail
         fields = '__all__'
+        list_serializer_class = ProductInTransactionDetailListSerializer
         extra_kwargs = {
             'transaction': {'required': False},  # transaction will be set in the parent serializer
             'total': {'required': True},  # total is required and should be included in the request
@@ -77,17 +101,28 @@ class ProductInTransactionSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         details_data = validated_data.pop('transaction_details')
-        transaction = ProductInTransaction.objects.create(**validated_data)
-        
         for detail_data in details_data:
-            ProductInTransactionDetail.objects.create(transaction=transaction, **detail_data)
-            # Update total stock for each product in the transaction
-            product_total_stock, created = TotalStock.objects.get_or_create(product=detail_data['product'])
-            product_total_stock.total_quantity += detail_data['quantity']
-            product_total_stock.save()
+            detail_data.pop('id', None)
+        with db_transaction.atomic():
+            transaction = ProductInTransaction.objects.create(**validated_data)
+            ProductInTransactionDetail.objects.bulk_create([
+                ProductInTransactionDetail(transaction=transaction, remaining_quantity=detail_data['quantity'], **detail_data)
+                for detail_data in details_data
+            ])
+            bump_table_version(ProductInTransactionDetail)
+            # Update total stock for every product in the transaction at once
+            apply_lot_changes(
+                [
+                    (detail_data['product'].id, detail_data['expiry_date'], detail_data['quantity'], detail_data['total'])
+                    for detail_data in details_data
+                ],
+                StockLedger.RECEIPT,
+                reference=f'transaction:{transaction.id}',
+            )
 
         return transaction
 
+    @db_transaction.atomic
     def update(self, instance, validated_data):
         details_data = validated_data.pop('transaction_details')
         instance.supplier = validated_data.get('supplier', instance.supplier)
@@ -97,42 +132,333 @@ class ProductInTransactionSerializer(serializers.ModelSerializer):
         instance.remarks = validated_data.get('remarks', instance.remarks)
         instance.save()
 
-        # Handle updating transaction details
+        # Lines with an id update that line of this invoice; lines without one are added
+        existing = {detail.id: detail for detail in instance.transaction_details.select_for_update()}
+        unknown = sorted(detail_data['id'] for detail_data in details_data if detail_data.get('id') not in (None, *existing))
+        if unknown:
+            raise serializers.ValidationError(
+                {'transaction_details': [f'Detail {detail_id} does not belong to this transaction' for detail_id in unknown]}
+            )
+
+        # TotalStock moves by received quantities, the expiry summary by the units left in each lot
+        stock_changes, summary_changes, new_details = [], [], []
         for detail_data in details_data:
-            detail_id = detail_data.get('id')
-            if detail_id:
-                detail_instance = ProductInTransactionDetail.objects.get(id=detail_id, transaction=instance)
-                detail_instance.product = detail_data.get('product', detail_instance.product)
+            detail_id = detail_data.pop('id', None)
+            if detail_id is not None:
+                detail_instance = existing[detail_id]
+                # Reverse the old line and apply the new one so product or quantity changes net out
+                stock_changes.append((detail_instance.product_id, -detail_instance.quantity))
+                summary_changes.append((
+                    detail_instance.product_id, detail_instance.expiry_date, -detail_instance.remaining_quantity,
+                    -lot_value(detail_instance.total, detail_instance.quantity, detail_instance.remaining_quantity),
+                ))
+                # Units already allocated from the lot stay allocated; the lot cannot shrink below them
+                allocated = detail_instance.quantity - detail_instance.remaining_quantity
+                product = detail_data.get('product', detail_instance.product)
+                if allocated and product.id != detail_instance.product_id:
+                    raise serializers.ValidationError(
+                        {'transaction_details': [f'Detail {detail_id}: the product of an allocated lot cannot change']}
+                    )
+                detail_instance.product = product
                 detail_instance.manufacturing_date = detail_data.get('manufacturing_date', detail_instance.manufacturing_date)
                 detail_instance.expiry_date = detail_data.get('expiry_date', detail_instance.expiry_date)
                 detail_instance.quantity = detail_data.get('quantity', detail_instance.quantity)
+                if detail_instance.quantity < allocated:
+                    raise serializers.ValidationError(
+                        {'transaction_details': [f'Detail {detail_id}: {allocated} units are already allocated']}
+                    )
+                detail_instance.remaining_quantity = detail_instance.quantity - allocated
                 detail_instance.total = detail_data.get('total', detail_instance.total)
                 detail_instance.save()
+                stock_changes.append((detail_instance.product_id, detail_instance.quantity))
+                summary_changes.append((
+                    detail_instance.product_id, detail_instance.expiry_date, detail_instance.remaining_quantity,
+                    lot_value(detail_instance.total, detail_instance.quantity, detail_instance.remaining_quantity),
+                ))
             else:
-                ProductInTransactionDetail.objects.create(transaction=instance, **detail_data)
-                # Update stock for the new details
-                product_total_stock, created = TotalStock.objects.get_or_create(product=detail_data['product'])
-                product_total_stock.total_quantity += detail_data['quantity']
-                product_total_stock.save()
+                new_details.append(
+                    ProductInTransactionDetail(transaction=instance, remaining_quantity=detail_data['quantity'], **detail_data)
+                )
+                stock_changes.append((detail_data['product'].id, detail_data['quantity']))
+                summary_changes.append(
+                    (detail_data['product'].id, detail_data['expiry_date'], detail_data['quantity'], detail_data['total'])
+                )
+        if new_details:
+            ProductInTransactionDetail.objects.bulk_create(new_details)
+            bump_table_version(ProductInTransactionDetail)
+
+        # Update stock for all changed and new details at once; a shrinking line must still be in central stock
+        try:
+            apply_stock_deltas(
+                net_deltas(stock_changes), StockLedger.RECEIPT_ADJUSTMENT, reference=f'transaction:{instance.id}', guarded=True,
+            )
+        except InsufficientStock as error:
+            raise serializers.ValidationError({
+                'transaction_details': [
+                    f'Product {product_id}: only {available} units left in central stock'
+                    for product_id, available in sorted(error.shortages.items())
+                ],
+            })
+        apply_expiry_summary_deltas(summary_changes)
 
         return instance
-    
 
 
-class InventorySerializer(serializers.ModelSerializer):
-    product_code = serializers.CharField(source='product.product_code')
-    name = serializers.CharField(source='product.name')
-    barcode = serializers.CharField(source='product.barcode')
-    category_name = serializers.CharField(source='product.category.name')
-    brand_name = serializers.CharField(source='product.brand.name')
-    supplier_name = serializers.CharField(source='transaction.supplier.name')
-    purchase_date = serializers.DateField(source='transaction.purchase_date')
-    stock_quantity = serializers.IntegerField(source='quantity')  # Changed to stock_quantity
+# Read-side transaction output: supplier name and nested detail lines in one response
+class ProductInTransactionDetailReadSerializer(serializers.ModelSerializer):
+    product_code = serializers.CharField(source='product.product_code', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
 
     class Meta:
         model = ProductInTransactionDetail
+        fields = ('id', 'product', 'product_code', 'product_name', 'manufacturing_date', 'expiry_date', 'quantity', 'total')
+        read_only_fields = fields
+
+
+class ProductInTransactionReadSerializer(serializers.ModelSerializer):
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    transaction_details = ProductInTransactionDetailReadSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ProductInTransaction
+        fields = (
+            'id', 'supplier', 'supplier_name', 'purchase_date', 'supplier_invoice_number',
+            'supplier_date', 'remarks', 'transaction_details',
+        )
+        read_only_fields = fields
+
+    @staticmethod
+    def prefetch_queryset(queryset):
+        # Three queries for any page size: transactions with suppliers, then details with products
+        return queryset.select_related('supplier').prefetch_related(
+            Prefetch(
+                'transaction_details',
+                queryset=ProductInTransactionDetail.objects.select_related('product').order_by('id'),
+            )
+        )
+
+
+# FEFO allocation request (store.lots.allocate_lots)
+class LotAllocationRequestSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    reference = serializers.CharField(max_length=100, required=False, default='')
+    include_expired = serializers.BooleanField(required=False, default=False)
+
+
+# Label sheet request: product ids in print order
+class LabelSheetSerializer(serializers.Serializer):
+    products = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=5000)
+    copies = serializers.IntegerField(min_value=1, max_value=100, default=1)
+
+    def validate(self, attrs):
+        # Every label is drawn into memory, so bound the whole sheet, not each field on its own
+        max_labels = getattr(settings, 'STORE_LABEL_SHEET_MAX_LABELS', 24000)
+        if len(attrs['products']) * attrs['copies'] > max_labels:
+            raise serializers.ValidationError(f'A sheet can hold at most {max_labels} labels (products x copies)')
+        return attrs
+
+
+# Bulk receipt serializers
+class BulkProductInTransactionDetailSerializer(serializers.ModelSerializer):
+    # Plain ids; existence is checked once for the whole payload by the list serializer
+    product = serializers.IntegerField(source='product_id')
+
+    class Meta:
+        model = ProductInTransactionDetail
+        fields = ['product', 'manufacturing_date', 'expiry_date', 'quantity', 'total']
+
+
+class BulkProductInTransactionListSerializer(serializers.ListSerializer):
+
+    def __init__(self, *args, **kwargs):
+        # An empty batch has nothing to receive; reject it before create() looks at the first invoice
+        kwargs.setdefault('allow_empty', False)
+        super().__init__(*args, **kwargs)
+
+    def validate(self, attrs):
+        supplier_ids = {item['supplier_id'] for item in attrs}
+        product_ids = {detail['product_id'] for item in attrs for detail in item['transaction_details']}
+
+        missing_suppliers = supplier_ids - set(Supplier.objects.filter(id__in=supplier_ids).values_list('id', flat=True))
+        missing_products = product_ids - set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+
+        errors = {}
+        if missing_suppliers:
+            errors['supplier'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing_suppliers)]
+        if missing_products:
+            errors['product'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing_products)]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        with db_transaction.atomic():
+            transactions = ProductInTransaction.objects.bulk_create([
+                ProductInTransaction(**{key: value for key, value in item.items() if key != 'transaction_details'})
+                for item in validated_data
+            ])
+
+            details = [
+                ProductInTransactionDetail(transaction=transaction, remaining_quantity=detail_data['quantity'], **detail_data)
+                for transaction, item in zip(transactions, validated_data)
+                for detail_data in item['transaction_details']
+            ]
+            ProductInTransactionDetail.objects.bulk_create(details, batch_size=500)
+            bump_table_version(ProductInTransaction, ProductInTransactionDetail)
+            apply_lot_changes(
+                [(detail.product_id, detail.expiry_date, detail.quantity, detail.total) for detail in details],
+                StockLedger.RECEIPT,
+                reference=f'transactions:{transactions[0].id}-{transactions[-1].id}',
+            )
+
+        return transactions
+
+
+class BulkProductInTransactionSerializer(serializers.ModelSerializer):
+    supplier = serializers.IntegerField(source='supplier_id')
+    transaction_details = BulkProductInTransactionDetailSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = ProductInTransaction
         fields = [
-            'product_code', 'name', 'barcode', 'category_name', 'brand_name',
-            'supplier_name', 'purchase_date', 'stock_quantity', 'manufacturing_date',
-            'expiry_date'
-        ]
\ No newline at end of file
+            'id', 'supplier', 'purchase_date', 'supplier_invoice_number',
+            'supplier_date', 'remarks', 'transaction_details'
+        ]
+        list_serializer_class = BulkProductInTransactionListSerializer
+
+    def to_representation(self, instance):
+        # Details are not echoed back; a supplier feed only needs the new transaction ids
+        return {
+            'id': instance.id,
+            'supplier': instance.supplier_id,
+            'supplier_invoice_number': instance.supplier_invoice_number,
+        }
+
+
+# Flat inventory serializer for rows produced by .values(); no model instances or relation lookups
+class InventoryRowSerializer(serializers.Serializer):
+    product_code = serializers.CharField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    barcode = serializers.CharField(read_only=True)
+    category_name = serializers.CharField(read_only=True)
+    brand_name = serializers.CharField(read_only=True)
+    supplier_name = serializers.CharField(read_only=True)
+    purchase_date = serializers.DateField(read_only=True)
+    stock_quantity = serializers.IntegerField(read_only=True)
+    manufacturing_date = serializers.DateField(read_only=True)
+    expiry_date = serializers.DateField(read_only=True)
+
+
+# Stock dashboard rows aggregated from StockExpirySummary
+class StockSummarySerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(read_only=True)
+    product_code = serializers.CharField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    quantity = serializers.IntegerField(read_only=True)
+    value = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    earliest_expiry = serializers.DateField(read_only=True)
+    expired = serializers.IntegerField(read_only=True)
+    expiring_7_days = serializers.IntegerField(read_only=True)
+    expiring_30_days = serializers.IntegerField(read_only=True)
+    expiring_90_days = serializers.IntegerField(read_only=True)
+
+
+# Stock held at one branch
+class BranchStockSerializer(serializers.ModelSerializer):
+    product_code = serializers.CharField(source='product.product_code', read_only=True)
+    name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = BranchStock
+        fields = ['product', 'product_code', 'name', 'quantity']
+
+
+# Stock transfer serializers
+class StockTransferLineSerializer(serializers.ModelSerializer):
+    # Plain ids; existence is checked once for all lines by StockTransferSerializer
+    product = serializers.IntegerField(source='product_id')
+
+    class Meta:
+        model = StockTransferLine
+        fields = ['product', 'quantity']
+
+
+class StockTransferSerializer(serializers.ModelSerializer):
+    lines = StockTransferLineSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = StockTransfer
+        fields = ['id', 'from_branch', 'to_branch', 'created_at', 'remarks', 'lines']
+
+    def validate(self, attrs):
+        if attrs.get('from_branch') == attrs.get('to_branch'):
+            raise serializers.ValidationError('from_branch and to_branch must differ; leave one empty for central stock')
+        product_ids = {line['product_id'] for line in attrs['lines']}
+        missing = product_ids - set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError({'product': [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing)]})
+        return attrs
+
+    def create(self, validated_data):
+        quantities = {}
+        for line in validated_data['lines']:
+            quantities[line['product_id']] = quantities.get(line['product_id'], 0) + line['quantity']
+        from_branch, to_branch = validated_data.get('from_branch'), validated_data.get('to_branch')
+        try:
+            return transfer_stock(
+                from_branch.branch_code if from_branch else None,
+                to_branch.branch_code if to_branch else None,
+                quantities,
+                remarks=validated_data.get('remarks'),
+            )
+        except InsufficientStock as error:
+            raise serializers.ValidationError({
+                'lines': [f'Product {product_id}: only {available} units available' for product_id, available in sorted(error.shortages.items())],
+            })
+
+
+# Sale serializers: one sale or a micro-batch; branches and products are checked once per payload
+class SaleLineSerializer(serializers.ModelSerializer):
+    product = serializers.IntegerField(source='product_id')
+
+    class Meta:
+        model = SaleLine
+        fields = ['product', 'quantity']
+
+
+class SaleListSerializer(serializers.ListSerializer):
+
+    def validate(self, attrs):
+        branch_codes = {item['branch_id'] for item in attrs if item.get('branch_id')}
+        product_ids = {line['product_id'] for item in attrs for line in item['lines']}
+
+        missing_branches = branch_codes - set(Branch.objects.filter(branch_code__in=branch_codes).values_list('branch_code', flat=True))
+        missing_products = product_ids - set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+
+        errors = {}
+        if missing_branches:
+            errors['branch'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing_branches)]
+        if missing_products:
+            errors['product'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing_products)]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+class SaleSerializer(serializers.ModelSerializer):
+    branch = serializers.CharField(source='branch_id', required=False, allow_null=True, allow_blank=True, default=None)
+    lines = SaleLineSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Sale
+        fields = ['branch', 'reference', 'lines']
+        list_serializer_class = SaleListSerializer
+
+    def to_sale(self, item):
+        # The shape store.sales.record_sales takes; repeated products on one sale are summed
+        lines = {}
+        for line in item['lines']:
+            lines[line['product_id']] = lines.get(line['product_id'], 0) + line['quantity']
+        return {'branch': item.get('branch_id') or None, 'reference': item.get('reference', ''), 'lines': lines}
+
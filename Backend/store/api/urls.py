@@ -1,11 +1,15 @@
 from django.urls import path
+from .async_views import AsyncGetTotalStockView, AsyncInventoryListView, AsyncProductCodeSearchView
 from .views import (
-    InventoryListView, SupplierListCreateView, SupplierDetailView,
+    InventoryListView, InventoryExportView, StockSummaryView, StockSummaryTotalsView, SupplierListCreateView, SupplierDetailView,
     CategoryListCreateView, CategoryDetailView,
     BrandListCreateView, BrandDetailView,
-    ProductListCreateView, ProductDetailView, GetTotalStockView, ProductCodeSearchView,
-    BranchListCreateView, BranchDetailView,
-    ProductInTransactionListCreateView, ProductInTransactionDetailView
+    ProductListCreateView, ProductDetailView, GetTotalStockView, ProductCodeSearchView, ProductBarcodeLookupView,
+    BarcodeImageView, LabelSheetView,
+    BranchListCreateView, BranchDetailView, BranchStockListView, BranchStockAvailabilityView, StockTransferListCreateView,
+    ProductInTransactionListCreateView, ProductInTransactionDetailView, ProductInTransactionBulkCreateView,
+    LotAllocationView, SaleCreateView, JobStatusView, JobResultView, InventoryExportJobView, LabelSheetJobView, StockRebuildJobView,
+    ProductInTransactionBulkJobView, ProductImportJobView, ProfilingStatsView
 )
 
 urlpatterns = [
@@ -26,15 +30,54 @@ urlpatterns = [
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
     path('products/<str:product_code>/total_stock/', GetTotalStockView.as_view(), name='get_total_stock'),
     path('products/search_codes/', ProductCodeSearchView.as_view(), name='search_product_codes'),
+    path('products/by-barcode/<str:barcode>/', ProductBarcodeLookupView.as_view(), name='product-by-barcode'),
+
+    # Barcode labels
+    path('barcodes/sheet/', LabelSheetView.as_view(), name='barcode-label-sheet'),
+    path('barcodes/<str:barcode>/<str:image_format>/', BarcodeImageView.as_view(), name='barcode-image'),
 
     # Branch URLs
     path('branches/', BranchListCreateView.as_view(), name='branch-list-create'),
     path('branches/<str:branch_code>/', BranchDetailView.as_view(), name='branch-detail'),
+    path('branches/<str:branch_code>/stock/', BranchStockListView.as_view(), name='branch-stock-list'),
+    path('branches/<str:branch_code>/stock/<str:product_code>/', BranchStockAvailabilityView.as_view(), name='branch-stock-availability'),
+
+    # Stock transfer URLs
+    path('transfers/', StockTransferListCreateView.as_view(), name='stock-transfer-list-create'),
 
     # Product In Transaction URLs
     path('product-in-transactions/', ProductInTransactionListCreateView.as_view(), name='product-in-transaction-list-create'),
+    path('product-in-transactions/bulk/', ProductInTransactionBulkCreateView.as_view(), name='product-in-transaction-bulk-create'),
     path('product-in-transactions/<int:pk>/', ProductInTransactionDetailView.as_view(), name='product-in-transaction-detail'),
 
     # Inventory
-    path('inventory/', InventoryListView.as_view(), name='inventory-list')
+    path('inventory/', InventoryListView.as_view(), name='inventory-list'),
+    path('inventory/export/<str:export_format>/', InventoryExportView.as_view(), name='inventory-export'),
+
+    # POS sales
+    path('sales/', SaleCreateView.as_view(), name='sale-create'),
+
+    # FEFO lot allocation
+    path('lots/allocate/', LotAllocationView.as_view(), name='lot-allocate'),
+
+    # Stock dashboard
+    path('stock/summary/', StockSummaryView.as_view(), name='stock-summary'),
+    path('stock/summary/totals/', StockSummaryTotalsView.as_view(), name='stock-summary-totals'),
+
+    # Background jobs
+    path('jobs/inventory-export/<str:export_format>/', InventoryExportJobView.as_view(), name='job-inventory-export'),
+    path('jobs/product-import/', ProductImportJobView.as_view(), name='job-product-import'),
+    path('jobs/label-sheet/', LabelSheetJobView.as_view(), name='job-label-sheet'),
+    path('jobs/stock-rebuild/', StockRebuildJobView.as_view(), name='job-stock-rebuild'),
+    path('jobs/product-in-transactions/bulk/', ProductInTransactionBulkJobView.as_view(), name='job-product-in-transaction-bulk'),
+    path('jobs/<str:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('jobs/<str:job_id>/result/', JobResultView.as_view(), name='job-result'),
+
+    # Async reads for scanners and typeahead, for deployments served under ASGI
+    path('async/products/<str:product_code>/total_stock/', AsyncGetTotalStockView.as_view(), name='async-get-total-stock'),
+    path('async/products/search_codes/', AsyncProductCodeSearchView.as_view(), name='async-search-product-codes'),
+    path('async/inventory/', AsyncInventoryListView.as_view(), name='async-inventory-list'),
+
+    # Request profiling
+    path('profiling/stats/', ProfilingStatsView.as_view(), name='profiling-stats'),
 ]
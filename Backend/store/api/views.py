@@ -1,140 +1,496 @@
-from django.utils import timezone
+import os
+import uuid
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from rest_framework import generics, status
 from rest_framework.response import Response
 from store.models import (
     Supplier, Category, Brand, Product, Branch,
-    ProductInTransaction, ProductInTransactionDetail, TotalStock
+    ProductInTransaction, ProductInTransactionDetail, TotalStock, StockLedger, StockExpirySummary,
+    LotAllocation, BranchStock, StockTransfer, StockTransferLine,
 )
 from .serializers import (
     SupplierSerializer, CategorySerializer, BrandSerializer, ProductSerializer, BranchSerializer,
-    ProductInTransactionSerializer, InventorySerializer
+    ProductInTransactionSerializer, ProductInTransactionReadSerializer, BulkProductInTransactionSerializer, InventoryRowSerializer, LabelSheetSerializer,
+    StockSummarySerializer, BranchStockSerializer, StockTransferSerializer, LotAllocationRequestSerializer,
+    SaleSerializer,
 )
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.views import APIView
 from rest_framework import generics
-from django.db.models import F, Value, Case, When, IntegerField
+from django.db.models import F, FilteredRelation, Prefetch, Q, Value, Case, When, IntegerField
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from store.stock import InsufficientStock, apply_lot_changes
+from store.lots import LotContention, ReceiptInUse, allocate_lots
+from store.sales import sale_batcher
+from store.search import product_search_index
+from store.labels import IMAGE_FORMATS, barcode_etag, barcode_image_path, render_barcode, render_label_sheet
+from store.inventory import EXPORT_FORMATS, INVENTORY_FIELDS, inventory_queryset, stock_summary_queryset, stock_summary_totals, iter_inventory_rows
+from store.tasks import (
+    create_bulk_receipts, enqueue, export_inventory, import_product_file, job_file_path, job_status, rebuild_stock, render_labels,
+)
+from store.imports import IMPORT_FORMATS
+from store.profiling import endpoint_stats
+from .mixins import CachedReferenceListMixin, ConditionalGetMixin, ReplicaReadMixin
+from .pagination import StorePagination, StorePageNumberPagination
 
 # Supplier Views
-class SupplierListCreateView(generics.ListCreateAPIView):
+class SupplierListCreateView(CachedReferenceListMixin, generics.ListCreateAPIView):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
 
-class SupplierDetailView(generics.RetrieveUpdateDestroyAPIView):
+class SupplierDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
 
 # Category Views
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(CachedReferenceListMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
 # Brand Views
-class BrandListCreateView(generics.ListCreateAPIView):
+class BrandListCreateView(CachedReferenceListMixin, generics.ListCreateAPIView):
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
 
-class BrandDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BrandDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
 
 # Product Views
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductListCreateView(ReplicaReadMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Product.objects.select_related('brand', 'category').all()
     serializer_class = ProductSerializer
+    etag_models = (Product, Category, Brand)
+    pagination_class = StorePagination
+    cursor_ordering_fields = ('id',)
 
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.all()
+class ProductDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Product.objects.select_related('brand', 'category')
     serializer_class = ProductSerializer
+    etag_models = (Product, Category, Brand)
 
     def perform_destroy(self, instance):
-        # Decrease stock from TotalStock when a product is deleted, if necessary
-        try:
-            total_stock = TotalStock.objects.get(product=instance)
-            total_stock.total_quantity = 0
-            total_stock.save()
-        except TotalStock.DoesNotExist:
-            pass
-        
+        # TotalStock and the product's ledger rows are removed by the cascade
         instance.delete()
 
 # Get total stock of a product
-class GetTotalStockView(APIView):
+class GetTotalStockView(ConditionalGetMixin, APIView):
+    etag_models = (Product, TotalStock)
+
     def get(self, request, product_code, format=None):
         try:
-            product = Product.objects.get(product_code=product_code)
-            total_stock = TotalStock.objects.get(product=product)
+            total_stock = TotalStock.objects.only('total_quantity').get(product__product_code=product_code)
             return Response({'total_stock': total_stock.total_quantity}, status=status.HTTP_200_OK)
-        except (Product.DoesNotExist, TotalStock.DoesNotExist):
+        except TotalStock.DoesNotExist:
             return Response({'error': 'Product not found or stock not available'}, status=status.HTTP_404_NOT_FOUND)
 
-# Search product codes
-class ProductCodeSearchView(APIView):
+# Scanner lookup: product details and stock for a barcode in one indexed query
+class ProductBarcodeLookupView(ConditionalGetMixin, APIView):
+    etag_models = (Product, Category, Brand, TotalStock)
+
+    def get(self, request, barcode, format=None):
+        try:
+            product = Product.objects.select_related('category', 'brand', 'totalstock').get(barcode=barcode)
+        except Product.DoesNotExist:
+            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            total_stock = product.totalstock.total_quantity
+        except TotalStock.DoesNotExist:
+            total_stock = 0
+
+        data = ProductSerializer(product).data
+        data['total_stock'] = total_stock
+        return Response(data, status=status.HTTP_200_OK)
+
+# Barcode image for a product barcode; the URL is keyed by the barcode value so it can be cached forever
+class BarcodeImageView(APIView):
+    def get(self, request, barcode, image_format, format=None):
+        if image_format not in IMAGE_FORMATS:
+            return Response({'error': 'Unsupported image format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        etag = barcode_etag(barcode)
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            if not os.path.exists(barcode_image_path(barcode, image_format)) and not Product.objects.filter(barcode=barcode).exists():
+                return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+            response = FileResponse(open(render_barcode(barcode, image_format), 'rb'), content_type=IMAGE_FORMATS[image_format][0])
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+# Printable PDF label sheet for many products. Sheets above STORE_LABEL_SHEET_SYNC_LABELS labels
+# are handed to the render_labels job and answered with 202 and the job's status URL.
+class LabelSheetView(APIView):
+    def post(self, request, format=None):
+        serializer = LabelSheetSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_ids = serializer.validated_data['products']
+        copies = serializer.validated_data['copies']
+
+        products = Product.objects.in_bulk(product_ids)
+        missing = [product_id for product_id in product_ids if product_id not in products]
+        if missing:
+            return Response({'products': [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(product_ids) * copies > getattr(settings, 'STORE_LABEL_SHEET_SYNC_LABELS', 240):
+            return job_accepted(request, enqueue(render_labels, product_ids, copies))
+
+        pdf = render_label_sheet([products[product_id] for product_id in product_ids], copies)
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="labels.pdf"'
+        return response
+
+# Product typeahead: ranked prefix matches on code, barcode, name, brand and category
+class ProductCodeSearchView(ReplicaReadMixin, ConditionalGetMixin, APIView):
+    etag_models = (Product, Category, Brand)
+    max_limit = 50
+
     def get(self, request, format=None):
         query = request.GET.get('query', '')
         if query:
-            products = Product.objects.filter(product_code__icontains=query)[:10]
-            product_codes = products.values('product_code')
-            return Response(product_codes, status=status.HTTP_200_OK)
+            try:
+                limit = min(int(request.GET.get('limit', 10)), self.max_limit)
+            except ValueError:
+                limit = 10
+            products = product_search_index.search(query, limit=max(limit, 1))
+            return Response(products, status=status.HTTP_200_OK)
         return Response({'error': 'No query provided'}, status=status.HTTP_400_BAD_REQUEST)
 
 # Branch Views
-class BranchListCreateView(generics.ListCreateAPIView):
+class BranchListCreateView(CachedReferenceListMixin, generics.ListCreateAPIView):
     queryset = Branch.objects.all()
     serializer_class = BranchSerializer
 
-class BranchDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BranchDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Branch.objects.all()
     serializer_class = BranchSerializer
     lookup_field = 'branch_code'
 
+# Stock at one branch, read through the (branch, product) unique index
+class BranchStockListView(ReplicaReadMixin, ConditionalGetMixin, generics.ListAPIView):
+    serializer_class = BranchStockSerializer
+    etag_models = (BranchStock, Product)
+    pagination_class = StorePageNumberPagination
+
+    def get_queryset(self):
+        return (
+            BranchStock.objects.filter(branch_id=self.kwargs['branch_code'])
+            .select_related('product').only('product__product_code', 'product__name', 'quantity')
+            .order_by('product_id')
+        )
+
+# POS availability check: one query joining the product code index to the (branch, product) index
+class BranchStockAvailabilityView(ConditionalGetMixin, APIView):
+    etag_models = (BranchStock, Product)
+
+    def get(self, request, branch_code, product_code, format=None):
+        product = (
+            Product.objects.filter(product_code=product_code)
+            .annotate(at_branch=FilteredRelation('branch_stock', condition=Q(branch_stock__branch_id=branch_code)))
+            .values('id', 'product_code', 'at_branch__quantity')
+            .first()
+        )
+        if product is None:
+            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'branch': branch_code,
+            'product': product['id'],
+            'product_code': product['product_code'],
+            'quantity': product['at_branch__quantity'] or 0,
+        }, status=status.HTTP_200_OK)
+
+# Stock transfers between branches; an empty from_branch or to_branch means central stock
+class StockTransferListCreateView(ReplicaReadMixin, ConditionalGetMixin, generics.ListCreateAPIView):
+    queryset = StockTransfer.objects.prefetch_related(
+        Prefetch('lines', queryset=StockTransferLine.objects.only('transfer_id', 'product_id', 'quantity')),
+    ).order_by('-id')
+    serializer_class = StockTransferSerializer
+    etag_models = (StockTransfer, StockTransferLine)
+    pagination_class = StorePagination
+
 # Product In Transaction Views
-class ProductInTransactionListCreateView(generics.ListCreateAPIView):
-    queryset = ProductInTransaction.objects.all()
+# Reads use the nested read serializer and its prefetch plan; writes keep the write serializer
+class ProductInTransactionReadMixin:
+    etag_models = (ProductInTransaction, ProductInTransactionDetail, Product, Supplier)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in ('GET', 'HEAD'):
+            return ProductInTransactionReadSerializer.prefetch_queryset(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.request.method in ('GET', 'HEAD'):
+            return ProductInTransactionReadSerializer
+        return ProductInTransactionSerializer
+
+class ProductInTransactionListCreateView(ReplicaReadMixin, ProductInTransactionReadMixin, ConditionalGetMixin, generics.ListCreateAPIView):
+    queryset = ProductInTransaction.objects.order_by('-id')
     serializer_class = ProductInTransactionSerializer
+    pagination_class = StorePagination
+
+# Bulk stock receipts: accepts a list of invoices (or a single invoice) in one request
+class ProductInTransactionBulkCreateView(generics.CreateAPIView):
+    serializer_class = BulkProductInTransactionSerializer
+
+    def create(self, request, *args, **kwargs):
+        data = request.data if isinstance(request.data, list) else [request.data]
+        serializer = self.get_serializer(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        details_count = sum(len(item['transaction_details']) for item in serializer.validated_data)
+        return Response(
+            {'transactions': serializer.data, 'details_count': details_count},
+            status=status.HTTP_201_CREATED,
+        )
 
-class ProductInTransactionDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ProductInTransactionDetailView(ProductInTransactionReadMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = ProductInTransaction.objects.all()
     serializer_class = ProductInTransactionSerializer
 
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        try:
+            self.perform_destroy(instance)
+        except ReceiptInUse as error:
+            return Response(
+                {'error': 'Units of this receipt have already been allocated or sold', 'details': error.detail_ids},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except InsufficientStock as error:
+            return Response(
+                {'error': 'Insufficient central stock to reverse this receipt', 'available': error.shortages},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @transaction.atomic
     def perform_destroy(self, instance):
-        # Decrease stock from TotalStock when a transaction is deleted
-        for detail in instance.transaction_details.all():
-            product_total_stock = TotalStock.objects.get(product=detail.product)
-            product_total_stock.total_quantity -= detail.quantity
-            product_total_stock.save()
-        
+        # Lock the lines so no allocation can take units between the check and the delete
+        details = list(
+            instance.transaction_details.select_for_update()
+            .values_list('id', 'product_id', 'expiry_date', 'quantity', 'remaining_quantity', 'total')
+        )
+        allocated = set(LotAllocation.objects.filter(lot__transaction=instance).values_list('lot_id', flat=True))
+        in_use = sorted(detail[0] for detail in details if detail[0] in allocated or detail[4] < detail[3])
+        if in_use:
+            raise ReceiptInUse(in_use)
+        # Decrease stock from TotalStock when a transaction is deleted; the units must still be in central stock
+        apply_lot_changes(
+            [(product_id, expiry_date, -quantity, -total) for _, product_id, expiry_date, quantity, _, total in details],
+            StockLedger.RECEIPT_REVERSAL,
+            reference=f'transaction:{instance.id}',
+            guarded=True,
+        )
         instance.delete()
 
 
 
-class InventoryListView(generics.ListAPIView):
-    serializer_class = InventorySerializer
+class InventoryListView(ReplicaReadMixin, ConditionalGetMixin, generics.ListAPIView):
+    serializer_class = InventoryRowSerializer
+    etag_models = (ProductInTransactionDetail, ProductInTransaction, Product, Category, Brand, Supplier)
+    pagination_class = StorePagination
+    cursor_ordering_fields = ('id', 'expiry_date')
 
     def get_queryset(self):
-        # Get the current date
-        current_date = timezone.now().date()
-
         # Check if the expired filter is active
         expired = self.request.query_params.get('expired')
 
-        queryset = ProductInTransactionDetail.objects.select_related(
-            'product', 'product__category', 'product__brand',
-            'transaction', 'transaction__supplier',
-        ).annotate(
-            product_code=F('product__product_code'),
-            name=F('product__name'),
-            barcode=F('product__barcode'),
-            category_name=F('product__category__name'),
-            brand_name=F('product__brand__name'),
-            supplier_name=F('transaction__supplier__name'),
-            purchase_date=F('transaction__purchase_date'),
-            stock_quantity=F('quantity'),  # Change 'quantity' to 'stock_quantity'
+        # Select only the listed columns as dicts; id is kept for cursor positions
+        return inventory_queryset(expired == "true").order_by('id').values('id', *INVENTORY_FIELDS)
+
+
+# POS sales: a single sale object or a list of them. Sales from concurrent requests are
+# committed together by store.sales.sale_batcher; each sale is accepted or rejected on its own.
+class SaleCreateView(APIView):
+    def post(self, request, format=None):
+        many = isinstance(request.data, list)
+        serializer = SaleSerializer(data=request.data if many else [request.data], many=True)
+        serializer.is_valid(raise_exception=True)
+        try:
+            results = sale_batcher.submit([serializer.child.to_sale(item) for item in serializer.validated_data])
+        except LotContention:
+            return Response(
+                {'error': 'The lots of these products are being allocated concurrently; retry the request'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if many:
+            return Response(results, status=status.HTTP_201_CREATED)
+        result = results[0]
+        return Response(result, status=status.HTTP_201_CREATED if result['status'] == 'accepted' else status.HTTP_409_CONFLICT)
+
+
+# FEFO lot allocation: takes units out of a product's lots, first expiry first, and out of central stock
+class LotAllocationView(APIView):
+    def post(self, request, format=None):
+        serializer = LotAllocationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            picks = allocate_lots(data['product'], data['quantity'], data['reference'], data['include_expired'])
+        except InsufficientStock as error:
+            return Response(
+                {'error': 'Insufficient stock', 'available': error.shortages.get(data['product'], 0)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except LotContention:
+            return Response(
+                {'error': 'The lots of this product are being allocated concurrently; retry the request'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response({
+            'product': data['product'],
+            'quantity': data['quantity'],
+            'allocations': [
+                {'lot': lot_id, 'expiry_date': expiry_date, 'quantity': units} for lot_id, expiry_date, units in picks
+            ],
+        }, status=status.HTTP_201_CREATED)
+
+
+# Streaming inventory export: /inventory/export/csv/ or /inventory/export/ndjson/
+class InventoryExportView(APIView):
+    def get(self, request, export_format, format=None):
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': 'Unsupported export format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, render_rows = EXPORT_FORMATS[export_format]
+        rows = iter_inventory_rows(request.query_params.get('expired') == "true")
+        response = StreamingHttpResponse(render_rows(rows), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="inventory.{export_format}"'
+        return response
+
+
+# Stock dashboard: per-product quantity, value, earliest expiry and expiry buckets
+class StockSummaryView(ReplicaReadMixin, ConditionalGetMixin, generics.ListAPIView):
+    serializer_class = StockSummarySerializer
+    # Rows are grouped per product, so keyset pagination over id does not apply
+    pagination_class = StorePageNumberPagination
+    etag_models = (StockExpirySummary, Product)
+
+    def get_etag_salt(self, request):
+        # Buckets are relative to the local date, so the validator changes at local midnight as well
+        return str(timezone.localdate())
+
+    def get_queryset(self):
+        return stock_summary_queryset()
+
+
+class StockSummaryTotalsView(ConditionalGetMixin, APIView):
+    etag_models = (StockExpirySummary,)
+
+    def get_etag_salt(self, request):
+        return str(timezone.localdate())
+
+    def get(self, request, format=None):
+        totals = stock_summary_totals()
+        for key, value in totals.items():
+            if value is None and key != 'earliest_expiry':
+                totals[key] = 0
+        return Response(totals, status=status.HTTP_200_OK)
+
+
+# Background jobs: start endpoints answer 202 with the job id; poll jobs/<id>/ for status and progress
+def job_accepted(request, job_id):
+    return Response(
+        {'job_id': job_id, 'status_url': request.build_absolute_uri(reverse('job-status', args=[job_id]))},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+class JobStatusView(APIView):
+    def get(self, request, job_id, format=None):
+        job = job_status(job_id)
+        if job is None:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        if job['result'] and 'file' in job['result']:
+            job['result_url'] = request.build_absolute_uri(reverse('job-result', args=[job_id]))
+        return Response(job, status=status.HTTP_200_OK)
+
+
+class JobResultView(APIView):
+    def get(self, request, job_id, format=None):
+        job = job_status(job_id)
+        if job is None:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        if job['status'] != 'SUCCESS':
+            return Response({'status': job['status'], 'error': job['error']}, status=status.HTTP_409_CONFLICT)
+
+        result = job['result']
+        if not result or 'file' not in result:
+            return Response(result, status=status.HTTP_200_OK)
+        return FileResponse(
+            open(job_file_path(result['file']), 'rb'), as_attachment=True,
+            filename=result['filename'], content_type=result['content_type'],
         )
 
-        if expired == "true":
-            queryset = queryset.filter(expiry_date__lt=current_date)
 
-        return queryset
\ No newline at end of file
+class InventoryExportJobView(APIView):
+    def post(self, request, export_format, format=None):
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': 'Unsupported export format'}, status=status.HTTP_400_BAD_REQUEST)
+        expired = request.query_params.get('expired') == "true"
+        return job_accepted(request, enqueue(export_inventory, export_format, expired))
+
+
+class LabelSheetJobView(APIView):
+    def post(self, request, format=None):
+        serializer = LabelSheetSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return job_accepted(request, enqueue(
+            render_labels, serializer.validated_data['products'], serializer.validated_data['copies'],
+        ))
+
+
+class StockRebuildJobView(APIView):
+    def post(self, request, format=None):
+        return job_accepted(request, enqueue(rebuild_stock))
+
+
+# Catalog import: multipart upload of a CSV or XLSX file (columns: product_code, name, unit_type, category, brand, barcode)
+class ProductImportJobView(APIView):
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request, format=None):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or os.path.splitext(upload.name)[1].lstrip('.').lower()
+        if file_format not in IMPORT_FORMATS:
+            return Response({'error': 'Unsupported import format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Stage the upload where the job can read it, then return before parsing anything
+        name = f'upload-{uuid.uuid4()}.{file_format}'
+        os.makedirs(os.path.dirname(job_file_path(name)), exist_ok=True)
+        with open(job_file_path(name), 'wb') as staged:
+            for chunk in upload.chunks():
+                staged.write(chunk)
+        return job_accepted(request, enqueue(import_product_file, name, file_format))
+
+
+class ProductInTransactionBulkJobView(APIView):
+    def post(self, request, format=None):
+        data = request.data if isinstance(request.data, list) else [request.data]
+        return job_accepted(request, enqueue(create_bulk_receipts, data))
+
+
+# Rolling request timings of this process (see store.profiling); DELETE clears them
+class ProfilingStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        return Response(endpoint_stats.snapshot(), status=status.HTTP_200_OK)
+
+    def delete(self, request, format=None):
+        endpoint_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from store import signals  # noqa: F401
+        from store.db import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid='store-configure-sqlite')
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import math
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from account.api.throttles import LoginRateThrottle
+from store.models import Branch, BranchStock, Product, ProductInTransaction, ProductInTransactionDetail, Supplier
+from store.tasks import enqueue, export_inventory
+
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+# URL confs whose endpoints are benchmarked; every named pattern should have a case below
+API_URLCONFS = ('store.api.urls', 'account.api.urls')
+
+# URL names that are intentionally not benchmarked, with the reason
+SKIPPED_ENDPOINTS = {
+    'job-product-import': 'needs a multipart file upload; covered by the import_products command',
+}
+
+
+def api_url_names():
+    return {pattern.name for urlconf in API_URLCONFS for pattern in get_resolver(urlconf).url_patterns if pattern.name}
+
+
+def endpoint_cases(tokens):
+    """
+    One request per store and auth endpoint as ``(name, method, path, body)``, built
+    from rows already in the database (see seed_store). ``tokens`` holds a
+    refresh/access pair for the authenticated account endpoints.
+    """
+    product = Product.objects.order_by('id').first()
+    receipt = ProductInTransaction.objects.order_by('id').first()
+    supplier = Supplier.objects.order_by('id').first()
+    branch_stock = BranchStock.objects.select_related('product').filter(quantity__gte=2).order_by('id').first()
+    branch = branch_stock.branch
+    label_products = list(Product.objects.order_by('id').values_list('id', flat=True)[:24])
+    job_id = enqueue(export_inventory, 'csv', False)
+    receipt_body = [
+        {
+            'supplier': supplier.id, 'supplier_invoice_number': f'BENCH-{number}',
+            'supplier_date': str(date.today()),
+            'transaction_details': [
+                {
+                    'product': product_id, 'manufacturing_date': str(date.today() - timedelta(days=30)),
+                    'expiry_date': str(date.today() + timedelta(days=180)), 'quantity': 5, 'total': '50.00',
+                }
+                for product_id in label_products[:10]
+            ],
+        }
+        for number in range(5)
+    ]
+    login_body = {'username': BENCHMARK_USERNAME, 'password': BENCHMARK_PASSWORD}
+
+    return [
+        ('supplier-list-create', 'GET', reverse('supplier-list-create'), None),
+        ('supplier-detail', 'GET', reverse('supplier-detail', args=[supplier.id]), None),
+        ('category-list-create', 'GET', reverse('category-list-create'), None),
+        ('category-detail', 'GET', reverse('category-detail', args=[product.category_id]), None),
+        ('brand-list-create', 'GET', reverse('brand-list-create'), None),
+        ('brand-detail', 'GET', reverse('brand-detail', args=[product.brand_id]), None),
+        ('product-list-create', 'GET', reverse('product-list-create') + '?page_size=50', None),
+        ('product-detail', 'GET', reverse('product-detail', args=[product.id]), None),
+        ('get_total_stock', 'GET', reverse('get_total_stock', args=[product.product_code]), None),
+        ('async-get-total-stock', 'GET', reverse('async-get-total-stock', args=[product.product_code]), None),
+        ('search_product_codes', 'GET', reverse('search_product_codes') + '?query=fre', None),
+        ('async-search-product-codes', 'GET', reverse('async-search-product-codes') + '?query=fre', None),
+        ('product-by-barcode', 'GET', reverse('product-by-barcode', args=[product.barcode]), None),
+        ('barcode-label-sheet', 'POST', reverse('barcode-label-sheet'), {'products': label_products}),
+        ('barcode-image', 'GET', reverse('barcode-image', args=[product.barcode, 'png']), None),
+        ('branch-list-create', 'GET', reverse('branch-list-create'), None),
+        ('branch-detail', 'GET', reverse('branch-detail', args=[branch.branch_code]), None),
+        ('branch-stock-list', 'GET', reverse('branch-stock-list', args=[branch.branch_code]) + '?page_size=50', None),
+        ('branch-stock-availability', 'GET', reverse('branch-stock-availability', args=[branch.branch_code, branch_stock.product.product_code]), None),
+        ('stock-transfer-list-create', 'GET', reverse('stock-transfer-list-create') + '?page_size=20', None),
+        ('stock-transfer-create', 'POST', reverse('stock-transfer-list-create'), {
+            'from_branch': branch.branch_code, 'to_branch': None,
+            'lines': [{'product': branch_stock.product_id, 'quantity': 1}],
+        }),
+        ('product-in-transaction-list-create', 'GET', reverse('product-in-transaction-list-create') + '?page_size=50', None),
+        ('product-in-transaction-bulk-create', 'POST', reverse('product-in-transaction-bulk-create'), receipt_body),
+        ('product-in-transaction-detail', 'GET', reverse('product-in-transaction-detail', args=[receipt.id]), None),
+        ('inventory-list', 'GET', reverse('inventory-list') + '?page_size=50', None),
+        ('inventory-list-cursor', 'GET', reverse('inventory-list') + '?pagination=cursor&page_size=50', None),
+        ('inventory-list-expired', 'GET', reverse('inventory-list') + '?expired=true&page_size=50', None),
+        ('async-inventory-list', 'GET', reverse('async-inventory-list') + '?page_size=50', None),
+        ('sale-create', 'POST', reverse('sale-create'), {
+            'branch': branch.branch_code, 'reference': 'BENCH-1',
+            'lines': [{'product': branch_stock.product_id, 'quantity': 1}],
+        }),
+        ('lot-allocate', 'POST', reverse('lot-allocate'), {'product': product.id, 'quantity': 1, 'reference': 'benchmark'}),
+        ('inventory-export', 'GET', reverse('inventory-export', args=['csv']) + '?expired=true', None),
+        ('stock-summary', 'GET', reverse('stock-summary') + '?page_size=50', None),
+        ('stock-summary-totals', 'GET', reverse('stock-summary-totals'), None),
+        ('job-inventory-export', 'POST', reverse('job-inventory-export', args=['csv']) + '?expired=true', None),
+        ('job-label-sheet', 'POST', reverse('job-label-sheet'), {'products': label_products}),
+        ('job-stock-rebuild', 'POST', reverse('job-stock-rebuild'), None),
+        ('job-product-in-transaction-bulk', 'POST', reverse('job-product-in-transaction-bulk'), receipt_body),
+        ('job-status', 'GET', reverse('job-status', args=[job_id]), None),
+        ('job-result', 'GET', reverse('job-result', args=[job_id]), None),
+        ('profiling-stats', 'GET', reverse('profiling-stats'), None),
+        ('token_obtain_pair', 'POST', reverse('token_obtain_pair'), login_body),
+        ('token_refresh', 'POST', reverse('token_refresh'), {'refresh': tokens['refresh']}),
+        ('user-login', 'POST', reverse('user-login'), login_body),
+        ('user-details', 'GET', reverse('user-details'), None),
+        ('logout', 'POST', reverse('logout'), {'refresh_token': tokens['refresh']}),
+    ]
+
+
+def benchmark_user_tokens(client):
+    User = get_user_model()
+    if not User.objects.filter(username=BENCHMARK_USERNAME).exists():
+        User.objects.create_user(BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD, is_staff=True)
+    response = client.post(
+        reverse('user-login'), {'username': BENCHMARK_USERNAME, 'password': BENCHMARK_PASSWORD},
+        content_type='application/json',
+    )
+    return response.json()
+
+
+def send(client, method, path, body, tokens):
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {tokens["access"]}'}
+    if method == 'GET':
+        response = client.get(path, **headers)
+    else:
+        response = client.post(path, json.dumps(body) if body is not None else '', content_type='application/json', **headers)
+    # Streaming and file responses do their work while being consumed
+    if response.streaming:
+        for chunk in response.streaming_content:
+            pass
+    return response
+
+
+def percentile(samples, percent):
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def run_benchmark(iterations=20, progress=None):
+    """
+    Time every endpoint case and return the JSON-serialisable result.
+
+    Everything runs inside one transaction that is rolled back at the end, and each
+    request runs in its own savepoint that is rolled back too, so write endpoints can be
+    repeated against unchanged data and the database is left as it was. Background jobs
+    run inline and files go to a temporary MEDIA_ROOT, and the login rate limit is raised
+    so repeated logins are not rejected. The first request of each endpoint is a warm-up
+    and also records the query count.
+    """
+    report = progress or (lambda message: None)
+    results = {}
+    with tempfile.TemporaryDirectory() as media_root, \
+            override_settings(STORE_TASK_MODE='eager', MEDIA_ROOT=media_root), \
+            mock.patch.object(LoginRateThrottle, 'THROTTLE_RATES', {'login': '1000000/min'}), transaction.atomic():
+        client = Client()
+        tokens = benchmark_user_tokens(client)
+        cases = endpoint_cases(tokens)
+        for name, method, path, body in cases:
+            # The query log is a bounded deque; start each capture from an empty log
+            reset_queries()
+            with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+                response = send(client, method, path, body, tokens)
+                transaction.set_rollback(True)
+            query_count = len(queries)
+
+            samples = []
+            for _ in range(iterations):
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    send(client, method, path, body, tokens)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    transaction.set_rollback(True)
+
+            results[name] = {
+                'method': method,
+                'path': path,
+                'status': response.status_code,
+                'queries': query_count,
+                'p50_ms': round(percentile(samples, 50), 3),
+                'p95_ms': round(percentile(samples, 95), 3),
+            }
+            report(f'{name}: {results[name]["p50_ms"]} ms p50, {results[name]["p95_ms"]} ms p95, {results[name]["queries"]} queries')
+        transaction.set_rollback(True)
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'rows': {
+            'products': Product.objects.count(),
+            'transaction_details': ProductInTransactionDetail.objects.count(),
+        },
+        'iterations': iterations,
+        'endpoints': results,
+        'skipped': SKIPPED_ENDPOINTS,
+        'not_covered': sorted(api_url_names() - set(results) - set(SKIPPED_ENDPOINTS)),
+    }
+
+
+def throughput_cases():
+    """Read endpoints with a native async variant, as ``(name, WSGI path, ASGI path)``."""
+    product = Product.objects.order_by('id').first()
+    return [
+        ('total-stock', reverse('get_total_stock', args=[product.product_code]), reverse('async-get-total-stock', args=[product.product_code])),
+        ('search', reverse('search_product_codes') + '?query=fre', reverse('async-search-product-codes') + '?query=fre'),
+        ('inventory', reverse('inventory-list') + '?page_size=50', reverse('async-inventory-list') + '?page_size=50'),
+    ]
+
+
+def _wsgi_get(application, url, authorization):
+    path, _, query = url.partition('?')
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_AUTHORIZATION': authorization}
+    setup_testing_defaults(environ)
+    statuses = []
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for chunk in response:
+            pass
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+async def _asgi_get(application, url, authorization):
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'authorization', authorization.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    received = False
+    disconnected = asyncio.Event()
+    statuses = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected until the handler stops listening
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+def _wsgi_throughput(application, url, authorization, requests, concurrency):
+    with ThreadPoolExecutor(concurrency) as pool:
+        started = time.perf_counter()
+        statuses = list(pool.map(lambda _: _wsgi_get(application, url, authorization), range(requests)))
+        return time.perf_counter() - started, statuses
+
+
+async def _asgi_throughput(application, url, authorization, requests, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            return await _asgi_get(application, url, authorization)
+
+    started = time.perf_counter()
+    statuses = await asyncio.gather(*[one() for _ in range(requests)])
+    return time.perf_counter() - started, statuses
+
+
+def run_throughput_benchmark(requests=200, concurrency=20, progress=None):
+    """
+    Compare requests per second of the sync views served through Django's WSGI handler
+    and their async variants served through its ASGI handler.
+
+    The WSGI side runs ``concurrency`` worker threads, like a threaded WSGI server; the
+    ASGI side keeps ``concurrency`` requests in flight on one event loop. Requests go
+    straight to the handlers without a network server, so the numbers compare the request
+    paths rather than a deployment. Each path gets one warm-up request first.
+    """
+    report = progress or (lambda message: None)
+    with mock.patch.object(LoginRateThrottle, 'THROTTLE_RATES', {'login': '1000000/min'}):
+        tokens = benchmark_user_tokens(Client())
+    authorization = f'Bearer {tokens["access"]}'
+    wsgi_application = get_wsgi_application()
+    asgi_application = get_asgi_application()
+
+    results = {}
+    for name, wsgi_path, asgi_path in throughput_cases():
+        _wsgi_get(wsgi_application, wsgi_path, authorization)
+        wsgi_elapsed, wsgi_statuses = _wsgi_throughput(wsgi_application, wsgi_path, authorization, requests, concurrency)
+        asyncio.run(_asgi_get(asgi_application, asgi_path, authorization))
+        asgi_elapsed, asgi_statuses = asyncio.run(
+            _asgi_throughput(asgi_application, asgi_path, authorization, requests, concurrency)
+        )
+        results[name] = {
+            'wsgi': {
+                'path': wsgi_path, 'requests_per_second': round(requests / wsgi_elapsed, 1),
+                'errors': sum(status != 200 for status in wsgi_statuses),
+            },
+            'asgi': {
+                'path': asgi_path, 'requests_per_second': round(requests / asgi_elapsed, 1),
+                'errors': sum(status != 200 for status in asgi_statuses),
+            },
+        }
+        report(
+            f'{name}: WSGI {results[name]["wsgi"]["requests_per_second"]} req/s, '
+            f'ASGI {results[name]["asgi"]["requests_per_second"]} req/s'
+        )
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'requests': requests,
+        'concurrency': concurrency,
+        'endpoints': results,
+    }
+
+
+def compare_with_baseline(current, baseline, tolerance=0.25, min_delta_ms=5.0):
+    """Return human-readable regressions of ``current`` against ``baseline``."""
+    regressions = []
+    for name, result in current['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        if result['queries'] > previous['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries (baseline {previous["queries"]})')
+        limit = previous['p95_ms'] * (1 + tolerance)
+        if result['p95_ms'] > limit and result['p95_ms'] - previous['p95_ms'] > min_delta_ms:
+            regressions.append(f'{name}: p95 {result["p95_ms"]} ms (baseline {previous["p95_ms"]} ms)')
+    return regressions
@@ -0,0 +1,53 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+from store.models import TableVersion
+
+
+def store_cache():
+    return caches[getattr(settings, 'STORE_CACHE_ALIAS', 'default')]
+
+
+def table_version(model):
+    """Current change counter of ``model``'s table."""
+    return table_versions([model])[0]
+
+
+def table_versions(models):
+    """
+    Change counters for several tables with a single query.
+
+    The counters live in the database rather than in a cache, so every web worker, celery
+    worker and management command sees the same versions, and a request served from the
+    read replica gets the versions that match the replica's rows.
+    """
+    names = [model._meta.label_lower for model in models]
+    versions = dict(TableVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return [versions.get(name, 0) for name in names]
+
+
+def bump_table_version(*models):
+    """
+    Move the change counters of ``models`` in the current transaction, so a new version
+    commits or rolls back together with the write it describes.
+
+    A missing counter starts from the clock rather than 1, so a recreated row can never
+    come back at a value that older ETags and cached entries were stored under.
+    """
+    # Sorted, so concurrent writers lock the counter rows in the same order
+    names = sorted({model._meta.label_lower for model in models})
+    updated = TableVersion.objects.filter(name__in=names).update(version=F('version') + 1)
+    if updated != len(names):
+        TableVersion.objects.bulk_create(
+            [TableVersion(name=name, version=time.time_ns()) for name in names],
+            ignore_conflicts=True,
+        )
+
+
+def request_fingerprint(request):
+    # Short digest of the full URL, so each page / filter combination is cached separately
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()[:16]
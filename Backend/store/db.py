@@ -0,0 +1,98 @@
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set while a read-only list or search request runs; see ReadReplicaRouter
+_replica_reads = ContextVar('store_replica_reads', default=False)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    connection_created handler applying SQLITE_PRAGMAS to every new SQLite connection.
+
+    WAL lets readers keep reading while a writer commits, synchronous=NORMAL is safe
+    under WAL and skips an fsync per commit, and cache_size / mmap_size keep hot pages
+    in memory. Runs on the raw DB-API cursor, so it stays out of query logs and counts.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    cursor = connection.connection.cursor()
+    try:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def replica_alias():
+    """The configured read replica alias, or None when there is none."""
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+@contextmanager
+def replica_reads():
+    """Let ReadReplicaRouter send the reads made inside the block to the replica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reading_from_replica():
+    # Reads inside a transaction on the primary must see its uncommitted writes
+    return _replica_reads.get() and replica_alias() is not None and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+def snapshot_replica():
+    """Copy the primary SQLite database into the replica file with SQLite's online backup."""
+    alias = replica_alias()
+    if alias is None:
+        raise ValueError('No read replica is configured; set DATABASE_REPLICA_NAME')
+    if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite' or 'sqlite' not in settings.DATABASES[alias]['ENGINE']:
+        raise ValueError('Snapshots are only supported between SQLite databases')
+
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+    try:
+        # One step reads a consistent snapshot; under WAL writers on the primary are not blocked meanwhile
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+class ReadReplicaRouter:
+    """
+    Sends the reads of read-only list and search requests to the replica alias.
+
+    Views opt in with store.api.mixins.ReplicaReadMixin (or run under replica_reads());
+    every other read, all writes and anything inside a transaction on the primary stay on
+    the default database, so a request always sees its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so saving an instance that was read from the replica still writes to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary and is never migrated on its own
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,212 @@
+import csv
+import io
+import re
+
+from django.db import IntegrityError, transaction
+
+from store.cache import bump_table_version
+from store.models import Brand, Category, CodeSequence, Product
+
+# Recognised columns of an import file; category and brand are given by name
+IMPORT_COLUMNS = ('product_code', 'name', 'unit_type', 'category', 'brand', 'barcode')
+IMPORT_FORMATS = ('csv', 'xlsx')
+IMPORT_BATCH_SIZE = 1000
+
+ERROR_REPORT_FIELDS = ('line', 'product_code', 'name', 'error')
+
+# Codes in the shape the sequences hand out (Product.allocate_product_codes / allocate_barcodes)
+SEQUENCE_CODE_PATTERNS = (
+    (CodeSequence.PRODUCT_CODE, 'product_code', re.compile(r'P(\d+)')),
+    (CodeSequence.BARCODE, 'barcode', re.compile(r'20(\d{10})\d')),
+)
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+def iter_csv_rows(file):
+    """Yield one dict per data row of a CSV file opened in binary mode, reading it incrementally."""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def iter_xlsx_rows(file):
+    """Yield one dict per data row of the first sheet, using openpyxl's streaming read-only mode."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError('XLSX import requires the openpyxl package')
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+        for values in rows:
+            yield {column: '' if value is None else str(value) for column, value in zip(header, values)}
+    finally:
+        workbook.close()
+
+
+def iter_import_rows(file, file_format):
+    if file_format == 'csv':
+        return iter_csv_rows(file)
+    if file_format == 'xlsx':
+        return iter_xlsx_rows(file)
+    raise ImportFormatError(f'Unsupported import format: {file_format}')
+
+
+def _clean_row(row):
+    values = {column: str(row.get(column) or '').strip() for column in IMPORT_COLUMNS}
+    if not any(values.values()):
+        return None, None
+    for column in ('name', 'category', 'brand'):
+        if not values[column]:
+            return values, f'{column} is required'
+    for column, max_length in (('product_code', 100), ('barcode', 100), ('unit_type', 100), ('name', 255), ('category', 255), ('brand', 255)):
+        if len(values[column]) > max_length:
+            return values, f'{column} is longer than {max_length} characters'
+    return values, None
+
+
+class ProductImporter:
+    """
+    Upserts products from an iterable of row dicts in batches.
+
+    Categories and brands are resolved by name through in-memory maps and created when
+    missing. Each batch is one ``bulk_create(update_conflicts=True)`` keyed on
+    product_code; new products get their codes and barcodes from block allocations.
+    Rows that fail validation are written to ``error_report`` (a text file) and skipped.
+    """
+
+    def __init__(self, error_report=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.error_writer = csv.writer(error_report) if error_report is not None else None
+        if self.error_writer:
+            self.error_writer.writerow(ERROR_REPORT_FIELDS)
+        self.category_ids = dict(Category.objects.values_list('name', 'id'))
+        self.brand_ids = dict(Brand.objects.values_list('name', 'id'))
+        self.counts = {'rows': 0, 'created': 0, 'updated': 0, 'errors': 0}
+
+    def run(self, rows):
+        batch = []
+        try:
+            # Line 1 is the header row
+            for line, row in enumerate(rows, 2):
+                values, error = _clean_row(row)
+                if values is None:
+                    continue
+                self.counts['rows'] += 1
+                if error:
+                    self.add_error(line, values, error)
+                    continue
+                batch.append((line, values))
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+        finally:
+            # bulk_create bypasses the model signals; the moved versions also make the search index reload
+            bump_table_version(Product, Category, Brand)
+        return self.counts
+
+    def add_error(self, line, values, error):
+        self.counts['errors'] += 1
+        if self.error_writer:
+            self.error_writer.writerow([line, values['product_code'], values['name'], error])
+
+    def resolve_names(self, model, ids, names):
+        missing = {name for name in names if name not in ids}
+        if missing:
+            model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+            ids.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def import_batch(self, batch):
+        # Later rows for the same code or barcode within a batch are reported rather than merged
+        accepted, seen_codes, seen_barcodes = [], set(), set()
+        for line, values in batch:
+            if values['product_code'] and values['product_code'] in seen_codes:
+                self.add_error(line, values, 'duplicate product_code in file')
+            elif values['barcode'] and values['barcode'] in seen_barcodes:
+                self.add_error(line, values, 'duplicate barcode in file')
+            else:
+                seen_codes.add(values['product_code'])
+                seen_barcodes.add(values['barcode'])
+                accepted.append((line, values))
+
+        existing = dict(
+            Product.objects.filter(product_code__in=[code for code in seen_codes if code])
+            .values_list('product_code', 'barcode')
+        )
+        barcode_owners = dict(
+            Product.objects.filter(barcode__in=[barcode for barcode in seen_barcodes if barcode])
+            .values_list('barcode', 'product_code')
+        )
+
+        rows = []
+        for line, values in accepted:
+            owner = barcode_owners.get(values['barcode'])
+            if owner is not None and owner != values['product_code']:
+                self.add_error(line, values, f'barcode already belongs to product {owner}')
+            else:
+                rows.append((line, values))
+        if not rows:
+            return
+
+        self.resolve_names(Category, self.category_ids, {values['category'] for line, values in rows})
+        self.resolve_names(Brand, self.brand_ids, {values['brand'] for line, values in rows})
+
+        new_codes = iter(Product.allocate_product_codes(sum(1 for line, values in rows if not values['product_code'])))
+        new_barcodes = iter(Product.allocate_barcodes(sum(
+            1 for line, values in rows if not values['barcode'] and not existing.get(values['product_code'])
+        )))
+        products = [
+            Product(
+                product_code=values['product_code'] or next(new_codes),
+                barcode=values['barcode'] or existing.get(values['product_code']) or next(new_barcodes),
+                name=values['name'],
+                unit_type=values['unit_type'] or 'pieces',
+                category_id=self.category_ids[values['category']],
+                brand_id=self.brand_ids[values['brand']],
+            )
+            for line, values in rows
+        ]
+
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['product_code'],
+                    update_fields=['name', 'unit_type', 'category', 'brand', 'barcode'],
+                )
+                self.advance_sequences(rows)
+        except IntegrityError as error:
+            # Another writer took a code or barcode since the checks above; report the whole batch
+            for line, values in rows:
+                self.add_error(line, values, f'batch rejected: {error}')
+        else:
+            self.counts['updated'] += sum(1 for line, values in rows if values['product_code'] in existing)
+            self.counts['created'] += sum(1 for line, values in rows if values['product_code'] not in existing)
+
+        if self.progress:
+            self.progress(self.counts)
+
+    def advance_sequences(self, rows):
+        # Codes from the file that look allocated must not be allocated again later
+        for sequence, column, pattern in SEQUENCE_CODE_PATTERNS:
+            matches = [pattern.fullmatch(values[column]) for line, values in rows]
+            highest = max((int(match.group(1)) for match in matches if match), default=None)
+            if highest is not None:
+                CodeSequence.advance(sequence, highest)
+
+
+def import_products(file, file_format, error_report=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Import products from a CSV or XLSX file object and return the row counts."""
+    importer = ProductImporter(error_report=error_report, batch_size=batch_size, progress=progress)
+    return importer.run(iter_import_rows(file, file_format))
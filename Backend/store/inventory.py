@@ -0,0 +1,105 @@
+import csv
+import json
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, F, Min, Sum, Value, When
+from django.utils import timezone
+
+from store.models import ProductInTransactionDetail, StockExpirySummary
+
+# Columns of one inventory line, in export order
+INVENTORY_FIELDS = [
+    'product_code', 'name', 'barcode', 'category_name', 'brand_name',
+    'supplier_name', 'purchase_date', 'stock_quantity', 'manufacturing_date',
+    'expiry_date',
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def inventory_queryset(expired=False):
+    """Transaction detail lines annotated with the product, category, brand and supplier columns."""
+    queryset = ProductInTransactionDetail.objects.annotate(
+        product_code=F('product__product_code'),
+        name=F('product__name'),
+        barcode=F('product__barcode'),
+        category_name=F('product__category__name'),
+        brand_name=F('product__brand__name'),
+        supplier_name=F('transaction__supplier__name'),
+        purchase_date=F('transaction__purchase_date'),
+        stock_quantity=F('quantity'),  # Change 'quantity' to 'stock_quantity'
+    )
+
+    if expired:
+        queryset = queryset.filter(expiry_date__lt=timezone.localdate())
+
+    return queryset
+
+
+def iter_inventory_rows(expired=False):
+    """Yield inventory lines as dicts, fetching ``EXPORT_CHUNK_SIZE`` rows at a time."""
+    rows = inventory_queryset(expired).order_by('id').values(*INVENTORY_FIELDS)
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    # csv.writer target that hands each formatted line straight back
+    def write(self, value):
+        return value
+
+
+def iter_inventory_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(INVENTORY_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in INVENTORY_FIELDS])
+
+
+def iter_inventory_ndjson(rows):
+    for row in rows:
+        yield json.dumps({field: row[field] for field in INVENTORY_FIELDS}, cls=DjangoJSONEncoder) + '\n'
+
+
+# Export format -> (content type, row renderer)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', iter_inventory_csv),
+    'ndjson': ('application/x-ndjson', iter_inventory_ndjson),
+}
+
+
+# Expiry buckets on the stock dashboard, in days from today
+EXPIRY_BUCKETS = (7, 30, 90)
+
+
+def expiry_bucket_annotations(today):
+    """Sum() expressions over StockExpirySummary rows: quantity, value, earliest expiry and expiry buckets."""
+    annotations = {
+        'earliest_expiry': Min('expiry_date'),
+        'expired': Sum(Case(When(expiry_date__lt=today, then='quantity'), default=Value(0))),
+    }
+    for days in EXPIRY_BUCKETS:
+        annotations[f'expiring_{days}_days'] = Sum(Case(
+            When(expiry_date__gte=today, expiry_date__lt=today + timedelta(days=days), then='quantity'),
+            default=Value(0),
+        ))
+    # Added last: once 'quantity' is an annotation, later expressions would resolve it to the Sum
+    annotations['quantity'] = Sum('quantity')
+    annotations['value'] = Sum('value')
+    return annotations
+
+
+def stock_summary_queryset(today=None):
+    """One row per product with stock, aggregated from StockExpirySummary in a single grouped query."""
+    today = today or timezone.localdate()
+    return (
+        StockExpirySummary.objects.filter(quantity__gt=0)
+        .values('product_id', product_code=F('product__product_code'), name=F('product__name'))
+        .annotate(**expiry_bucket_annotations(today))
+        .order_by('earliest_expiry', 'product_id')
+    )
+
+
+def stock_summary_totals(today=None):
+    today = today or timezone.localdate()
+    return StockExpirySummary.objects.filter(quantity__gt=0).aggregate(**expiry_bucket_annotations(today))
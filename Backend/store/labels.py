@@ -0,0 +1,105 @@
+import os
+import tempfile
+from io import BytesIO
+
+import barcode
+from barcode.writer import ImageWriter, SVGWriter
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+from store.models import ean13
+
+# Bump when writer options change so cached images are re-rendered under new names
+LABEL_RENDER_VERSION = 1
+
+IMAGE_FORMATS = {
+    'png': ('image/png', ImageWriter),
+    'svg': ('image/svg+xml', SVGWriter),
+}
+
+# A4 sheet at 200 dpi, 3 x 8 labels
+SHEET_DPI = 200
+SHEET_SIZE = (1654, 2339)
+SHEET_MARGIN = 40
+SHEET_COLUMNS = 3
+SHEET_ROWS = 8
+
+
+def barcode_symbology(value):
+    # Valid EAN-13 codes print as EAN-13; older random 12-digit codes and anything else as Code 128
+    if len(value) == 13 and value.isdigit() and ean13(value[:12]) == value:
+        return 'ean13'
+    return 'code128'
+
+
+def barcode_etag(value):
+    return f'"{barcode_symbology(value)}-{value}-v{LABEL_RENDER_VERSION}"'
+
+
+def barcode_image_path(value, image_format):
+    return os.path.join(
+        settings.MEDIA_ROOT, 'barcodes', f'v{LABEL_RENDER_VERSION}',
+        barcode_symbology(value), f'{value}.{image_format}',
+    )
+
+
+def render_barcode(value, image_format='png'):
+    """
+    Return the path of the rendered barcode image, rendering it only on a cache miss.
+
+    Images are stored under MEDIA_ROOT keyed by barcode value, so a value is rendered
+    once no matter how many labels or sheets use it.
+    """
+    path = barcode_image_path(value, image_format)
+    if os.path.exists(path):
+        return path
+
+    content_type, writer_class = IMAGE_FORMATS[image_format]
+    barcode_class = barcode.get_barcode_class(barcode_symbology(value))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file first so concurrent readers never see a partial image
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            barcode_class(value, writer=writer_class()).write(output)
+        os.replace(temporary_path, path)
+    except Exception:
+        os.unlink(temporary_path)
+        raise
+    return path
+
+
+def render_label_sheet(products, copies=1):
+    """Render PDF label sheets for ``products`` (objects with name, product_code and barcode)."""
+    font = ImageFont.load_default(size=22)
+    cell_width = (SHEET_SIZE[0] - 2 * SHEET_MARGIN) // SHEET_COLUMNS
+    cell_height = (SHEET_SIZE[1] - 2 * SHEET_MARGIN) // SHEET_ROWS
+    labels_per_page = SHEET_COLUMNS * SHEET_ROWS
+
+    labels = [product for product in products if product.barcode for _ in range(copies)]
+    pages = []
+    current_barcode, current_image = None, None
+    for start in range(0, len(labels), labels_per_page):
+        page = Image.new('L', SHEET_SIZE, 255)
+        draw = ImageDraw.Draw(page)
+        for slot, product in enumerate(labels[start:start + labels_per_page]):
+            left = SHEET_MARGIN + (slot % SHEET_COLUMNS) * cell_width
+            top = SHEET_MARGIN + (slot // SHEET_COLUMNS) * cell_height
+            draw.text((left + 10, top + 6), f'{product.product_code or ""} {product.name}'[:40], fill=0, font=font)
+
+            # Copies of a label are adjacent, so only the latest image needs to stay loaded
+            if product.barcode != current_barcode:
+                with Image.open(render_barcode(product.barcode, 'png')) as image:
+                    current_image = image.convert('L')
+                current_image.thumbnail((cell_width - 20, cell_height - 44))
+                current_barcode = product.barcode
+            page.paste(current_image, (left + 10, top + 36))
+
+        # Labels are black and white; 1-bit pages keep large sheets small in memory
+        pages.append(page.point(lambda value: 255 if value > 128 else 0, '1'))
+
+    output = BytesIO()
+    if pages:
+        pages[0].save(output, 'PDF', resolution=SHEET_DPI, save_all=True, append_images=pages[1:])
+    return output.getvalue()
@@ -0,0 +1,156 @@
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from store.cache import bump_table_version
+from store.models import LotAllocation, ProductInTransactionDetail, StockLedger
+from store.stock import InsufficientStock, apply_expiry_summary_deltas, apply_stock_deltas, lot_value
+
+# Lots read per step of an allocation scan; most allocations are covered by the first few lots
+FEFO_SCAN_SIZE = 20
+# Attempts when another writer takes units from a picked lot between the scan and the update
+FEFO_RETRIES = 3
+
+
+class LotContention(Exception):
+    """Raised when concurrent allocations kept emptying the picked lots for FEFO_RETRIES attempts."""
+
+    def __init__(self, product_ids):
+        super().__init__(f'Lots of products {sorted(product_ids)} changed during every allocation attempt')
+        self.product_ids = product_ids
+
+
+class ReceiptInUse(Exception):
+    """Raised when a receipt cannot be reversed because units of its lots were already allocated."""
+
+    def __init__(self, detail_ids):
+        super().__init__(f'Lots {detail_ids} have allocations')
+        self.detail_ids = detail_ids
+
+
+# One picked lot: its row as read under the lock and the units taken from it
+LotPick = namedtuple('LotPick', ['lot_id', 'product_id', 'expiry_date', 'remaining', 'quantity', 'total', 'units'])
+
+
+def open_lots(product_id, include_expired=False):
+    """Lots of a product with units left, first expiry first, read through store_detail_fefo_idx."""
+    lots = ProductInTransactionDetail.objects.filter(product_id=product_id, remaining_quantity__gt=0)
+    if not include_expired:
+        lots = lots.filter(expiry_date__gte=timezone.localdate())
+    return lots.order_by('expiry_date', 'id')
+
+
+def expired_lots(product_id):
+    """Expired lots of a product that still hold units, first expiry first."""
+    return ProductInTransactionDetail.objects.filter(
+        product_id=product_id, remaining_quantity__gt=0, expiry_date__lt=timezone.localdate(),
+    ).order_by('expiry_date', 'id')
+
+
+def _scan_lots(lots, quantity):
+    """
+    Pick up to ``quantity`` units from ``lots`` (ordered by expiry_date, id) and return
+    ``(picks, units not covered)``.
+
+    Lots are read FEFO_SCAN_SIZE at a time with row locks, continuing after the last
+    (expiry_date, id) seen, so only the lots that are needed are ever loaded.
+    """
+    picks, needed, after = [], quantity, None
+    while needed > 0:
+        batch = lots.select_for_update()
+        if after is not None:
+            batch = batch.filter(expiry_date__gte=after[0]).exclude(expiry_date=after[0], id__lte=after[1])
+        batch = list(batch.values_list('id', 'product_id', 'expiry_date', 'remaining_quantity', 'quantity', 'total')[:FEFO_SCAN_SIZE])
+        for row in batch:
+            units = min(row[3], needed)
+            picks.append(LotPick(*row, units))
+            needed -= units
+            if not needed:
+                break
+        if len(batch) < FEFO_SCAN_SIZE:
+            break
+        after = (batch[-1][2], batch[-1][0])
+    return picks, needed
+
+
+def _take_lots(picks, reference):
+    """
+    Decrement the picked lots with one guarded UPDATE, record the allocations and take the
+    units out of StockExpirySummary. Returns False, writing nothing, when a concurrent
+    allocation emptied a picked lot first.
+    """
+    if not picks:
+        return True
+    units = {pick.lot_id: pick.units for pick in picks}
+    taken = Case(
+        *[When(id=lot_id, then=Value(count)) for lot_id, count in units.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    updated = ProductInTransactionDetail.objects.filter(
+        id__in=units, remaining_quantity__gte=taken,
+    ).update(remaining_quantity=F('remaining_quantity') - taken)
+    if updated != len(units):
+        return False
+    LotAllocation.objects.bulk_create([
+        LotAllocation(lot_id=lot_id, quantity=count, reference=reference) for lot_id, count in units.items()
+    ])
+    apply_expiry_summary_deltas([
+        (
+            pick.product_id, pick.expiry_date, -pick.units,
+            lot_value(pick.total, pick.quantity, pick.remaining - pick.units) - lot_value(pick.total, pick.quantity, pick.remaining),
+        )
+        for pick in picks
+    ])
+    bump_table_version(ProductInTransactionDetail, LotAllocation)
+    return True
+
+
+def allocate_lots(product_id, quantity, reference='', include_expired=False):
+    """
+    Take ``quantity`` units of a product from its lots, first expiry first, and return
+    the allocations as ``[(lot_id, expiry_date, units)]``.
+
+    An allocation is a stock-out: the picked lots are decremented with one guarded
+    UPDATE, the allocations are bulk inserted and the units are taken out of central
+    TotalStock with a ledger row, all in the same transaction, so a later sale never takes
+    the same units again. If a concurrent allocation emptied a picked lot first, the guard
+    matches fewer rows and the pick is retried. InsufficientStock is raised when the open
+    lots or central stock cannot cover the quantity, and LotContention when every retry
+    lost a race. Expired lots are skipped unless ``include_expired`` is set.
+    """
+    for attempt in range(FEFO_RETRIES):
+        with transaction.atomic():
+            picks, needed = _scan_lots(open_lots(product_id, include_expired), quantity)
+            if needed:
+                raise InsufficientStock({product_id: quantity - needed})
+            if _take_lots(picks, reference):
+                apply_stock_deltas({product_id: -quantity}, StockLedger.ALLOCATION, reference, guarded=True)
+                return [(pick.lot_id, pick.expiry_date, pick.units) for pick in picks]
+            transaction.set_rollback(True)
+    raise LotContention([product_id])
+
+
+def consume_sold_lots(quantities, reference=''):
+    """
+    Take sold ``{product_id: quantity}`` out of the lots and return the picks.
+
+    Unexpired lots are used first expiry first, then expired lots that are still counted
+    in stock. The caller has already taken the units out of TotalStock with a guarded
+    decrement, so units the lots cannot cover are not an oversell and are left uncovered.
+    Every product is taken with the same guarded UPDATE, retried like allocate_lots.
+    """
+    for attempt in range(FEFO_RETRIES):
+        with transaction.atomic():
+            picks = []
+            for product_id, quantity in quantities.items():
+                found, needed = _scan_lots(open_lots(product_id), quantity)
+                if needed:
+                    found += _scan_lots(expired_lots(product_id), needed)[0]
+                picks += found
+            if _take_lots(picks, reference):
+                return picks
+            transaction.set_rollback(True)
+    raise LotContention(list(quantities))
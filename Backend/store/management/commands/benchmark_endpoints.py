@@ -0,0 +1,37 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.benchmark import compare_with_baseline, run_benchmark
+from store.models import ProductInTransactionDetail
+
+
+class Command(BaseCommand):
+    help = 'Record p50/p95 latency and query counts for every store and auth endpoint into a JSON baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--output', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'))
+        parser.add_argument('--compare', help='Baseline JSON to compare against; exits with an error on regressions')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative p95 increase (default 0.25)')
+
+    def handle(self, *args, **options):
+        if not ProductInTransactionDetail.objects.exists():
+            raise CommandError('The database has no stock receipts; run `manage.py seed_store` first')
+
+        result = run_benchmark(options['iterations'], progress=lambda message: self.stdout.write(message))
+        os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+        with open(options['output'], 'w') as output:
+            json.dump(result, output, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(result["endpoints"])} endpoint results to {options["output"]}'))
+        if result['not_covered']:
+            self.stdout.write(self.style.WARNING(f'Endpoints without a benchmark case: {", ".join(result["not_covered"])}'))
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                regressions = compare_with_baseline(result, json.load(baseline_file), options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,29 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.benchmark import run_throughput_benchmark
+from store.models import ProductInTransactionDetail
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent throughput of the sync read endpoints under WSGI with their async variants under ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and path')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once')
+        parser.add_argument('--output', help='Also write the result as JSON to this file')
+
+    def handle(self, *args, **options):
+        if not ProductInTransactionDetail.objects.exists():
+            raise CommandError('The database has no stock receipts; run `manage.py seed_store` first')
+
+        result = run_throughput_benchmark(
+            options['requests'], options['concurrency'], progress=lambda message: self.stdout.write(message),
+        )
+        if options['output']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+            with open(options['output'], 'w') as output:
+                json.dump(result, output, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Wrote throughput results to {options["output"]}'))
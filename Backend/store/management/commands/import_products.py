@@ -0,0 +1,37 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.imports import IMPORT_BATCH_SIZE, IMPORT_FORMATS, ImportFormatError, import_products
+
+
+class Command(BaseCommand):
+    help = 'Create or update products from a CSV or XLSX file (columns: product_code, name, unit_type, category, brand, barcode)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='File format; defaults to the file extension')
+        parser.add_argument('--errors', default='import-errors.csv', help='Where to write rejected rows (default: import-errors.csv)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f'Cannot tell the format of {options["path"]}; pass --format')
+
+        def progress(counts):
+            self.stdout.write(f'{counts["rows"]} rows read, {counts["errors"]} rejected')
+
+        try:
+            with open(options['path'], 'rb') as file, open(options['errors'], 'w', newline='') as error_report:
+                counts = import_products(file, file_format, error_report, options['batch_size'], progress)
+        except ImportFormatError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {counts["created"]}, updated {counts["updated"]} products; {counts["errors"]} rows rejected'
+        ))
+        if counts['errors']:
+            self.stdout.write(f'Rejected rows written to {options["errors"]}')
+        else:
+            os.remove(options['errors'])
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from store.seed import SEED_BATCH_SIZE, seed_store
+
+
+class Command(BaseCommand):
+    help = 'Fill the store tables with generated products and stock receipts for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--details', type=int, default=1_000_000, help='Number of transaction detail lines')
+        parser.add_argument('--batch-size', type=int, default=SEED_BATCH_SIZE)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data sets')
+
+    def handle(self, *args, **options):
+        counts = seed_store(
+            products=options['products'], details=options['details'],
+            batch_size=options['batch_size'], seed=options['seed'],
+            progress=lambda message: self.stdout.write(message),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {counts["products"]} products, {counts["transactions"]} transactions, {counts["details"]} details'
+        ))
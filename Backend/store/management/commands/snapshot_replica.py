@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.db import replica_alias, snapshot_replica
+
+
+class Command(BaseCommand):
+    help = 'Refresh the SQLite read replica with a consistent copy of the primary database'
+
+    def handle(self, *args, **options):
+        try:
+            snapshot_replica()
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f'Copied the primary database into the {replica_alias()!r} replica'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from store.stock import rebuild_total_stock, verify_total_stock
+
+
+class Command(BaseCommand):
+    help = 'Compare TotalStock with the stock ledger and optionally rebuild drifted rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=int, help='Only check products with ledger entries newer than this ledger id')
+        parser.add_argument('--rebuild', action='store_true', help='Overwrite drifted TotalStock rows with the ledger sums')
+
+    def handle(self, *args, **options):
+        mismatches = verify_total_stock(since_ledger_id=options['since'])
+        for product_id, (stored, expected) in sorted(mismatches.items()):
+            self.stdout.write(f'Product {product_id}: stored {stored}, ledger {expected}')
+
+        if mismatches and options['rebuild']:
+            rebuild_total_stock(list(mismatches))
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(mismatches)} TotalStock rows'))
+        elif not mismatches:
+            self.stdout.write(self.style.SUCCESS('TotalStock matches the ledger'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    # Continue numbering after the highest code already handed out
+    CodeSequence = apps.get_model('store', 'CodeSequence')
+    Product = apps.get_model('store', 'Product')
+    Branch = apps.get_model('store', 'Branch')
+
+    def highest(codes, prefix, default):
+        values = [int(code[len(prefix):]) for code in codes if code and code.startswith(prefix) and code[len(prefix):].isdigit()]
+        return max(values, default=default)
+
+    product_codes = Product.objects.filter(product_code__startswith='P').values_list('product_code', flat=True)
+    branch_codes = Branch.objects.filter(branch_code__startswith='BR').values_list('branch_code', flat=True)
+    CodeSequence.objects.bulk_create([
+        CodeSequence(name='product_code', last_value=highest(product_codes, 'P', 5000)),
+        CodeSequence(name='branch_code', last_value=highest(branch_codes, 'BR', 121210)),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_remove_product_supplier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    # Start the ledger from the current TotalStock so ledger sums match stored totals
+    StockLedger = apps.get_model('store', 'StockLedger')
+    TotalStock = apps.get_model('store', 'TotalStock')
+    StockLedger.objects.bulk_create(
+        [
+            StockLedger(product_id=product_id, quantity=quantity, reason='opening_balance')
+            for product_id, quantity in TotalStock.objects.exclude(total_quantity=0).values_list('product_id', 'total_quantity')
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_codesequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening_balance', 'Opening balance'), ('receipt', 'Receipt'), ('receipt_adjustment', 'Receipt adjustment'), ('receipt_reversal', 'Receipt reversal')], max_length=30)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_ledger', to='store.product')),
+            ],
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def deduplicate_product_codes(apps, schema_editor):
+    # Concurrent inserts could hand out the same code; give later duplicates fresh codes
+    Product = apps.get_model('store', 'Product')
+    CodeSequence = apps.get_model('store', 'CodeSequence')
+
+    Product.objects.filter(product_code='').update(product_code=None)
+    duplicated = list(
+        Product.objects.exclude(product_code=None)
+        .values('product_code').annotate(rows=Count('id')).filter(rows__gt=1)
+        .values_list('product_code', flat=True)
+    )
+    if not duplicated:
+        return
+
+    existing = [
+        int(code[1:]) for code in Product.objects.filter(product_code__startswith='P').values_list('product_code', flat=True)
+        if code[1:].isdigit()
+    ]
+    sequence, _ = CodeSequence.objects.get_or_create(name='product_code', defaults={'last_value': 5000})
+    next_value = max([sequence.last_value] + existing)
+    for product_code in duplicated:
+        for product in Product.objects.filter(product_code=product_code).order_by('id')[1:]:
+            next_value += 1
+            Product.objects.filter(id=product.id).update(product_code=f'P{next_value}')
+    CodeSequence.objects.filter(name='product_code').update(last_value=next_value)
+
+
+def create_trigram_index(apps, schema_editor):
+    # icontains searches on PostgreSQL compare UPPER(product_code::text); SQLite has no trigram support
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS store_product_code_trgm_idx '
+        'ON store_product USING gin (UPPER(product_code::text) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS store_product_code_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_stockledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_product_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='product_code',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='productintransactiondetail',
+            index=models.Index(fields=['expiry_date'], name='store_detail_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productintransactiondetail',
+            index=models.Index(fields=['product', 'expiry_date'], name='store_detail_product_exp_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
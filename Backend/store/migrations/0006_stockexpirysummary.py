@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def build_expiry_summary(apps, schema_editor):
+    StockExpirySummary = apps.get_model('store', 'StockExpirySummary')
+    ProductInTransactionDetail = apps.get_model('store', 'ProductInTransactionDetail')
+    rows = (
+        ProductInTransactionDetail.objects.values('product_id', 'expiry_date')
+        .annotate(total_quantity=Sum('quantity'), total_value=Sum('total'))
+        .order_by()
+    )
+    StockExpirySummary.objects.bulk_create(
+        [
+            StockExpirySummary(
+                product_id=row['product_id'], expiry_date=row['expiry_date'],
+                quantity=row['total_quantity'], value=row['total_value'],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_inventory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockExpirySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expiry_date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expiry_summary', to='store.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expiry_date'], name='store_expiry_summary_exp_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockexpirysummary',
+            constraint=models.UniqueConstraint(fields=('product', 'expiry_date'), name='store_expiry_summary_unique'),
+        ),
+        migrations.RunPython(build_expiry_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_stockexpirysummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productintransaction',
+            name='purchase_date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def open_existing_lots(apps, schema_editor):
+    # Nothing has been allocated yet, so every existing lot is still whole
+    ProductInTransactionDetail = apps.get_model('store', 'ProductInTransactionDetail')
+    ProductInTransactionDetail.objects.update(remaining_quantity=F('quantity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_branch_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='productintransactiondetail',
+            name='remaining_quantity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(open_existing_lots, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='productintransactiondetail',
+            index=models.Index(condition=models.Q(('remaining_quantity__gt', 0)), fields=['product', 'expiry_date', 'id'], name='store_detail_fefo_idx'),
+        ),
+        migrations.AddField(
+            model_name='lotallocation',
+            name='lot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='store.productintransactiondetail'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:19
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_lot_allocation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockledger',
+            name='reason',
+            field=models.CharField(choices=[('opening_balance', 'Opening balance'), ('receipt', 'Receipt'), ('receipt_adjustment', 'Receipt adjustment'), ('receipt_reversal', 'Receipt reversal'), ('sale', 'Sale')], max_length=30),
+        ),
+        migrations.CreateModel(
+            name='Sale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='store.branch')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SaleLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product')),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='store.sale')),
+            ],
+        ),
+    ]
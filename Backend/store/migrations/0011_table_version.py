@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:43
+
+import time
+
+from django.db import migrations, models
+
+
+def seed_versions(apps, schema_editor):
+    # A counter row for every store table, so bumping a version is a single UPDATE
+    TableVersion = apps.get_model('store', 'TableVersion')
+    TableVersion.objects.bulk_create([
+        TableVersion(name=model._meta.label_lower, version=time.time_ns())
+        for model in apps.get_app_config('store').get_models()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
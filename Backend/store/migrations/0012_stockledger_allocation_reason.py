@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_table_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockledger',
+            name='reason',
+            field=models.CharField(choices=[('opening_balance', 'Opening balance'), ('receipt', 'Receipt'), ('receipt_adjustment', 'Receipt adjustment'), ('receipt_reversal', 'Receipt reversal'), ('sale', 'Sale'), ('allocation', 'Lot allocation')], max_length=30),
+        ),
+    ]
@@ -14,6 +14,8 @@ import barcode
 from barcode.writer import ImageWriter
 from io import BytesIO
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import F
 
 # Supplier model
 class Supplier(models.Model):
@@ -41,24 +43,82 @@ class Brand(models.Model):
 
 
 
+# Code sequences: one counter row per code series (product codes, branch codes, ...)
+class CodeSequence(models.Model):
+    PRODUCT_CODE = 'product_code'
+    BRANCH_CODE = 'branch_code'
+    BARCODE = 'barcode'
+
+    # First value handed out for each series when its counter row does not exist yet
+    START_VALUES = {
+        PRODUCT_CODE: 5001,
+        BRANCH_CODE: 121211,
+        BARCODE: 1,
+    }
+
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    @classmethod
+    def allocate(cls, name, count=1):
+        """
+        Reserve ``count`` consecutive values of the ``name`` series and return them as a range.
+
+        The reservation is a single ``UPDATE ... SET last_value = last_value + count``; the
+        row stays locked until the surrounding transaction ends, so concurrent callers
+        always receive disjoint blocks.
+        """
+        with transaction.atomic():
+            updated = cls.objects.filter(name=name).update(last_value=F('last_value') + count)
+            if not updated:
+                cls.objects.get_or_create(name=name, defaults={'last_value': cls.START_VALUES.get(name, 1) - 1})
+                cls.objects.filter(name=name).update(last_value=F('last_value') + count)
+            last_value = cls.objects.filter(name=name).values_list('last_value', flat=True).get()
+        return range(last_value - count + 1, last_value + 1)
+
+    @classmethod
+    def advance(cls, name, value):
+        """
+        Move the ``name`` series up to ``value`` when that code was assigned without
+        allocate(), e.g. taken from an import file, so it is never handed out again.
+        """
+        with transaction.atomic():
+            cls.objects.get_or_create(name=name, defaults={'last_value': cls.START_VALUES.get(name, 1) - 1})
+            cls.objects.filter(name=name, last_value__lt=value).update(last_value=value)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+
+# Table versions: one change counter per table, moved by store.cache.bump_table_version in the
+# same transaction as the write; ETags and cached lists are keyed by them
+class TableVersion(models.Model):
+    name = models.CharField(max_length=100, primary_key=True)  # model label, e.g. "store.product"
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+def ean13(digits):
+    """Append the EAN-13 check digit to a 12-digit string."""
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(digits))
+    return f'{digits}{(10 - total % 10) % 10}'
+
+
 # Product Model
 class Product(models.Model):
     name = models.CharField(max_length=255)
     unit_type = models.CharField(max_length=100, default='pieces')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='products')
-    product_code = models.CharField(max_length=100, blank=True, null=True)  # Allow null and blank
+    product_code = models.CharField(max_length=100, unique=True, blank=True, null=True)  # Allow null and blank
     barcode = models.CharField(max_length=100, unique=True, blank=True, null=True)
 
     def save(self, *args, **kwargs):
         # Generate a product code if not provided
         if not self.product_code:
-            last_product = Product.objects.filter(product_code__startswith='P').order_by('-id').first()
-            if last_product and last_product.product_code:
-                last_code = int(last_product.product_code[1:])  # Strip the 'P' and convert to int
-                self.product_code = f'P{last_code + 1}'
-            else:
-                self.product_code = 'P5001'  # Start from P5001 if no products exist
+            self.product_code = Product.allocate_product_codes()[0]
 
         # Generate barcode if not provided
         if not self.barcode:
@@ -66,11 +126,18 @@ class Product(models.Model):
         
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def allocate_product_codes(count=1):
+        # P5001, P5002, ... reserved in one statement regardless of count
+        return [f'P{value}' for value in CodeSequence.allocate(CodeSequence.PRODUCT_CODE, count)]
+
+    @staticmethod
+    def allocate_barcodes(count=1):
+        # EAN-13 codes in the GS1 in-store range (prefix 20) built from a sequence, so no existence probe is needed
+        return [ean13(f'20{value:010d}') for value in CodeSequence.allocate(CodeSequence.BARCODE, count)]
+
     def generate_unique_barcode(self):
-        while True:
-            barcode_number = get_random_string(12, allowed_chars='0123456789')
-            if not Product.objects.filter(barcode=barcode_number).exists():
-                return barcode_number
+        return Product.allocate_barcodes()[0]
 
     def __str__(self):
         return self.name
@@ -78,19 +145,11 @@ class Product(models.Model):
 # ProductInTransaction Model
 class ProductInTransaction(models.Model):
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
-    purchase_date = models.DateField(default=timezone.now)
+    purchase_date = models.DateField(default=timezone.localdate)
     supplier_invoice_number = models.CharField(max_length=100)
     supplier_date = models.DateField()  # Date provided by the supplier
     remarks = models.TextField(blank=True, null=True)  # Remarks or comments about the transaction
 
-    def save(self, *args, **kwargs):
-        super(ProductInTransaction, self).save(*args, **kwargs)
-        # Update stock for all products after the transaction is saved
-        for detail in self.transaction_details.all():
-            product_total_stock, created = TotalStock.objects.get_or_create(product=detail.product)
-            product_total_stock.total_quantity += detail.quantity
-            product_total_stock.save()
-
     def __str__(self):
         return f"Transaction {self.id} - {self.supplier.name} on {self.purchase_date}"
 
@@ -102,22 +161,97 @@ class ProductInTransactionDetail(models.Model):
     expiry_date = models.DateField()
     quantity = models.PositiveIntegerField()
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    # Units of this lot not yet allocated (store.lots); bulk inserts must set it to quantity
+    remaining_quantity = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Expired / expiring-soon filters on the inventory list
+            models.Index(fields=['expiry_date'], name='store_detail_expiry_idx'),
+            # Per-product lots in expiry order
+            models.Index(fields=['product', 'expiry_date'], name='store_detail_product_exp_idx'),
+            # Open lots per product in first-expiry-first-out order; emptied lots drop out of the index
+            models.Index(
+                fields=['product', 'expiry_date', 'id'], name='store_detail_fefo_idx',
+                condition=models.Q(remaining_quantity__gt=0),
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        # We won't update the stock here; it will be done after the entire transaction is saved.
+        # Stock is not updated here; callers post quantity changes through store.stock
+        if self._state.adding and not self.remaining_quantity:
+            self.remaining_quantity = self.quantity
         super(ProductInTransactionDetail, self).save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity} units"
 
-# TotalStock Model
+# LotAllocation Model: units taken from a receipt lot by store.lots.allocate_lots
+class LotAllocation(models.Model):
+    lot = models.ForeignKey(ProductInTransactionDetail, on_delete=models.CASCADE, related_name='allocations')
+    quantity = models.PositiveIntegerField()
+    reference = models.CharField(max_length=100, blank=True)  # e.g. "sale:42"
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Lot {self.lot_id}: {self.quantity} units ({self.reference})"
+
+# TotalStock Model: stock across the business; branch_quantity of it has been transferred to
+# branches (see BranchStock) and the rest is central stock
 class TotalStock(models.Model):
     product = models.OneToOneField(Product, on_delete=models.CASCADE)
     total_quantity = models.PositiveIntegerField(default=0)
+    branch_quantity = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.product.name}: {self.total_quantity} units"
 
+# StockExpirySummary Model: units and value left in the lots per product and expiry date,
+# maintained in the same transaction as every ProductInTransactionDetail change
+class StockExpirySummary(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='expiry_summary')
+    expiry_date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'expiry_date'], name='store_expiry_summary_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expiry_date'], name='store_expiry_summary_exp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} expiring {self.expiry_date}: {self.quantity} units"
+
+# StockLedger Model: append-only history of every TotalStock change
+class StockLedger(models.Model):
+    OPENING_BALANCE = 'opening_balance'
+    RECEIPT = 'receipt'
+    RECEIPT_ADJUSTMENT = 'receipt_adjustment'
+    RECEIPT_REVERSAL = 'receipt_reversal'
+    SALE = 'sale'
+    ALLOCATION = 'allocation'
+
+    REASON_CHOICES = [
+        (OPENING_BALANCE, 'Opening balance'),
+        (RECEIPT, 'Receipt'),
+        (RECEIPT_ADJUSTMENT, 'Receipt adjustment'),
+        (RECEIPT_REVERSAL, 'Receipt reversal'),
+        (SALE, 'Sale'),
+        (ALLOCATION, 'Lot allocation'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_ledger')
+    quantity = models.IntegerField()  # Signed change applied to TotalStock.total_quantity
+    reason = models.CharField(max_length=30, choices=REASON_CHOICES)
+    reference = models.CharField(max_length=100, blank=True)  # e.g. "transaction:12"
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity:+d} ({self.reason})"
+
 
 # Branch model
 class Branch(models.Model):
@@ -128,19 +262,69 @@ class Branch(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.branch_code:
-            last_branch = Branch.objects.order_by('-branch_code').first()
-            if last_branch and last_branch.branch_code.startswith("BR"):
-                last_code = int(last_branch.branch_code[2:])
-                new_code = last_code + 1
-            else:
-                new_code = 121211
-            self.branch_code = f'BR{new_code}'
+            self.branch_code = Branch.allocate_branch_codes()[0]
 
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def allocate_branch_codes(count=1):
+        return [f'BR{value}' for value in CodeSequence.allocate(CodeSequence.BRANCH_CODE, count)]
+
     def __str__(self):
         return self.name
 
 
- 
+# BranchStock Model: units of a product held at a branch, changed only by store.stock.transfer_stock
+class BranchStock(models.Model):
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='stock')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='branch_stock')
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index behind per-branch listings and (branch, product) availability checks
+            models.UniqueConstraint(fields=['branch', 'product'], name='store_branch_stock_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch_id} / {self.product_id}: {self.quantity} units"
+
+# StockTransfer Model: stock moved to a branch, from another branch or from central stock (no from_branch)
+class StockTransfer(models.Model):
+    from_branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name='transfers_out', blank=True, null=True,
+    )
+    to_branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='transfers_in', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    remarks = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Transfer {self.id}: {self.from_branch_id or 'central'} -> {self.to_branch_id or 'central'}"
+
+# StockTransferLine Model
+class StockTransferLine(models.Model):
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity} units"
+
+# Sale Model: a POS stock-out, from a branch or from central stock (no branch)
+class Sale(models.Model):
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='sales', blank=True, null=True)
+    reference = models.CharField(max_length=100, blank=True)  # POS receipt number
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Sale {self.id} at {self.branch_id or 'central'}"
+
+# SaleLine Model
+class SaleLine(models.Model):
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity} units"
 
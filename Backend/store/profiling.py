@@ -0,0 +1,227 @@
+import heapq
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+# Per-request counters; None when the current request is not being profiled
+_current_profile = ContextVar('store_request_profile', default=None)
+
+
+class RequestProfile:
+    __slots__ = ('started', 'sql_count', 'sql_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+
+def _sql_timer(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_time += time.perf_counter() - started
+        profile.sql_count += 1
+
+
+def _install_sql_timer(connection, **kwargs):
+    # Kept on the connection for good, so queries the async ORM runs in worker threads are seen too
+    if _sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_timer)
+
+
+def _timed(method):
+    # Only the outermost serializer call is timed, so nested serializers are not counted twice
+    def wrapper(self, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None or profile.serializer_depth:
+            return method(self, *args, **kwargs)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profile.serializer_time += time.perf_counter() - started
+            profile.serializer_depth -= 1
+    wrapper.__wrapped__ = method
+    return wrapper
+
+
+_serializers_instrumented = False
+
+
+def instrument_serializers():
+    """Time DRF serializer validation and rendering; costs one ContextVar lookup when not profiling."""
+    global _serializers_instrumented
+    if _serializers_instrumented:
+        return
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        for name in ('to_representation', 'run_validation'):
+            setattr(serializer_class, name, _timed(getattr(serializer_class, name)))
+    _serializers_instrumented = True
+
+
+class EndpointStats:
+    """
+    Rolling per-process request timings.
+
+    Keeps the last ``window`` durations per endpoint (method + URL route) and the
+    ``top`` slowest individual requests. Recording is a dict lookup, a deque append and
+    a bounded heap push under one lock.
+    """
+
+    def __init__(self, window=200, top=20):
+        self.window = window
+        self.top = top
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._slowest = []
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self._slowest = []
+
+    def record(self, endpoint, path, duration, sql_count, sql_time, serializer_time, size):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {'count': 0, 'durations': deque(maxlen=self.window), 'sql_counts': deque(maxlen=self.window)}
+            stats['count'] += 1
+            stats['durations'].append(duration)
+            stats['sql_counts'].append(sql_count)
+
+            entry = (duration, endpoint, path, sql_count, sql_time, serializer_time, size)
+            if len(self._slowest) < self.top:
+                heapq.heappush(self._slowest, entry)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = [
+                (endpoint, stats['count'], sorted(stats['durations']), sum(stats['sql_counts']) / len(stats['sql_counts']))
+                for endpoint, stats in self._endpoints.items()
+            ]
+            slowest = sorted(self._slowest, reverse=True)
+
+        summary = [
+            {
+                'endpoint': endpoint,
+                'requests': count,
+                'p50_ms': round(durations[len(durations) // 2] * 1000, 2),
+                'p95_ms': round(durations[min(int(len(durations) * 0.95), len(durations) - 1)] * 1000, 2),
+                'max_ms': round(durations[-1] * 1000, 2),
+                'mean_queries': round(mean_queries, 1),
+            }
+            for endpoint, count, durations, mean_queries in endpoints
+        ]
+        summary.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return {
+            'endpoints': summary[:self.top],
+            'slowest_requests': [
+                {
+                    'endpoint': endpoint, 'path': path, 'duration_ms': round(duration * 1000, 2),
+                    'sql_queries': sql_count, 'sql_ms': round(sql_time * 1000, 2),
+                    'serializer_ms': round(serializer_time * 1000, 2), 'response_bytes': size,
+                }
+                for duration, endpoint, path, sql_count, sql_time, serializer_time, size in slowest
+            ],
+        }
+
+
+endpoint_stats = EndpointStats(
+    window=getattr(settings, 'STORE_PROFILING_WINDOW', 200),
+    top=getattr(settings, 'STORE_PROFILING_TOP_N', 20),
+)
+
+
+class RequestProfilingMiddleware:
+    """
+    Opt-in request profiling.
+
+    With STORE_PROFILING = 'request', only requests sending ``X-Profile: 1`` or
+    ``?_profile=1`` are profiled; with 'always' every request is; 'off' disables it.
+    Profiled responses get a ``Server-Timing`` header with SQL count and time,
+    serializer time, total time and response size, and are added to ``endpoint_stats``.
+    Works under both WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.mode = getattr(settings, 'STORE_PROFILING', 'off')
+        if self.mode != 'off':
+            instrument_serializers()
+            connection_created.connect(_install_sql_timer, dispatch_uid='store-profiling-sql-timer')
+
+    def should_profile(self, request):
+        if self.mode == 'always':
+            return True
+        return self.mode == 'request' and (
+            request.headers.get('X-Profile') == '1' or request.GET.get('_profile') == '1'
+        )
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        for connection in connections.all(initialized_only=False):
+            _install_sql_timer(connection)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.should_profile(request):
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        duration = time.perf_counter() - profile.started
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.sql_time * 1000:.2f};desc="{profile.sql_count} queries"',
+            f'serializer;dur={profile.serializer_time * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+            f'size;desc="{size if size is not None else "streamed"} bytes"',
+        ])
+
+        match = request.resolver_match
+        route = match.route if match else 'unresolved'
+        endpoint_stats.record(
+            f'{request.method} /{route}', request.path, duration,
+            profile.sql_count, profile.sql_time, profile.serializer_time, size,
+        )
+        return response
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from store.cache import bump_table_version
+from store.lots import consume_sold_lots
+from store.models import BranchStock, Sale, SaleLine, StockLedger, TotalStock
+from store.stock import STOCK_UPDATE_CHUNK_SIZE, InsufficientStock, debit_sold_stock, net_deltas
+
+
+def _grouped_quantities(sales):
+    """Net ``{branch_code: {product_id: quantity}}`` over a list of sales."""
+    groups = defaultdict(lambda: defaultdict(int))
+    for sale in sales:
+        for product_id, quantity in sale['lines'].items():
+            groups[sale['branch']][product_id] += quantity
+    return groups
+
+
+def _admit(sales, shortages):
+    """
+    Split ``sales`` into those that fit the units left for the short ``(branch, product)``
+    keys, taken in arrival order, and the rejected rest with their short products.
+    """
+    left = dict(shortages)
+    admitted, rejected = [], []
+    for sale in sales:
+        short = [
+            product_id for product_id, quantity in sale['lines'].items()
+            if (sale['branch'], product_id) in left and left[(sale['branch'], product_id)] < quantity
+        ]
+        if short:
+            rejected.append((sale, short))
+            continue
+        for product_id, quantity in sale['lines'].items():
+            if (sale['branch'], product_id) in left:
+                left[(sale['branch'], product_id)] -= quantity
+        admitted.append(sale)
+    return admitted, rejected
+
+
+def record_sales(sales):
+    """
+    Commit a batch of sales in one transaction and return one result per sale, in order.
+
+    Each sale is ``{'branch': code or None, 'reference': str, 'lines': {product_id: quantity}}``.
+    Quantities are netted per branch and product and taken with guarded set-based
+    decrements (store.stock.debit_sold_stock). When a product would be oversold, the
+    decrements are rolled back to a savepoint, the sales that still fit are admitted in
+    arrival order and the rest are rejected, and the decrement is retried. Admitted sales,
+    their lines and one ledger row per branch and product are bulk inserted, and the sold
+    units are taken from the lots first expiry first (store.lots.consume_sold_lots), which
+    also moves StockExpirySummary.
+    """
+    results = {}
+    with transaction.atomic():
+        pending = list(sales)
+        while pending:
+            shortages = {}
+            try:
+                with transaction.atomic():
+                    for branch_code, quantities in _grouped_quantities(pending).items():
+                        try:
+                            debit_sold_stock(branch_code, quantities)
+                        except InsufficientStock as error:
+                            shortages.update({(branch_code, product_id): units for product_id, units in error.shortages.items()})
+                    if shortages:
+                        raise InsufficientStock(shortages)
+                break
+            except InsufficientStock:
+                pending, rejected = _admit(pending, shortages)
+                for sale, short in rejected:
+                    results[id(sale)] = {'status': 'rejected', 'error': 'Insufficient stock', 'products': short}
+
+        if pending:
+            created = Sale.objects.bulk_create([Sale(branch_id=sale['branch'], reference=sale['reference']) for sale in pending])
+            reference = f'sales:{created[0].id}-{created[-1].id}'
+            SaleLine.objects.bulk_create(
+                [
+                    SaleLine(sale=record, product_id=product_id, quantity=quantity)
+                    for record, sale in zip(created, pending)
+                    for product_id, quantity in sale['lines'].items()
+                ],
+                batch_size=STOCK_UPDATE_CHUNK_SIZE,
+            )
+            StockLedger.objects.bulk_create(
+                [
+                    StockLedger(
+                        product_id=product_id, quantity=-quantity, reason=StockLedger.SALE, reference=reference,
+                    )
+                    for quantities in _grouped_quantities(pending).values()
+                    for product_id, quantity in quantities.items()
+                ],
+                batch_size=STOCK_UPDATE_CHUNK_SIZE,
+            )
+            # Lots are business-wide, so branch sales of one product are netted first
+            consume_sold_lots(
+                net_deltas((product_id, quantity) for sale in pending for product_id, quantity in sale['lines'].items()),
+                reference,
+            )
+            for record, sale in zip(created, pending):
+                results[id(sale)] = {'status': 'accepted', 'id': record.id}
+            bump_table_version(TotalStock, BranchStock, StockLedger, Sale, SaleLine)
+
+    return [results[id(sale)] for sale in sales]
+
+
+class _Submission:
+    __slots__ = ('sales', 'done', 'results', 'error')
+
+    def __init__(self, sales):
+        self.sales = sales
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class SaleBatcher:
+    """
+    Group commit for sales posted by concurrent requests in one process.
+
+    The first request to arrive opens a flush window of STORE_SALE_FLUSH_MS (closed early
+    once STORE_SALE_BATCH_SIZE sales are waiting), then records everything submitted in
+    the meantime with one record_sales call on the leader request's thread and database
+    connection, and hands every waiting request its results. Peak checkout traffic therefore costs one transaction
+    and one decrement per product per window instead of one per sale line.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = []
+        self._leader = False
+
+    def submit(self, sales):
+        submission = _Submission(sales)
+        with self._condition:
+            self._pending.append(submission)
+            self._condition.notify_all()
+            leader = not self._leader
+            self._leader = True
+
+        if leader:
+            self._lead()
+        submission.done.wait()
+        if submission.error is not None:
+            raise submission.error
+        return submission.results
+
+    def _lead(self):
+        window = getattr(settings, 'STORE_SALE_FLUSH_MS', 20) / 1000
+        batch_size = getattr(settings, 'STORE_SALE_BATCH_SIZE', 200)
+        deadline = time.monotonic() + window
+        with self._condition:
+            while sum(len(submission.sales) for submission in self._pending) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch, self._pending = self._pending, []
+            self._leader = False
+
+        try:
+            results = record_sales([sale for submission in batch for sale in submission.sales])
+        except Exception as error:
+            for submission in batch:
+                submission.error = error
+                submission.done.set()
+            return
+        position = 0
+        for submission in batch:
+            submission.results = results[position:position + len(submission.sales)]
+            position += len(submission.sales)
+            submission.done.set()
+
+
+sale_batcher = SaleBatcher()
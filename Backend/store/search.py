@@ -0,0 +1,206 @@
+import heapq
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from store.cache import table_versions
+from store.models import Brand, Category, Product
+
+# Searchable columns in ranking order: a code match beats a barcode match beats a name match, ...
+SEARCH_FIELDS = ('product_code', 'barcode', 'name', 'brand_name', 'category_name')
+RESULT_FIELDS = ('id',) + SEARCH_FIELDS
+
+
+def _product_rows(queryset):
+    return queryset.values(
+        'id', 'product_code', 'barcode', 'name',
+        brand_name=F('brand__name'), category_name=F('category__name'),
+    )
+
+
+def index_terms(value):
+    """
+    Lower-cased terms for one column value: the full value plus every suffix that starts
+    at a word boundary, so "amul fresh milk" is found by "amul", "fresh mi" and "milk".
+    """
+    words = (value or '').lower().split()
+    return [' '.join(words[start:]) for start in range(len(words))]
+
+
+# One loaded copy of the index. Searches read it without a lock: the sorted term list is
+# replaced rather than changed, and the dicts are only changed by single assignments
+IndexSnapshot = namedtuple('IndexSnapshot', ['versions', 'terms', 'postings', 'products', 'product_terms'])
+
+
+class ProductSearchIndex:
+    """
+    In-process sorted prefix index for product typeahead.
+
+    Terms are kept in one sorted list with a posting list per term, so a lookup is a
+    binary search followed by a short scan over the terms sharing the prefix.
+
+    Products saved or deleted in this process are queued when their transaction commits
+    (store.signals) and patched in by the next search. Each snapshot also records the
+    Product, Category and Brand table versions (store.cache) it reflects; a patch advances
+    the Product version by the bumps its own writes made. A search reads the current
+    versions, one query, and only when they differ, i.e. another process wrote or a brand
+    or category changed, is the index rebuilt. One thread rebuilds at a time outside any lock a search
+    holds; other searches keep serving the previous snapshot until the new one is swapped in.
+    """
+
+    VERSIONED_MODELS = (Product, Category, Brand)
+
+    # Upper bounds on work per lookup, keep one- and two-letter prefixes cheap
+    MAX_SCANNED_TERMS = 2000
+    MAX_SCANNED_POSTINGS = 1000
+
+    def __init__(self):
+        self._snapshot = None
+        self._rebuild_lock = threading.Lock()
+        # Held while committed changes are patched in and while a rebuilt snapshot is swapped in
+        self._swap_lock = threading.Lock()
+        self._changed = []
+
+    def invalidate(self):
+        # Drop the loaded snapshot; the next search loads a fresh one
+        self._snapshot = None
+
+    def product_changed(self, product_id):
+        """Queue a product this process saved or deleted; called once its transaction has committed."""
+        with self._swap_lock:
+            if self._snapshot is not None:
+                self._changed.append(product_id)
+
+    def rebuild(self, versions=None):
+        # Versions are read before the rows, so a write that lands during the load only
+        # makes the next search rebuild again
+        if versions is None:
+            versions = table_versions(self.VERSIONED_MODELS)
+        postings = {}
+        products = {}
+        product_terms = {}
+        for row in _product_rows(Product.objects.all()).iterator(chunk_size=5000):
+            self._index_row(row, postings, products, product_terms)
+        with self._swap_lock:
+            self._snapshot = IndexSnapshot(versions, sorted(postings), postings, products, product_terms)
+        return self._snapshot
+
+    def current(self):
+        """The snapshot to search, patched with this process's writes and rebuilt when another process wrote."""
+        self._apply_changes()
+        versions = table_versions(self.VERSIONED_MODELS)
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Nothing to serve yet: wait for the thread that is loading the index
+            self._rebuild_lock.acquire()
+        elif snapshot.versions == versions or not self._rebuild_lock.acquire(blocking=False):
+            # Current, or another thread is rebuilding it and this one serves the previous snapshot
+            return snapshot
+        try:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.versions != versions:
+                snapshot = self.rebuild(versions)
+            return snapshot
+        finally:
+            self._rebuild_lock.release()
+
+    def _apply_changes(self):
+        # Re-index the queued products in one query and one copy of the sorted term list
+        with self._swap_lock:
+            snapshot, changed = self._snapshot, self._changed
+            if snapshot is None or not changed:
+                return
+            self._changed = []
+            # Read from the primary: the change just committed there and a replica may lag behind
+            rows = _product_rows(Product.objects.using(DEFAULT_DB_ALIAS).filter(id__in=set(changed)))
+            rows = {row['id']: row for row in rows}
+
+            removed, added = set(), set()
+            for product_id in set(changed):
+                removed |= self._remove(product_id, snapshot)
+                if product_id in rows:
+                    added |= self._add(rows[product_id], snapshot)
+
+            # Searches keep reading the previous sorted list; this copy is swapped in when done
+            terms = list(snapshot.terms)
+            for term in removed - added:
+                del terms[bisect_left(terms, term)]
+            for term in added - removed:
+                terms.insert(bisect_left(terms, term), term)
+            # Every queued save or delete bumped the Product version once (store.signals), so
+            # the versions only differ afterwards when another process or a bulk write changed them
+            versions = [snapshot.versions[0] + len(changed), *snapshot.versions[1:]]
+            self._snapshot = snapshot._replace(versions=versions, terms=terms)
+
+    def search(self, query, limit=10):
+        """Return up to ``limit`` products whose code, barcode, name, brand or category starts with ``query``."""
+        prefix = ' '.join(query.lower().split())
+        if not prefix:
+            return []
+
+        snapshot = self.current()
+        best = {}
+        budget = self.MAX_SCANNED_POSTINGS
+        start = bisect_left(snapshot.terms, prefix)
+        for term in snapshot.terms[start:start + self.MAX_SCANNED_TERMS]:
+            if not term.startswith(prefix) or budget <= 0:
+                break
+            postings = snapshot.postings.get(term, ())[:budget]
+            budget -= len(postings)
+            # Rank by column, then values starting with the query, then exact and shorter terms
+            for product_id, field_rank, is_full_value in postings:
+                score = (field_rank, not is_full_value, term != prefix, len(term))
+                if product_id not in best or score < best[product_id]:
+                    best[product_id] = score
+
+        ranked = heapq.nsmallest(limit, best.items(), key=lambda item: (item[1], item[0]))
+        # A product deleted by a concurrent patch is left out
+        products = [snapshot.products.get(product_id) for product_id, score in ranked]
+        return [product for product in products if product is not None]
+
+    @staticmethod
+    def _row_postings(row):
+        return [
+            (term, (row['id'], field_rank, position == 0))
+            for field_rank, field in enumerate(SEARCH_FIELDS)
+            for position, term in enumerate(index_terms(row[field]))
+        ]
+
+    def _index_row(self, row, postings, products, product_terms):
+        entries = self._row_postings(row)
+        for term, posting in entries:
+            postings.setdefault(term, []).append(posting)
+        products[row['id']] = {field: row[field] for field in RESULT_FIELDS}
+        product_terms[row['id']] = [term for term, posting in entries]
+
+    def _add(self, row, snapshot):
+        # Returns the terms that were not in the index before
+        added = set()
+        entries = self._row_postings(row)
+        for term, posting in entries:
+            if term not in snapshot.postings:
+                added.add(term)
+            # A new list rather than append(), so a search never sees a list being changed
+            snapshot.postings[term] = snapshot.postings.get(term, []) + [posting]
+        snapshot.products[row['id']] = {field: row[field] for field in RESULT_FIELDS}
+        snapshot.product_terms[row['id']] = [term for term, posting in entries]
+        return added
+
+    def _remove(self, product_id, snapshot):
+        # Returns the terms that no product uses any more
+        removed = set()
+        snapshot.products.pop(product_id, None)
+        for term in set(snapshot.product_terms.pop(product_id, ())):
+            remaining = [posting for posting in snapshot.postings[term] if posting[0] != product_id]
+            if remaining:
+                snapshot.postings[term] = remaining
+            else:
+                del snapshot.postings[term]
+                removed.add(term)
+        return removed
+
+
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,132 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from store.cache import bump_table_version
+from store.models import (
+    Branch, BranchStock, Brand, Category, Product, ProductInTransaction, ProductInTransactionDetail, StockLedger,
+    StockTransfer, StockTransferLine, Supplier, TotalStock,
+)
+from store.search import product_search_index
+from store.stock import apply_lot_changes, transfer_stock
+
+SEED_BATCH_SIZE = 5000
+
+# Vocabulary for generated product names, e.g. "Fresh Milk 500 ml"
+ADJECTIVES = ('Fresh', 'Classic', 'Organic', 'Premium', 'Lite', 'Masala', 'Crunchy', 'Pure', 'Golden', 'Daily')
+NOUNS = (
+    'Milk', 'Butter', 'Bread', 'Rice', 'Atta', 'Biscuits', 'Chips', 'Soap', 'Shampoo', 'Tea',
+    'Coffee', 'Juice', 'Oil', 'Sugar', 'Salt', 'Noodles', 'Ketchup', 'Paneer', 'Curd', 'Dal',
+)
+SIZES = ('100 g', '200 g', '500 g', '1 kg', '250 ml', '500 ml', '1 l', '6 pcs', '12 pcs')
+
+
+def _batches(total, batch_size):
+    for start in range(0, total, batch_size):
+        yield start, min(batch_size, total - start)
+
+
+def seed_store(products=100_000, details=1_000_000, suppliers=200, categories=60, brands=400,
+               details_per_transaction=20, batch_size=SEED_BATCH_SIZE, seed=0, progress=None):
+    """
+    Fill the store tables with generated data at realistic volumes.
+
+    Products and transaction details are written with bulk_create in batches, and each
+    batch of receipts is posted through ``apply_lot_changes`` so TotalStock, the ledger
+    and the expiry summary stay consistent with what the API would have produced.
+    ``progress`` is called with a message after every batch.
+    """
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+    run = rng.randrange(10 ** 6)
+
+    category_objects = Category.objects.bulk_create(
+        [Category(name=f'Category {run}-{number}') for number in range(categories)]
+    )
+    brand_objects = Brand.objects.bulk_create([Brand(name=f'Brand {run}-{number}') for number in range(brands)])
+    supplier_ids = [
+        supplier.id for supplier in Supplier.objects.bulk_create([
+            Supplier(
+                name=f'Supplier {number}', mobile_number=f'9{rng.randrange(10 ** 9):09d}',
+                email=f'supplier-{run}-{number}@example.com', location=f'City {number % 40}',
+            )
+            for number in range(suppliers)
+        ])
+    ]
+    branch_codes = [
+        branch.branch_code for branch in Branch.objects.bulk_create([
+            Branch(branch_code=code, name=f'Branch {code}', location=f'City {number}', contact_details='0000000000')
+            for number, code in enumerate(Branch.allocate_branch_codes(5))
+        ])
+    ]
+
+    product_ids = []
+    for start, count in _batches(products, batch_size):
+        codes = Product.allocate_product_codes(count)
+        barcodes = Product.allocate_barcodes(count)
+        created = Product.objects.bulk_create([
+            Product(
+                product_code=code, barcode=barcode,
+                name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(SIZES)}',
+                category=rng.choice(category_objects), brand=rng.choice(brand_objects),
+            )
+            for code, barcode in zip(codes, barcodes)
+        ])
+        product_ids.extend(product.id for product in created)
+        report(f'{start + count} / {products} products')
+
+    today = date.today()
+    transactions = (details + details_per_transaction - 1) // details_per_transaction
+    transactions_per_batch = max(batch_size // details_per_transaction, 1)
+    written = 0
+    for start, count in _batches(transactions, transactions_per_batch):
+        with transaction.atomic():
+            created = ProductInTransaction.objects.bulk_create([
+                ProductInTransaction(
+                    supplier_id=rng.choice(supplier_ids),
+                    purchase_date=today - timedelta(days=rng.randrange(365)),
+                    supplier_invoice_number=f'INV-{start + number}',
+                    supplier_date=today - timedelta(days=rng.randrange(365)),
+                )
+                for number in range(count)
+            ])
+            lines = []
+            for receipt in created:
+                for _ in range(min(details_per_transaction, details - written - len(lines))):
+                    manufactured = today - timedelta(days=rng.randrange(30, 400))
+                    quantity = rng.randrange(1, 200)
+                    lines.append(ProductInTransactionDetail(
+                        transaction_id=receipt.id, product_id=rng.choice(product_ids),
+                        manufacturing_date=manufactured,
+                        # Mostly future expiries with a tail of expired and expiring-soon lots
+                        expiry_date=today + timedelta(days=rng.randrange(-60, 540)),
+                        quantity=quantity,
+                        remaining_quantity=quantity,
+                        total=Decimal(rng.randrange(100, 500_000)) / 100,
+                    ))
+            ProductInTransactionDetail.objects.bulk_create(lines)
+            apply_lot_changes(
+                [(line.product_id, line.expiry_date, line.quantity, line.total) for line in lines],
+                StockLedger.RECEIPT,
+                reference=f'seed:{created[0].id}-{created[-1].id}',
+            )
+        written += len(lines)
+        report(f'{written} / {details} transaction details')
+
+    # Stock every branch with a share of central stock for a random half of the products
+    stocked = dict(TotalStock.objects.filter(total_quantity__gte=len(branch_codes) + 1).values_list('product_id', 'total_quantity'))
+    for branch_code in branch_codes:
+        sample = rng.sample(sorted(stocked), len(stocked) // 2)
+        transfer_stock(None, branch_code, {
+            product_id: rng.randrange(1, stocked[product_id] // (len(branch_codes) + 1) + 1) for product_id in sample
+        })
+    report(f'{len(branch_codes)} branches stocked')
+
+    product_search_index.invalidate()
+    bump_table_version(
+        Category, Brand, Supplier, Branch, Product, ProductInTransaction, ProductInTransactionDetail,
+        BranchStock, StockTransfer, StockTransferLine,
+    )
+    return {'products': len(product_ids), 'transactions': transactions, 'details': written}
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from store.cache import bump_table_version
+from store.models import (
+    Branch, BranchStock, Brand, Category, LotAllocation, Product, ProductInTransaction, ProductInTransactionDetail,
+    Sale, SaleLine, StockExpirySummary, StockLedger, StockTransfer, StockTransferLine, Supplier, TotalStock,
+)
+from store.search import product_search_index
+
+
+# Queue this process's committed product writes for the typeahead index; writes from other
+# processes, bulk paths and brand or category changes are picked up by its version check
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def queue_product_for_index(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: product_search_index.product_changed(product_id))
+
+
+# Cached lists, ETags and the search index follow table versions; move them in the transaction of every change.
+# Bulk writes that bypass signals (bulk_create, update()) bump the versions themselves.
+VERSIONED_MODELS = (
+    Supplier, Category, Brand, Product, Branch,
+    ProductInTransaction, ProductInTransactionDetail, TotalStock, BranchStock, StockTransfer,
+)
+
+# Deletes are only watched on parent tables; listening on the children would disable Django's
+# fast cascade delete, so the cascaded tables are bumped together with their parent instead.
+# Every table a delete reaches, directly or through another cascade, must be listed.
+PRODUCT_CASCADE = (
+    ProductInTransactionDetail, LotAllocation, TotalStock, StockExpirySummary, StockLedger,
+    BranchStock, StockTransferLine, SaleLine,
+)
+CASCADED_MODELS = {
+    Supplier: (ProductInTransaction, ProductInTransactionDetail, LotAllocation),
+    Category: (Product, *PRODUCT_CASCADE),
+    Brand: (Product, *PRODUCT_CASCADE),
+    Product: PRODUCT_CASCADE,
+    Branch: (BranchStock, StockTransfer, StockTransferLine, Sale, SaleLine),
+    StockTransfer: (StockTransferLine,),
+    ProductInTransaction: (ProductInTransactionDetail, LotAllocation),
+    Sale: (SaleLine,),
+}
+
+
+def bump_saved_table_version(sender, **kwargs):
+    bump_table_version(sender)
+
+
+def bump_deleted_table_versions(sender, **kwargs):
+    bump_table_version(sender, *CASCADED_MODELS[sender])
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_saved_table_version, sender=model, dispatch_uid=f'bump_saved_{model._meta.model_name}')
+for model in CASCADED_MODELS:
+    post_delete.connect(bump_deleted_table_versions, sender=model, dispatch_uid=f'bump_deleted_{model._meta.model_name}')
@@ -0,0 +1,342 @@
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from store.cache import bump_table_version
+from store.models import (
+    BranchStock, ProductInTransactionDetail, StockExpirySummary, StockLedger, StockTransfer, StockTransferLine, TotalStock,
+)
+
+# Keep the CASE expression and IN list well below SQLite's bound-parameter limit
+STOCK_UPDATE_CHUNK_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    """Raised when a debit would take stock below zero; ``shortages`` maps product id to units available."""
+
+    def __init__(self, shortages):
+        super().__init__(f'Insufficient stock for products {sorted(shortages)}')
+        self.shortages = shortages
+
+
+def lot_value(total, quantity, remaining):
+    """Share of a receipt line's ``total`` carried by its ``remaining`` units, to the cent."""
+    if not quantity:
+        return Decimal('0')
+    # Rounded half up per lot; rebuild_expiry_summary sums these same values
+    return (Decimal(total) * remaining / quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def net_deltas(pairs):
+    """Collapse ``(product_id, quantity)`` pairs into ``{product_id: net quantity}``."""
+    deltas = defaultdict(int)
+    for product_id, quantity in pairs:
+        deltas[product_id] += quantity
+    return deltas
+
+
+def apply_stock_deltas(deltas, reason, reference='', guarded=False):
+    """
+    Apply signed ``{product_id: quantity}`` changes to TotalStock and record them in the ledger.
+
+    This is the only place TotalStock is written. Missing rows are inserted in one
+    statement, every affected row is changed by a single conditional
+    ``UPDATE ... SET total_quantity = total_quantity + delta`` and the ledger rows are
+    bulk inserted, all inside one atomic block, so concurrent writers never lose updates.
+
+    With ``guarded`` the negative deltas are taken out of central stock like
+    debit_sold_stock does, and InsufficientStock is raised instead of letting a reversal
+    push total_quantity below zero or below the units already transferred to branches.
+    """
+    deltas = {product_id: quantity for product_id, quantity in deltas.items() if quantity}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        credits = deltas
+        if guarded:
+            debit_sold_stock(None, {product_id: -quantity for product_id, quantity in deltas.items() if quantity < 0})
+            credits = {product_id: quantity for product_id, quantity in deltas.items() if quantity > 0}
+
+        product_ids = list(credits)
+        for start in range(0, len(product_ids), STOCK_UPDATE_CHUNK_SIZE):
+            chunk = product_ids[start:start + STOCK_UPDATE_CHUNK_SIZE]
+            TotalStock.objects.bulk_create(
+                [TotalStock(product_id=product_id) for product_id in chunk],
+                ignore_conflicts=True,
+            )
+            TotalStock.objects.filter(product_id__in=chunk).update(
+                total_quantity=F('total_quantity') + Case(
+                    *[When(product_id=product_id, then=Value(credits[product_id])) for product_id in chunk],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+
+        StockLedger.objects.bulk_create(
+            [
+                StockLedger(product_id=product_id, quantity=quantity, reason=reason, reference=reference)
+                for product_id, quantity in deltas.items()
+            ],
+            batch_size=STOCK_UPDATE_CHUNK_SIZE,
+        )
+        bump_table_version(TotalStock, StockLedger)
+
+
+def apply_lot_changes(lines, reason, reference='', guarded=False):
+    """
+    Apply signed lot lines ``(product_id, expiry_date, quantity, value)`` to TotalStock,
+    the ledger and StockExpirySummary in one atomic block.
+
+    Receipt create and delete paths post their detail rows here, so the expiry summary
+    always moves in the same transaction as the details; ``guarded`` is passed on to
+    apply_stock_deltas. Receipt updates post stock and summary deltas separately, since
+    the summary only holds the units left in each lot.
+    """
+    lines = list(lines)
+    with transaction.atomic():
+        apply_stock_deltas(
+            net_deltas((product_id, quantity) for product_id, expiry_date, quantity, value in lines),
+            reason,
+            reference,
+            guarded,
+        )
+        apply_expiry_summary_deltas(lines)
+
+
+def apply_expiry_summary_deltas(lines):
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    for product_id, expiry_date, quantity, value in lines:
+        deltas[(product_id, expiry_date)][0] += quantity
+        deltas[(product_id, expiry_date)][1] += Decimal(value)
+    keys = [key for key, (quantity, value) in deltas.items() if quantity or value]
+
+    with transaction.atomic():
+        for start in range(0, len(keys), STOCK_UPDATE_CHUNK_SIZE):
+            chunk = keys[start:start + STOCK_UPDATE_CHUNK_SIZE]
+            # Insert missing rows first so every key has a row to lock: other writers of the
+            # same lots wait for this transaction instead of reading stale totals
+            StockExpirySummary.objects.bulk_create(
+                [StockExpirySummary(product_id=product_id, expiry_date=expiry_date) for product_id, expiry_date in chunk],
+                ignore_conflicts=True,
+            )
+            wanted = set(chunk)
+            current = {
+                (row.product_id, row.expiry_date): row
+                for row in StockExpirySummary.objects.select_for_update()
+                .filter(product_id__in={product_id for product_id, expiry_date in chunk})
+                .only('id', 'product_id', 'expiry_date', 'quantity', 'value')
+                if (row.product_id, row.expiry_date) in wanted
+            }
+
+            # Write the new totals back with one upsert instead of a per-key CASE expression
+            rows, emptied = [], []
+            for key in chunk:
+                row = current[key]
+                row.quantity += deltas[key][0]
+                row.value += deltas[key][1]
+                # Fully reversed lots carry no information; keep the summary table small
+                (emptied if row.quantity == 0 else rows).append(row)
+            StockExpirySummary.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['product', 'expiry_date'],
+                update_fields=['quantity', 'value'],
+            )
+            if emptied:
+                StockExpirySummary.objects.filter(id__in=[row.id for row in emptied]).delete()
+        bump_table_version(StockExpirySummary)
+
+
+def _quantity_case(quantities, chunk):
+    return Case(
+        *[When(product_id=product_id, then=Value(quantities[product_id])) for product_id in chunk],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _debit_stock(branch_code, quantities):
+    """
+    Take ``{product_id: quantity}`` from a branch, or from central stock when ``branch_code``
+    is None, with one guarded UPDATE per chunk. A row without enough stock is not matched by
+    the guard, so a short count means an oversell and the caller's transaction is rolled back.
+    """
+    product_ids = list(quantities)
+    for start in range(0, len(product_ids), STOCK_UPDATE_CHUNK_SIZE):
+        chunk = product_ids[start:start + STOCK_UPDATE_CHUNK_SIZE]
+        requested = _quantity_case(quantities, chunk)
+        if branch_code is None:
+            # Central stock is what has not been transferred to a branch yet
+            rows = TotalStock.objects.filter(product_id__in=chunk)
+            updated = rows.filter(total_quantity__gte=F('branch_quantity') + requested).update(
+                branch_quantity=F('branch_quantity') + requested,
+            )
+        else:
+            rows = BranchStock.objects.filter(branch_id=branch_code, product_id__in=chunk)
+            updated = rows.filter(quantity__gte=requested).update(quantity=F('quantity') - requested)
+        if updated != len(chunk):
+            if branch_code is None:
+                available = dict(rows.values_list('product_id', F('total_quantity') - F('branch_quantity')))
+            else:
+                available = dict(rows.values_list('product_id', 'quantity'))
+            raise InsufficientStock({
+                product_id: available.get(product_id, 0)
+                for product_id in chunk if available.get(product_id, 0) < quantities[product_id]
+            })
+
+
+def _credit_stock(branch_code, quantities):
+    product_ids = list(quantities)
+    for start in range(0, len(product_ids), STOCK_UPDATE_CHUNK_SIZE):
+        chunk = product_ids[start:start + STOCK_UPDATE_CHUNK_SIZE]
+        requested = _quantity_case(quantities, chunk)
+        if branch_code is None:
+            TotalStock.objects.filter(product_id__in=chunk).update(branch_quantity=F('branch_quantity') - requested)
+        else:
+            BranchStock.objects.bulk_create(
+                [BranchStock(branch_id=branch_code, product_id=product_id) for product_id in chunk],
+                ignore_conflicts=True,
+            )
+            BranchStock.objects.filter(branch_id=branch_code, product_id__in=chunk).update(
+                quantity=F('quantity') + requested,
+            )
+
+
+def debit_sold_stock(branch_code, quantities):
+    """
+    Take sold ``{product_id: quantity}`` out of stock at a branch, or out of central stock
+    when ``branch_code`` is None, without a read-then-check: the guarded UPDATE only
+    matches rows that still hold enough units, and a short count raises InsufficientStock.
+    Callers record the matching ledger rows.
+    """
+    product_ids = list(quantities)
+    for start in range(0, len(product_ids), STOCK_UPDATE_CHUNK_SIZE):
+        chunk = product_ids[start:start + STOCK_UPDATE_CHUNK_SIZE]
+        sold = _quantity_case(quantities, chunk)
+        if branch_code is None:
+            rows = TotalStock.objects.filter(product_id__in=chunk)
+            updated = rows.filter(total_quantity__gte=F('branch_quantity') + sold).update(
+                total_quantity=F('total_quantity') - sold,
+            )
+            if updated != len(chunk):
+                available = dict(rows.values_list('product_id', F('total_quantity') - F('branch_quantity')))
+        else:
+            rows = BranchStock.objects.filter(branch_id=branch_code, product_id__in=chunk)
+            updated = rows.filter(quantity__gte=sold).update(quantity=F('quantity') - sold)
+            if updated != len(chunk):
+                available = dict(rows.values_list('product_id', 'quantity'))
+            else:
+                # Branch units are part of the business total and of the transferred share
+                TotalStock.objects.filter(product_id__in=chunk).update(
+                    total_quantity=F('total_quantity') - sold, branch_quantity=F('branch_quantity') - sold,
+                )
+        if updated != len(chunk):
+            raise InsufficientStock({
+                product_id: available.get(product_id, 0)
+                for product_id in chunk if available.get(product_id, 0) < quantities[product_id]
+            })
+
+
+def transfer_stock(from_branch_code, to_branch_code, quantities, remarks=None):
+    """
+    Move ``{product_id: quantity}`` between branches and return the StockTransfer.
+
+    A None branch code means central stock. The debit and the credit are each one
+    set-based UPDATE per chunk and run in one transaction with the transfer record, so
+    either every line moves or none does; InsufficientStock is raised for short lines.
+    TotalStock.total_quantity is not changed by a transfer.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity}
+    with transaction.atomic():
+        _debit_stock(from_branch_code, quantities)
+        _credit_stock(to_branch_code, quantities)
+        transfer = StockTransfer.objects.create(
+            from_branch_id=from_branch_code, to_branch_id=to_branch_code, remarks=remarks,
+        )
+        StockTransferLine.objects.bulk_create(
+            [
+                StockTransferLine(transfer=transfer, product_id=product_id, quantity=quantity)
+                for product_id, quantity in quantities.items()
+            ],
+            batch_size=STOCK_UPDATE_CHUNK_SIZE,
+        )
+        bump_table_version(TotalStock, BranchStock, StockTransfer, StockTransferLine)
+    return transfer
+
+
+def ledger_totals(product_ids=None):
+    """Return ``{product_id: quantity}`` summed from the ledger."""
+    ledger = StockLedger.objects.all()
+    if product_ids is not None:
+        ledger = ledger.filter(product_id__in=product_ids)
+    return dict(ledger.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+
+
+def verify_total_stock(product_ids=None, since_ledger_id=None):
+    """
+    Compare TotalStock against the ledger and return ``{product_id: (stored, expected)}`` mismatches.
+
+    With ``since_ledger_id`` only products that have ledger entries newer than that id are
+    checked, so periodic verification stays incremental.
+    """
+    if since_ledger_id is not None:
+        recent = StockLedger.objects.filter(id__gt=since_ledger_id)
+        if product_ids is not None:
+            recent = recent.filter(product_id__in=product_ids)
+        product_ids = set(recent.values_list('product_id', flat=True))
+
+    expected = ledger_totals(product_ids)
+    stored = TotalStock.objects.all()
+    if product_ids is not None:
+        stored = stored.filter(product_id__in=product_ids)
+    stored = dict(stored.values_list('product_id', 'total_quantity'))
+
+    mismatches = {}
+    for product_id in set(expected) | set(stored):
+        if stored.get(product_id, 0) != expected.get(product_id, 0):
+            mismatches[product_id] = (stored.get(product_id, 0), expected.get(product_id, 0))
+    return mismatches
+
+
+def rebuild_total_stock(product_ids=None):
+    """Overwrite drifted TotalStock rows with their ledger sums and return the corrected mismatches."""
+    mismatches = verify_total_stock(product_ids)
+    with transaction.atomic():
+        TotalStock.objects.bulk_create(
+            [TotalStock(product_id=product_id) for product_id in mismatches],
+            ignore_conflicts=True,
+        )
+        for product_id, (stored, expected) in mismatches.items():
+            TotalStock.objects.filter(product_id=product_id).update(total_quantity=expected)
+        bump_table_version(TotalStock)
+    return mismatches
+
+
+def rebuild_expiry_summary():
+    """Recompute StockExpirySummary from the units left in each lot (see store.stock.lot_value)."""
+    # Summed with lot_value in Python: SQL division would truncate on SQLite when the stored
+    # totals are whole numbers, and this way the rebuild matches the incremental path to the cent
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    lots = (
+        ProductInTransactionDetail.objects.filter(remaining_quantity__gt=0)
+        .values_list('product_id', 'expiry_date', 'total', 'quantity', 'remaining_quantity')
+        .order_by()
+    )
+    for product_id, expiry_date, total, quantity, remaining in lots.iterator(chunk_size=STOCK_UPDATE_CHUNK_SIZE):
+        summary = totals[product_id, expiry_date]
+        summary[0] += remaining
+        summary[1] += lot_value(total, quantity, remaining)
+
+    with transaction.atomic():
+        StockExpirySummary.objects.all().delete()
+        StockExpirySummary.objects.bulk_create(
+            [
+                StockExpirySummary(product_id=product_id, expiry_date=expiry_date, quantity=quantity, value=value)
+                for (product_id, expiry_date), (quantity, value) in totals.items()
+            ],
+            batch_size=STOCK_UPDATE_CHUNK_SIZE,
+        )
+        bump_table_version(StockExpirySummary)
@@ -0,0 +1,159 @@
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from celery import shared_task, states
+from celery.result import AsyncResult
+from django.conf import settings
+from django.db import connections
+from django_celery_results.models import TaskResult
+
+from store.api.serializers import BulkProductInTransactionSerializer
+from store.imports import import_products
+from store.inventory import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, inventory_queryset, iter_inventory_rows
+from store.labels import render_label_sheet
+from store.models import Product
+from store.stock import rebuild_expiry_summary, rebuild_total_stock
+
+# Finished job files live under MEDIA_ROOT/jobs/<job id>.<extension>
+JOB_FILES_DIR = 'jobs'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _thread_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'STORE_TASK_THREADS', 2), thread_name_prefix='store-task',
+            )
+        return _executor
+
+
+def _run_in_thread(task, args, kwargs, job_id):
+    try:
+        task.apply(args, kwargs, task_id=job_id)
+    finally:
+        # Pool threads are long lived; do not leave their database connections open between jobs
+        connections.close_all()
+
+
+def enqueue(task, *args, **kwargs):
+    """
+    Start ``task`` in the background and return its job id.
+
+    The job is recorded as PENDING before it is handed off, so its status endpoint works
+    immediately. Depending on STORE_TASK_MODE the task runs on a celery worker, on the
+    in-process thread pool, or inline ('eager').
+    """
+    job_id = str(uuid.uuid4())
+    task.backend.store_result(job_id, None, states.PENDING, request=None)
+
+    mode = getattr(settings, 'STORE_TASK_MODE', 'thread')
+    if mode == 'celery':
+        task.apply_async(args, kwargs, task_id=job_id)
+    elif mode == 'eager':
+        task.apply(args, kwargs, task_id=job_id)
+    else:
+        _thread_executor().submit(_run_in_thread, task, args, kwargs, job_id)
+    return job_id
+
+
+def job_status(job_id):
+    """Status, progress and result of a job as a dict, or None for an unknown job id."""
+    if not TaskResult.objects.filter(task_id=job_id).exists():
+        return None
+
+    result = AsyncResult(job_id)
+    job = {'id': job_id, 'status': result.state, 'progress': None, 'result': None, 'error': None}
+    if result.state == 'PROGRESS':
+        job['progress'] = result.info
+    elif result.state == states.SUCCESS:
+        job['result'] = result.result
+    elif result.state == states.FAILURE:
+        job['error'] = str(result.result)
+    return job
+
+
+def job_file_path(name):
+    return os.path.join(settings.MEDIA_ROOT, JOB_FILES_DIR, name)
+
+
+def report_progress(task, **progress):
+    # Outside a job (e.g. called directly) there is nothing to report to
+    if task.request.id:
+        task.update_state(state='PROGRESS', meta=progress)
+
+
+def _write_job_file(task, extension, chunks, content_type, filename):
+    name = f'{task.request.id or uuid.uuid4()}.{extension}'
+    path = job_file_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w' if extension in ('csv', 'ndjson') else 'wb') as output:
+        for chunk in chunks:
+            output.write(chunk)
+    return {'file': name, 'content_type': content_type, 'filename': filename}
+
+
+@shared_task(bind=True)
+def export_inventory(self, export_format='csv', expired=False):
+    content_type, render_rows = EXPORT_FORMATS[export_format]
+    total = inventory_queryset(expired).count()
+
+    def rows_with_progress():
+        for position, row in enumerate(iter_inventory_rows(expired), 1):
+            if position % EXPORT_CHUNK_SIZE == 0:
+                report_progress(self, done=position, total=total)
+            yield row
+
+    return _write_job_file(
+        self, export_format, render_rows(rows_with_progress()), content_type, f'inventory.{export_format}',
+    )
+
+
+@shared_task(bind=True)
+def render_labels(self, product_ids, copies=1):
+    products = Product.objects.in_bulk(product_ids)
+    pdf = render_label_sheet([products[product_id] for product_id in product_ids if product_id in products], copies)
+    return _write_job_file(self, 'pdf', [pdf], 'application/pdf', 'labels.pdf')
+
+
+@shared_task(bind=True)
+def rebuild_stock(self):
+    report_progress(self, done=0, total=2)
+    mismatches = rebuild_total_stock()
+    report_progress(self, done=1, total=2)
+    rebuild_expiry_summary()
+    return {'corrected_products': sorted(mismatches)}
+
+
+@shared_task(bind=True)
+def create_bulk_receipts(self, data):
+    serializer = BulkProductInTransactionSerializer(data=data, many=True)
+    if not serializer.is_valid():
+        return {'errors': serializer.errors}
+    serializer.save()
+    details_count = sum(len(item['transaction_details']) for item in serializer.validated_data)
+    return {'transactions': serializer.data, 'details_count': details_count}
+
+
+@shared_task(bind=True)
+def import_product_file(self, name, file_format):
+    # ``name`` is an upload under the job files directory; with celery workers MEDIA_ROOT must be shared
+    report_name = f'{self.request.id or uuid.uuid4()}-errors.csv'
+
+    try:
+        with open(job_file_path(name), 'rb') as file, open(job_file_path(report_name), 'w', newline='') as error_report:
+            counts = import_products(
+                file, file_format, error_report, progress=lambda counts: report_progress(self, **counts),
+            )
+    finally:
+        os.remove(job_file_path(name))
+
+    if not counts['errors']:
+        os.remove(job_file_path(report_name))
+        return counts
+    return {**counts, 'file': report_name, 'content_type': 'text/csv', 'filename': 'import-errors.csv'}
@@ -1,3 +1,1205 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import CASCADE
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from store.api.pagination import StoreCursorPagination
+from store.benchmark import SKIPPED_ENDPOINTS, api_url_names, benchmark_user_tokens, endpoint_cases, send
+from store.cache import bump_table_version, table_version
+from store.db import ReadReplicaRouter, replica_reads
+from store.inventory import INVENTORY_FIELDS, inventory_queryset
+from store.lots import LotContention, allocate_lots, open_lots
+from store.models import (
+    Brand, Branch, BranchStock, Category, CodeSequence, LotAllocation, Product, ProductInTransaction, ProductInTransactionDetail,
+    StockExpirySummary, StockLedger, StockTransfer, Supplier, TotalStock, ean13,
+)
+from store.profiling import endpoint_stats
+from store.search import product_search_index
+from store.sales import SaleBatcher, record_sales
+from store.seed import seed_store
+from store.signals import CASCADED_MODELS
+from store.stock import (
+    InsufficientStock, apply_stock_deltas, rebuild_expiry_summary, rebuild_total_stock, transfer_stock,
+    verify_total_stock,
+)
+
+
+# Query-plan regression tests: the hot inventory and product lookups must keep using their indexes
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class IndexUsageTests(TestCase):
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f'Expected {index_name} in query plan:\n{plan}')
+
+    def test_expired_filter_uses_expiry_index(self):
+        queryset = ProductInTransactionDetail.objects.filter(expiry_date__lt=timezone.now().date())
+        self.assertUsesIndex(queryset, 'store_detail_expiry_idx')
+
+    def test_expired_inventory_list_uses_expiry_index(self):
+        self.assertUsesIndex(inventory_queryset(expired=True), 'store_detail_expiry_idx')
+
+    def test_product_lots_use_product_expiry_index(self):
+        queryset = ProductInTransactionDetail.objects.filter(product_id=1).order_by('expiry_date')
+        self.assertUsesIndex(queryset, 'store_detail_product_exp_idx')
+
+    def test_open_lot_scan_uses_fefo_index(self):
+        self.assertUsesIndex(open_lots(1), 'store_detail_fefo_idx')
+
+    def test_product_code_lookup_uses_unique_index(self):
+        plan = Product.objects.filter(product_code='P5001').explain()
+        self.assertIn('USING INDEX', plan)
+        self.assertNotIn('SCAN', plan)
+
+
+# Query budgets per endpoint, measured against seeded data with more rows than fit on one page,
+# so an N+1 anywhere in a list shows up as a changed count. Requests carry a JWT whose user is
+# already in the JWT user cache (warmed in setUp), so budgets exclude the user lookup. Views with
+# an ETag include the one TableVersion read behind it, and every write bumps its table versions.
+# Account endpoints are budgeted in account/tests.py.
+STORE_QUERY_BUDGETS = {
+    'supplier-list-create': 3,
+    'supplier-detail': 2,
+    'category-list-create': 3,
+    'category-detail': 2,
+    'brand-list-create': 3,
+    'brand-detail': 2,
+    'product-list-create': 3,
+    'product-detail': 2,
+    'get_total_stock': 2,
+    'async-get-total-stock': 2,
+    'search_product_codes': 3,
+    'async-search-product-codes': 2,
+    'product-by-barcode': 2,
+    'barcode-label-sheet': 1,
+    'barcode-image': 0,
+    'branch-list-create': 3,
+    'branch-detail': 2,
+    'branch-stock-list': 3,
+    'branch-stock-availability': 2,
+    'stock-transfer-list-create': 4,
+    'stock-transfer-create': 11,
+    'product-in-transaction-list-create': 4,
+    'product-in-transaction-bulk-create': 21,
+    'product-in-transaction-detail': 3,
+    'inventory-list': 3,
+    'inventory-list-cursor': 2,
+    'inventory-list-expired': 3,
+    'async-inventory-list': 3,
+    'sale-create': 24,
+    'lot-allocate': 17,
+    'inventory-export': 1,
+    'stock-summary': 3,
+    'stock-summary-totals': 2,
+    'job-inventory-export': 8,
+    'job-label-sheet': 7,
+    'job-stock-rebuild': 23,
+    'job-product-in-transaction-bulk': 27,
+    'job-status': 2,
+    'job-result': 2,
+    'profiling-stats': 0,
+}
+
+
+class EndpointQueryTestCase(TestCase):
+    """Seeds a small catalog once and runs the shared benchmark cases against it."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(STORE_TASK_MODE='eager', MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(
+            products=60, details=600, suppliers=8, categories=5, brands=8,
+            details_per_transaction=10, batch_size=200,
+        )
+
+    def setUp(self):
+        cache.clear()
+        product_search_index.invalidate()
+        self.client = Client()
+        self.tokens = benchmark_user_tokens(self.client)
+        send(self.client, 'GET', reverse('user-details'), None, self.tokens)
+
+    def assertQueryBudgets(self, budgets):
+        for name, method, path, body in endpoint_cases(self.tokens):
+            if name not in budgets:
+                continue
+            with self.subTest(endpoint=name), transaction.atomic():
+                with self.assertNumQueries(budgets[name]):
+                    response = send(self.client, method, path, body, self.tokens)
+                self.assertLess(response.status_code, 400)
+                # Undo writes so every case sees the same data
+                transaction.set_rollback(True)
+
+
+class StoreEndpointQueryTests(EndpointQueryTestCase):
+
+    def test_store_endpoint_query_budgets(self):
+        self.assertQueryBudgets(STORE_QUERY_BUDGETS)
+
+    def test_every_store_endpoint_has_a_budget(self):
+        from store.api.urls import urlpatterns
+
+        names = {pattern.name for pattern in urlpatterns} - set(SKIPPED_ENDPOINTS)
+        self.assertEqual(names - set(STORE_QUERY_BUDGETS), set())
+
+    def test_every_api_endpoint_has_a_benchmark_case(self):
+        case_names = {name for name, method, path, body in endpoint_cases(self.tokens)}
+        self.assertEqual(api_url_names() - case_names - set(SKIPPED_ENDPOINTS), set())
+
+    def test_profiled_request_reports_server_timing(self):
+        endpoint_stats.reset()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.tokens["access"]}'}
+        response = self.client.get('/store/inventory/?page_size=50', HTTP_X_PROFILE='1', **headers)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="3 queries"')
+        self.assertIn(f'size;desc="{len(response.content)} bytes"', response['Server-Timing'])
+        self.assertNotIn('Server-Timing', self.client.get('/store/inventory/?page_size=50', **headers))
+
+        stats = self.client.get('/store/profiling/stats/', **headers).json()
+        self.assertEqual([row['endpoint'] for row in stats['endpoints']], ['GET /store/inventory/'])
+        self.assertEqual(stats['slowest_requests'][0]['sql_queries'], 3)
+        self.assertGreater(stats['slowest_requests'][0]['serializer_ms'], 0)
+
+    def test_async_reads_match_the_sync_views(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.tokens["access"]}'}
+        product = Product.objects.order_by('id').first()
+        pairs = [
+            (reverse('get_total_stock', args=[product.product_code]), reverse('async-get-total-stock', args=[product.product_code])),
+            (reverse('get_total_stock', args=['missing']), reverse('async-get-total-stock', args=['missing'])),
+            (reverse('search_product_codes') + '?query=fre&limit=5', reverse('async-search-product-codes') + '?query=fre&limit=5'),
+            (reverse('inventory-list') + '?page=2&page_size=50', reverse('async-inventory-list') + '?page=2&page_size=50'),
+            (reverse('inventory-list') + '?expired=true&count=false', reverse('async-inventory-list') + '?expired=true&count=false'),
+        ]
+        for sync_path, async_path in pairs:
+            with self.subTest(path=async_path):
+                expected = self.client.get(sync_path, **headers)
+                response = self.client.get(async_path, **headers)
+                self.assertEqual(response.status_code, expected.status_code)
+                data = response.json()
+                if isinstance(data, dict) and 'results' in data:
+                    for link in ('next', 'previous'):
+                        data[link] = data[link] and data[link].replace('/async/', '/')
+                self.assertEqual(data, expected.json())
+
+        response = self.client.get(pairs[0][1], **headers)
+        self.assertEqual(self.client.get(pairs[0][1], HTTP_IF_NONE_MATCH=response['ETag'], **headers).status_code, 304)
+        self.assertEqual(self.client.get(pairs[0][1], HTTP_AUTHORIZATION='Bearer invalid').status_code, 401)
+
+    async def test_async_reads_are_served_through_the_asgi_handler(self):
+        product = await Product.objects.order_by('id').afirst()
+        total_stock = await TotalStock.objects.aget(product=product)
+        client = AsyncClient(headers={'Authorization': f'Bearer {self.tokens["access"]}'})
+        response = await client.get(reverse('async-get-total-stock', args=[product.product_code]))
+        self.assertEqual(response.json(), {'total_stock': total_stock.total_quantity})
+        response = await client.get(reverse('async-inventory-list') + '?page_size=10')
+        self.assertEqual(len(response.json()['results']), 10)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=3, details=6, suppliers=1, categories=1, brands=1)
+        cls.product = Product.objects.order_by('id').first()
+
+    def test_matching_etag_is_not_modified_until_a_write(self):
+        url = reverse('get_total_stock', args=[self.product.product_code])
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Versions live in the database, so a process with an empty cache validates the same ETag
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        apply_stock_deltas({self.product.id: 1}, StockLedger.OPENING_BALANCE)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_reference_lists_are_cached_until_any_process_writes(self):
+        category = Category.objects.get()
+        url = reverse('category-list-create')
+        self.client.get(url)
+        # Only the version lookup; the rows come from the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).json()['results'][0]['name'], category.name)
+
+        # A write that never touches this process's cache, as from a worker or another web process
+        Category.objects.filter(id=category.id).update(name='Renamed')
+        bump_table_version(Category)
+        self.assertEqual(self.client.get(url).json()['results'][0]['name'], 'Renamed')
+
+    def test_deleting_a_product_changes_the_etags_of_its_cascaded_tables(self):
+        url = reverse('stock-summary-totals')
+        etag = self.client.get(url)['ETag']
+
+        self.product.delete()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_every_cascaded_table_is_bumped_with_its_parent(self):
+        def cascaded(model):
+            for relation in model._meta.related_objects:
+                if relation.on_delete is CASCADE:
+                    yield relation.related_model
+                    yield from cascaded(relation.related_model)
+
+        for parent, children in CASCADED_MODELS.items():
+            with self.subTest(parent=parent.__name__):
+                self.assertEqual(set(children), set(cascaded(parent)))
+
+    def test_rolled_back_writes_keep_the_version(self):
+        version = table_version(Product)
+        with transaction.atomic():
+            Product.objects.filter(id=self.product.id).update(name='Renamed')
+            bump_table_version(Product)
+            transaction.set_rollback(True)
+        self.assertEqual(table_version(Product), version)
+
+
+class PaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=5, details=12, suppliers=1, categories=1, brands=1, details_per_transaction=3)
+
+    def walk(self, url):
+        # Follow next links to the end and return the rows of every page
+        rows = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            rows.extend(response.json()['results'])
+            url = response.json()['next']
+        return rows
+
+    def test_cursor_pages_cover_every_product_once(self):
+        rows = self.walk(reverse('product-list-create') + '?pagination=cursor&page_size=2')
+
+        self.assertEqual([row['id'] for row in rows], list(Product.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_cursor_pages_follow_the_requested_ordering(self):
+        rows = self.walk(reverse('inventory-list') + '?pagination=cursor&ordering=expiry_date&page_size=5')
+        every_row = self.client.get(reverse('inventory-list'), {'page_size': 50}).json()['results']
+
+        self.assertEqual([row['expiry_date'] for row in rows], sorted(row['expiry_date'] for row in rows))
+        self.assertCountEqual(rows, every_row)
+
+    def test_cursor_pages_advance_through_rows_sharing_one_date(self):
+        detail = ProductInTransactionDetail.objects.order_by('id').first()
+        shared = date.today() + timedelta(days=365)
+        ProductInTransactionDetail.objects.bulk_create([
+            ProductInTransactionDetail(
+                transaction_id=detail.transaction_id, product_id=detail.product_id, manufacturing_date=detail.manufacturing_date,
+                expiry_date=shared, quantity=1, remaining_quantity=1, total=Decimal('1.00'),
+            )
+            for number in range(StoreCursorPagination.offset_cutoff + 500)
+        ])
+        url = reverse('inventory-list') + '?pagination=cursor&ordering=-expiry_date&page_size=200'
+
+        pages, rows = 0, []
+        while url:
+            page = self.client.get(url).json()
+            rows.extend(page['results'])
+            url, pages = page['next'], pages + 1
+            self.assertLess(pages, 10)
+
+        self.assertEqual(len(rows), ProductInTransactionDetail.objects.count())
+        self.assertEqual([row['expiry_date'] for row in rows], sorted((row['expiry_date'] for row in rows), reverse=True))
+
+    def test_cursor_previous_links_return_the_same_pages(self):
+        url = reverse('inventory-list') + '?pagination=cursor&ordering=expiry_date&page_size=5'
+        first = self.client.get(url).json()
+        second = self.client.get(first['next']).json()
+
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_count_false_skips_the_count_but_keeps_the_links(self):
+        url = reverse('inventory-list')
+        first = self.client.get(url, {'count': 'false', 'page_size': 5}).json()
+        last = self.client.get(url, {'count': 'false', 'page_size': 5, 'page': 3}).json()
+
+        self.assertIsNone(first['count'])
+        self.assertIn('page=2', first['next'])
+        self.assertIsNone(first['previous'])
+        self.assertEqual(len(last['results']), 2)
+        self.assertIsNone(last['next'])
+        self.assertIn('page=2', last['previous'])
+        self.assertEqual(self.client.get(url, {'count': 'false', 'page': 4, 'page_size': 5}).status_code, 404)
+
+
+class InventoryExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=4, details=9, suppliers=1, categories=1, brands=1, details_per_transaction=3)
+
+    def export(self, export_format, **params):
+        response = self.client.get(reverse('inventory-export', args=[export_format]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="inventory.{export_format}"')
+        return b''.join(response.streaming_content).decode()
+
+    def listed(self, **params):
+        return self.client.get(reverse('inventory-list'), {'page_size': 50, **params}).json()['results']
+
+    def test_csv_has_a_header_and_one_line_per_inventory_row(self):
+        header, *lines = list(csv.reader(io.StringIO(self.export('csv'))))
+
+        self.assertEqual(header, INVENTORY_FIELDS)
+        self.assertEqual(lines, [[str(row[field]) for field in INVENTORY_FIELDS] for row in self.listed()])
+
+    def test_ndjson_has_one_object_per_line_and_honours_the_expired_filter(self):
+        ProductInTransactionDetail.objects.filter(id=ProductInTransactionDetail.objects.order_by('id').first().id).update(
+            expiry_date=date.today() - timedelta(days=1),
+        )
+        lines = self.export('ndjson', expired='true').splitlines()
+
+        self.assertEqual([json.loads(line) for line in lines], self.listed(expired='true'))
+        self.assertEqual(len(lines), ProductInTransactionDetail.objects.filter(expiry_date__lt=date.today()).count())
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('inventory-export', args=['xml']))
+        self.assertEqual(response.status_code, 400)
+
+
+class BarcodeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=2, details=2, suppliers=1, categories=1, brands=1)
+        cls.product = Product.objects.order_by('id').first()
+
+    def test_check_digit(self):
+        # Published GS1 examples
+        self.assertEqual(ean13('400638133393'), '4006381333931')
+        self.assertEqual(ean13('590123412345'), '5901234123457')
+        self.assertEqual(ean13('200000000000'), '2000000000008')
+
+    def test_allocated_barcodes_are_valid_in_store_codes(self):
+        for barcode in Product.allocate_barcodes(3):
+            self.assertRegex(barcode, r'^20\d{11}$')
+            self.assertEqual(ean13(barcode[:12]), barcode)
+
+    def test_lookup_by_barcode_returns_the_product_with_its_stock(self):
+        response = self.client.get(reverse('product-by-barcode', args=[self.product.barcode]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.product.id)
+        self.assertEqual(response.json()['product_code'], self.product.product_code)
+        self.assertEqual(response.json()['total_stock'], TotalStock.objects.get(product=self.product).total_quantity)
+
+    def test_unknown_barcode_is_a_404(self):
+        response = self.client.get(reverse('product-by-barcode', args=['2000000000008']))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Product not found'})
+
+
+class InventoryListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=2, details=3, suppliers=1, categories=1, brands=1, details_per_transaction=3)
+
+    def test_rows_are_flat_with_the_joined_columns(self):
+        detail = ProductInTransactionDetail.objects.select_related(
+            'product__category', 'product__brand', 'transaction__supplier',
+        ).order_by('id').first()
+
+        row = self.client.get(reverse('inventory-list')).json()['results'][0]
+
+        self.assertEqual(row, {
+            'product_code': detail.product.product_code,
+            'name': detail.product.name,
+            'barcode': detail.product.barcode,
+            'category_name': detail.product.category.name,
+            'brand_name': detail.product.brand.name,
+            'supplier_name': detail.transaction.supplier.name,
+            'purchase_date': str(detail.transaction.purchase_date),
+            'stock_quantity': detail.quantity,
+            'manufacturing_date': str(detail.manufacturing_date),
+            'expiry_date': str(detail.expiry_date),
+        })
+        self.assertEqual(list(row), INVENTORY_FIELDS)
+
+
+class CodeSequenceTests(TestCase):
+
+    def test_blocks_are_contiguous_and_never_overlap(self):
+        first = CodeSequence.allocate(CodeSequence.PRODUCT_CODE, 3)
+        second = CodeSequence.allocate(CodeSequence.PRODUCT_CODE, 2)
+
+        self.assertEqual(list(first), [5001, 5002, 5003])
+        self.assertEqual(list(second), [5004, 5005])
+        self.assertEqual(CodeSequence.objects.get(name=CodeSequence.PRODUCT_CODE).last_value, 5005)
+
+    def test_codes_of_deleted_products_are_not_handed_out_again(self):
+        seed_store(products=2, details=0, suppliers=1, categories=1, brands=1)
+        barcodes = set(Product.objects.values_list('barcode', flat=True))
+        Product.objects.all().delete()
+
+        product = Product.objects.create(name='Replacement', category=Category.objects.get(), brand=Brand.objects.get())
+        self.assertEqual(product.product_code, 'P5003')
+        self.assertNotIn(product.barcode, barcodes)
+
+    def test_advance_only_moves_the_series_forward(self):
+        CodeSequence.allocate(CodeSequence.PRODUCT_CODE, 10)
+        CodeSequence.advance(CodeSequence.PRODUCT_CODE, 5003)
+        self.assertEqual(list(CodeSequence.allocate(CodeSequence.PRODUCT_CODE)), [5011])
+
+        CodeSequence.advance(CodeSequence.PRODUCT_CODE, 6000)
+        self.assertEqual(Product.allocate_product_codes(2), ['P6001', 'P6002'])
+
+
+class ProductSearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=3, details=0, suppliers=1, categories=1, brands=1)
+        cls.product = Product.objects.order_by('id').first()
+
+    def setUp(self):
+        product_search_index.invalidate()
+
+    def test_writes_from_any_process_reach_the_index(self):
+        self.assertEqual(product_search_index.search('zebra'), [])
+        # No signal fires for a queryset update, as for a write made in another process
+        Product.objects.filter(id=self.product.id).update(name='Zebra crackers')
+        bump_table_version(Product)
+
+        self.assertEqual([row['id'] for row in product_search_index.search('zebra cr')], [self.product.id])
+
+    def test_saves_and_deletes_in_this_process_are_patched_in_without_a_rebuild(self):
+        product_search_index.current()
+        other = Product.objects.order_by('id').last()
+        with mock.patch.object(product_search_index, 'rebuild') as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.name = 'Zebra crackers'
+                self.product.save()
+                other.delete()
+
+            self.assertEqual([row['id'] for row in product_search_index.search('zebra cr')], [self.product.id])
+            self.assertNotIn(other.id, product_search_index.current().products)
+            rebuild.assert_not_called()
+
+    def test_a_write_from_another_process_next_to_a_local_save_still_rebuilds(self):
+        product_search_index.current()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Zebra crackers'
+            self.product.save()
+        other = Product.objects.order_by('id').last()
+        Product.objects.filter(id=other.id).update(name='Zebra cakes')
+        bump_table_version(Product)
+
+        self.assertEqual(
+            {row['id'] for row in product_search_index.search('zebra')}, {self.product.id, other.id}
+        )
+
+    def test_searches_serve_the_previous_snapshot_while_another_thread_rebuilds(self):
+        snapshot = product_search_index.current()
+        bump_table_version(Product)
+        with product_search_index._rebuild_lock, self.assertNumQueries(1):
+            self.assertIs(product_search_index.current(), snapshot)
+        self.assertIsNot(product_search_index.current(), snapshot)
+
+
+class BulkReceiptTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=2, details=0, suppliers=1, categories=1, brands=1)
+        cls.product, cls.other = Product.objects.order_by('id')
+        cls.supplier = Supplier.objects.get()
+
+    def invoice(self, number, *lines):
+        today = date.today()
+        return {
+            'supplier': self.supplier.id, 'supplier_invoice_number': number, 'supplier_date': str(today),
+            'transaction_details': [
+                {'product': product_id, 'manufacturing_date': str(today), 'expiry_date': str(today + timedelta(days=90)),
+                 'quantity': quantity, 'total': '5.00'}
+                for product_id, quantity in lines
+            ],
+        }
+
+    def post(self, data):
+        return self.client.post(reverse('product-in-transaction-bulk-create'), data, content_type='application/json')
+
+    def stock(self):
+        return dict(TotalStock.objects.filter(product__in=[self.product, self.other]).values_list('product_id', 'total_quantity'))
+
+    def test_invoices_are_received_with_one_stock_change_per_product(self):
+        response = self.post([
+            self.invoice('BULK-1', (self.product.id, 4), (self.other.id, 2)),
+            self.invoice('BULK-2', (self.product.id, 6)),
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['details_count'], 3)
+        ids = [transaction['id'] for transaction in response.json()['transactions']]
+        self.assertEqual(
+            list(ProductInTransaction.objects.filter(id__in=ids).order_by('id').values_list('supplier_invoice_number', flat=True)),
+            ['BULK-1', 'BULK-2'],
+        )
+        self.assertEqual(
+            list(ProductInTransactionDetail.objects.filter(transaction_id__in=ids).values_list('remaining_quantity', flat=True)),
+            [4, 2, 6],
+        )
+        self.assertEqual(self.stock(), {self.product.id: 10, self.other.id: 2})
+        self.assertEqual(
+            sorted(StockLedger.objects.filter(reason=StockLedger.RECEIPT).values_list('product_id', 'quantity')),
+            [(self.product.id, 10), (self.other.id, 2)],
+        )
+
+    def test_an_empty_batch_is_rejected(self):
+        response = self.post([])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['This list may not be empty.']})
+
+    def test_an_unknown_product_rejects_the_whole_request(self):
+        response = self.post([
+            self.invoice('BULK-1', (self.product.id, 4)),
+            self.invoice('BULK-2', (self.other.id + 1000, 1)),
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'product': [f'Invalid pk "{self.other.id + 1000}" - object does not exist.']})
+        self.assertFalse(ProductInTransaction.objects.exists())
+        self.assertEqual(self.stock(), {})
+
+
+class ReceiptStockTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=2, details=0, suppliers=1, categories=1, brands=1)
+        cls.product, cls.other = Product.objects.order_by('id')
+        cls.supplier = Supplier.objects.get()
+
+    def receive(self, *lines):
+        today = date.today()
+        response = self.client.post(reverse('product-in-transaction-list-create'), {
+            'supplier': self.supplier.id, 'supplier_invoice_number': 'REC-1', 'supplier_date': str(today),
+            'purchase_date': str(today),
+            'transaction_details': [
+                {'product': product.id, 'manufacturing_date': str(today), 'expiry_date': str(today + timedelta(days=30)),
+                 'quantity': quantity, 'total': total}
+                for product, quantity, total in lines
+            ],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return ProductInTransaction.objects.get(id=response.json()['id'])
+
+    def stock(self, product):
+        return TotalStock.objects.filter(product=product).values_list('total_quantity', flat=True).first() or 0
+
+    def ledger(self, receipt):
+        return list(
+            StockLedger.objects.filter(reference=f'transaction:{receipt.id}')
+            .order_by('id').values_list('product_id', 'quantity', 'reason')
+        )
+
+    def test_reads_nest_the_detail_lines_with_product_and_supplier_names(self):
+        receipt = self.receive((self.product, 10, '20.00'), (self.other, 5, '10.00'))
+        today = date.today()
+
+        response = self.client.get(reverse('product-in-transaction-detail', args=[receipt.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'id': receipt.id, 'supplier': self.supplier.id, 'supplier_name': self.supplier.name,
+            'purchase_date': str(today), 'supplier_invoice_number': 'REC-1', 'supplier_date': str(today),
+            'remarks': receipt.remarks,
+            'transaction_details': [
+                {'id': detail.id, 'product': product.id, 'product_code': product.product_code, 'product_name': product.name,
+                 'manufacturing_date': str(today), 'expiry_date': str(today + timedelta(days=30)),
+                 'quantity': quantity, 'total': total}
+                for detail, (product, quantity, total) in zip(
+                    receipt.transaction_details.order_by('id'), ((self.product, 10, '20.00'), (self.other, 5, '10.00')),
+                )
+            ],
+        })
+        listed = self.client.get(reverse('product-in-transaction-list-create')).json()['results']
+        self.assertEqual(listed, [response.json()])
+
+    def test_rebuilt_expiry_summary_values_partly_sold_lots_like_the_sales_did(self):
+        self.receive((self.product, 3, '200.00'))
+        response = self.client.post(reverse('sale-create'), {
+            'branch': None, 'reference': 'POS-VALUE', 'lines': [{'product': self.product.id, 'quantity': 2}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        summary = list(StockExpirySummary.objects.values_list('quantity', 'value'))
+        self.assertEqual(summary, [(1, Decimal('66.67'))])
+
+        rebuild_expiry_summary()
+
+        self.assertEqual(list(StockExpirySummary.objects.values_list('quantity', 'value')), summary)
+
+    def test_update_moves_stock_by_the_changed_lines_only(self):
+        receipt = self.receive((self.product, 10, '20.00'))
+        detail = receipt.transaction_details.get()
+        today = date.today()
+
+        response = self.client.put(reverse('product-in-transaction-detail', args=[receipt.id]), {
+            'supplier': self.supplier.id, 'supplier_invoice_number': 'REC-1', 'supplier_date': str(today),
+            'purchase_date': str(today),
+            'transaction_details': [
+                {'id': detail.id, 'product': self.product.id, 'manufacturing_date': str(today),
+                 'expiry_date': str(detail.expiry_date), 'quantity': 7, 'total': '14.00'},
+                {'product': self.other.id, 'manufacturing_date': str(today),
+                 'expiry_date': str(detail.expiry_date), 'quantity': 4, 'total': '8.00'},
+            ],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(receipt.transaction_details.count(), 2)
+        self.assertEqual((self.stock(self.product), self.stock(self.other)), (7, 4))
+        self.assertEqual(self.ledger(receipt), [
+            (self.product.id, 10, StockLedger.RECEIPT),
+            (self.product.id, -3, StockLedger.RECEIPT_ADJUSTMENT),
+            (self.other.id, 4, StockLedger.RECEIPT_ADJUSTMENT),
+        ])
+        self.assertEqual(verify_total_stock(), {})
+        self.assertEqual(
+            sorted(StockExpirySummary.objects.values_list('product_id', 'quantity', 'value')),
+            [(self.product.id, 7, Decimal('14.00')), (self.other.id, 4, Decimal('8.00'))],
+        )
+
+    def test_update_rejects_a_detail_of_another_transaction(self):
+        receipt = self.receive((self.product, 10, '20.00'))
+        foreign = self.receive((self.other, 5, '10.00')).transaction_details.get()
+        today = date.today()
+
+        response = self.client.put(reverse('product-in-transaction-detail', args=[receipt.id]), {
+            'supplier': self.supplier.id, 'supplier_invoice_number': 'REC-1', 'supplier_date': str(today),
+            'transaction_details': [
+                {'id': foreign.id, 'product': self.other.id, 'manufacturing_date': str(today),
+                 'expiry_date': str(today), 'quantity': 1, 'total': '1.00'},
+            ],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((self.stock(self.product), self.stock(self.other)), (10, 5))
+
+    def test_delete_reverses_the_receipt(self):
+        receipt = self.receive((self.product, 10, '20.00'), (self.other, 5, '10.00'))
+
+        response = self.client.delete(reverse('product-in-transaction-detail', args=[receipt.id]))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual((self.stock(self.product), self.stock(self.other)), (0, 0))
+        self.assertEqual(sorted(StockLedger.objects.filter(reason=StockLedger.RECEIPT_REVERSAL).values_list('product_id', 'quantity')), [
+            (self.product.id, -10), (self.other.id, -5),
+        ])
+        self.assertFalse(StockExpirySummary.objects.exists())
+
+    def test_delete_is_refused_once_lots_are_allocated(self):
+        receipt = self.receive((self.product, 10, '20.00'))
+        allocate_lots(self.product.id, 2)
+
+        response = self.client.delete(reverse('product-in-transaction-detail', args=[receipt.id]))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['details'], [receipt.transaction_details.get().id])
+        self.assertTrue(ProductInTransaction.objects.filter(id=receipt.id).exists())
+        # The allocation took its units out of stock; the refused delete changes nothing more
+        self.assertEqual(self.stock(self.product), 8)
+
+    def test_delete_is_refused_when_the_units_left_central_stock(self):
+        receipt = self.receive((self.product, 10, '20.00'))
+        branch = Branch.objects.order_by('branch_code').first()
+        transfer_stock(None, branch.branch_code, {self.product.id: 4})
+
+        response = self.client.delete(reverse('product-in-transaction-detail', args=[receipt.id]))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['available'], {str(self.product.id): 6})
+        self.assertEqual(self.stock(self.product), 10)
+        self.assertEqual(verify_total_stock(), {})
+
+    def test_rebuild_overwrites_drifted_totals_with_the_ledger_sums(self):
+        self.receive((self.product, 10, '20.00'), (self.other, 5, '10.00'))
+        TotalStock.objects.filter(product=self.product).update(total_quantity=3)
+        TotalStock.objects.filter(product=self.other).delete()
+        self.assertEqual(verify_total_stock(), {self.product.id: (3, 10), self.other.id: (0, 5)})
+
+        self.assertEqual(rebuild_total_stock(), {self.product.id: (3, 10), self.other.id: (0, 5)})
+
+        self.assertEqual((self.stock(self.product), self.stock(self.other)), (10, 5))
+        self.assertEqual(verify_total_stock(), {})
+
+
+class StockTransferTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=12, details=60, suppliers=1, categories=1, brands=1, details_per_transaction=6)
+        cls.branch, cls.other_branch = Branch.objects.order_by('branch_code')[:2]
+
+    def test_transfer_moves_stock_between_branches_and_central(self):
+        stock = TotalStock.objects.filter(total_quantity__gt=0).first()
+        central = stock.total_quantity
+        # Start with everything in central stock
+        BranchStock.objects.filter(product_id=stock.product_id).delete()
+        TotalStock.objects.filter(id=stock.id).update(branch_quantity=0)
+
+        transfer_stock(None, self.branch.branch_code, {stock.product_id: central})
+        transfer_stock(self.branch.branch_code, self.other_branch.branch_code, {stock.product_id: 1})
+
+        quantities = dict(BranchStock.objects.filter(product_id=stock.product_id).values_list('branch_id', 'quantity'))
+        self.assertEqual(quantities, {self.branch.branch_code: central - 1, self.other_branch.branch_code: 1})
+        stock.refresh_from_db()
+        self.assertEqual(stock.branch_quantity, stock.total_quantity)
+
+    def test_short_line_rolls_back_the_whole_transfer(self):
+        rows = list(BranchStock.objects.filter(branch=self.branch).order_by('product_id')[:2])
+        request = {rows[0].product_id: 1, rows[1].product_id: rows[1].quantity + 1}
+
+        with self.assertRaises(InsufficientStock) as raised:
+            transfer_stock(self.branch.branch_code, None, request)
+        self.assertEqual(raised.exception.shortages, {rows[1].product_id: rows[1].quantity})
+        self.assertEqual(BranchStock.objects.get(id=rows[0].id).quantity, rows[0].quantity)
+        self.assertFalse(StockTransfer.objects.filter(from_branch=self.branch).exists())
+
+
+
+class LotAllocationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=1, details=0, suppliers=1, categories=1, brands=1)
+        cls.product = Product.objects.get()
+        receipt = ProductInTransaction.objects.create(
+            supplier=Supplier.objects.get(), supplier_invoice_number='FEFO', supplier_date=date.today(),
+        )
+        today = date.today()
+        # Lots in insertion order: later expiry, expired, earliest open expiry, same expiry as the first
+        cls.lots = [
+            ProductInTransactionDetail.objects.create(
+                transaction=receipt, product=cls.product, manufacturing_date=today - timedelta(days=100),
+                expiry_date=today + timedelta(days=days), quantity=quantity, total=Decimal('10.00'),
+            )
+            for days, quantity in ((60, 5), (-1, 50), (10, 3), (60, 4))
+        ]
+        apply_stock_deltas({cls.product.id: 62}, StockLedger.OPENING_BALANCE)
+        rebuild_expiry_summary()
+
+    def remaining(self):
+        return [ProductInTransactionDetail.objects.get(id=lot.id).remaining_quantity for lot in self.lots]
+
+    @mock.patch('store.lots.FEFO_SCAN_SIZE', 1)
+    def test_allocates_first_expiry_first_and_skips_expired_lots(self):
+        picks = allocate_lots(self.product.id, 10, reference='sale:1')
+
+        self.assertEqual([(lot_id, units) for lot_id, expiry_date, units in picks], [
+            (self.lots[2].id, 3), (self.lots[0].id, 5), (self.lots[3].id, 2),
+        ])
+        self.assertEqual(self.remaining(), [0, 50, 0, 2])
+        self.assertEqual(LotAllocation.objects.filter(reference='sale:1').count(), 3)
+
+    def test_insufficient_open_lots_change_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            allocate_lots(self.product.id, 13)
+        self.assertEqual(raised.exception.shortages, {self.product.id: 12})
+        self.assertEqual(self.remaining(), [5, 50, 3, 4])
+
+        allocate_lots(self.product.id, 13, include_expired=True)
+        self.assertEqual(self.remaining(), [5, 37, 3, 4])
+
+    def test_allocations_and_sales_keep_stock_lots_and_summary_in_agreement(self):
+        allocate_lots(self.product.id, 4, reference='order:7')
+        response = self.client.post(reverse('sale-create'), {
+            'branch': None, 'reference': 'POS-9', 'lines': [{'product': self.product.id, 'quantity': 6}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.remaining(), [0, 50, 0, 2])
+        self.assertEqual(TotalStock.objects.get(product=self.product).total_quantity, 52)
+        self.assertEqual(verify_total_stock(), {})
+        self.assertEqual(
+            list(StockLedger.objects.filter(reference='order:7').values_list('quantity', 'reason')),
+            [(-4, StockLedger.ALLOCATION)],
+        )
+        summary = sorted(StockExpirySummary.objects.values_list('expiry_date', 'quantity', 'value'))
+        self.assertEqual(sum(quantity for expiry_date, quantity, value in summary), 52)
+        rebuild_expiry_summary()
+        self.assertEqual(sorted(StockExpirySummary.objects.values_list('expiry_date', 'quantity', 'value')), summary)
+
+    def test_allocation_is_refused_when_central_stock_is_short(self):
+        TotalStock.objects.filter(product=self.product).update(branch_quantity=60)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            allocate_lots(self.product.id, 3)
+        self.assertEqual(raised.exception.shortages, {self.product.id: 2})
+        self.assertEqual(self.remaining(), [5, 50, 3, 4])
+        self.assertFalse(LotAllocation.objects.exists())
+
+    def test_losing_every_retry_is_reported_as_contention_not_as_empty_stock(self):
+        # Every guarded update loses, as if another checkout emptied the picked lots first
+        with mock.patch('store.lots._take_lots', return_value=False), self.assertRaises(LotContention):
+            allocate_lots(self.product.id, 3)
+        self.assertEqual(self.remaining(), [5, 50, 3, 4])
+
+
+class SaleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=12, details=60, suppliers=1, categories=1, brands=1, details_per_transaction=6)
+        cls.stock = BranchStock.objects.filter(quantity__gte=2).order_by('id').first()
+
+    def sale(self, quantity, reference):
+        return {'branch': self.stock.branch_id, 'reference': reference, 'lines': {self.stock.product_id: quantity}}
+
+    def test_batch_rejects_only_the_sales_that_would_oversell(self):
+        total = TotalStock.objects.get(product_id=self.stock.product_id)
+        results = record_sales([
+            self.sale(self.stock.quantity - 1, 'POS-1'), self.sale(2, 'POS-2'), self.sale(1, 'POS-3'),
+        ])
+
+        self.assertEqual([result['status'] for result in results], ['accepted', 'rejected', 'accepted'])
+        self.assertEqual(results[1]['products'], [self.stock.product_id])
+        self.assertEqual(BranchStock.objects.get(id=self.stock.id).quantity, 0)
+        self.assertEqual(
+            TotalStock.objects.filter(id=total.id).values_list('total_quantity', flat=True).get(),
+            total.total_quantity - self.stock.quantity,
+        )
+        self.assertEqual(verify_total_stock([self.stock.product_id]), {})
+
+    def test_sales_take_units_from_the_lots_and_the_expiry_summary(self):
+        product = Product.objects.create(name='FEFO sale', category=Category.objects.first(), brand=Brand.objects.first())
+        today = date.today()
+        self.client.post(reverse('product-in-transaction-bulk-create'), {
+            'supplier': Supplier.objects.first().id, 'supplier_invoice_number': 'FEFO-SALE', 'supplier_date': str(today),
+            'transaction_details': [
+                {'product': product.id, 'manufacturing_date': str(today), 'expiry_date': str(today + timedelta(days=days)),
+                 'quantity': quantity, 'total': total}
+                for days, quantity, total in ((3, 5, '10.00'), (20, 7, '14.00'))
+            ],
+        }, content_type='application/json')
+
+        def sell(quantity):
+            response = self.client.post(reverse('sale-create'), {
+                'branch': None, 'reference': 'POS-FEFO', 'lines': [{'product': product.id, 'quantity': quantity}],
+            }, content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+
+        def summary():
+            rows = self.client.get(reverse('stock-summary') + '?page_size=200').json()['results']
+            return [row for row in rows if row['product_id'] == product.id]
+
+        def lots():
+            return list(ProductInTransactionDetail.objects.filter(product=product).order_by('id').values_list('remaining_quantity', flat=True))
+
+        sell(6)
+        self.assertEqual(lots(), [0, 6])
+        [row] = summary()
+        self.assertEqual((row['quantity'], Decimal(row['value']), row['expiring_7_days'], row['expiring_30_days']), (6, Decimal('12.00'), 0, 6))
+        stored = list(StockExpirySummary.objects.filter(product=product).values_list('expiry_date', 'quantity', 'value'))
+        rebuild_expiry_summary()
+        self.assertEqual(list(StockExpirySummary.objects.filter(product=product).values_list('expiry_date', 'quantity', 'value')), stored)
+
+        sell(6)
+        self.assertEqual(lots(), [0, 0])
+        self.assertEqual(summary(), [])
+        self.assertEqual(LotAllocation.objects.filter(lot__product=product).count(), 3)
+
+    @override_settings(STORE_SALE_FLUSH_MS=1000, STORE_SALE_BATCH_SIZE=3)
+    def test_concurrent_submissions_are_recorded_together(self):
+        batches = []
+
+        def record(sales):
+            batches.append(sales)
+            return [{'status': 'accepted', 'id': number} for number, sale in enumerate(sales)]
+
+        batcher = SaleBatcher()
+        with mock.patch('store.sales.record_sales', side_effect=record):
+            threads = [
+                threading.Thread(target=batcher.submit, args=([self.sale(1, f'POS-{number}')],)) for number in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=5)
+
+        self.assertEqual([len(batch) for batch in batches], [3])
+
+
+class StockSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=1, details=0, suppliers=1, categories=1, brands=1)
+        cls.product = Product.objects.get()
+        today = date.today()
+        Client().post(reverse('product-in-transaction-bulk-create'), {
+            'supplier': Supplier.objects.get().id, 'supplier_invoice_number': 'SUMMARY', 'supplier_date': str(today),
+            'transaction_details': [
+                {'product': cls.product.id, 'manufacturing_date': str(today - timedelta(days=30)),
+                 'expiry_date': str(today + timedelta(days=days)), 'quantity': quantity, 'total': total}
+                for days, quantity, total in ((-2, 1, '1.00'), (3, 2, '4.00'), (20, 4, '8.00'), (60, 8, '16.00'), (200, 16, '32.00'))
+            ],
+        }, content_type='application/json')
+
+    def test_buckets_count_the_units_expiring_within_each_window(self):
+        [row] = self.client.get(reverse('stock-summary')).json()['results']
+
+        self.assertEqual(row, {
+            'product_id': self.product.id,
+            'product_code': self.product.product_code,
+            'name': self.product.name,
+            'quantity': 31,
+            'value': '61.00',
+            'earliest_expiry': str(date.today() - timedelta(days=2)),
+            'expired': 1,
+            'expiring_7_days': 2,
+            'expiring_30_days': 6,
+            'expiring_90_days': 14,
+        })
+
+    def test_buckets_move_at_local_midnight(self):
+        StockExpirySummary.objects.create(product=self.product, expiry_date=date(2026, 3, 1), quantity=1, value=1)
+        # 20:00 UTC on 1 March is already 2 March in Asia/Kolkata
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2026, 3, 1, 20, tzinfo=dt_timezone.utc)):
+            totals = self.client.get(reverse('stock-summary-totals')).json()
+
+        self.assertEqual(totals['expired'], 1)
+
+    def test_totals_add_up_the_product_rows(self):
+        totals = self.client.get(reverse('stock-summary-totals')).json()
+
+        self.assertEqual(
+            {key: totals[key] for key in ('quantity', 'expired', 'expiring_7_days', 'expiring_30_days', 'expiring_90_days')},
+            {'quantity': 31, 'expired': 1, 'expiring_7_days': 2, 'expiring_30_days': 6, 'expiring_90_days': 14},
+        )
+        self.assertEqual(Decimal(str(totals['value'])), Decimal('61.00'))
+
+
+class JobTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(STORE_TASK_MODE='eager', MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=3, details=6, suppliers=1, categories=1, brands=1, details_per_transaction=3)
+
+    def run_job(self, url, data=None):
+        response = self.client.post(url, data, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status_url'], 'http://testserver' + reverse('job-status', args=[response.json()['job_id']]))
+        return self.client.get(response.json()['status_url']).json()
+
+    def test_export_job_writes_the_same_file_as_the_streamed_export(self):
+        job = self.run_job(reverse('job-inventory-export', args=['csv']))
+
+        self.assertEqual((job['status'], job['error']), ('SUCCESS', None))
+        response = self.client.get(job['result_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="inventory.csv"')
+        streamed = self.client.get(reverse('inventory-export', args=['csv']))
+        self.assertEqual(b''.join(response.streaming_content), b''.join(streamed.streaming_content))
+
+    def test_stock_rebuild_job_reports_the_corrected_products(self):
+        stock = TotalStock.objects.order_by('product_id').first()
+        TotalStock.objects.filter(id=stock.id).update(total_quantity=stock.total_quantity + 7)
+
+        job = self.run_job(reverse('job-stock-rebuild'))
+
+        self.assertEqual(job['status'], 'SUCCESS')
+        self.assertEqual(job['result'], {'corrected_products': [stock.product_id]})
+        self.assertNotIn('result_url', job)
+        self.assertEqual(self.client.get(reverse('job-result', args=[job['id']])).json(), job['result'])
+        self.assertEqual(verify_total_stock(), {})
+
+    def test_failed_job_reports_its_error(self):
+        with mock.patch('store.tasks.rebuild_total_stock', side_effect=RuntimeError('ledger unavailable')):
+            job = self.run_job(reverse('job-stock-rebuild'))
+
+        self.assertEqual((job['status'], job['error']), ('FAILURE', 'ledger unavailable'))
+        response = self.client.get(reverse('job-result', args=[job['id']]))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'status': 'FAILURE', 'error': 'ledger unavailable'})
+
+    def test_empty_bulk_receipt_job_reports_the_error(self):
+        job = self.run_job(reverse('job-product-in-transaction-bulk'), [])
+
+        self.assertEqual(job['status'], 'SUCCESS')
+        self.assertEqual(job['result'], {'errors': {'non_field_errors': ['This list may not be empty.']}})
+
+    def test_unknown_job_is_a_404(self):
+        self.assertEqual(self.client.get(reverse('job-status', args=['missing'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('job-result', args=['missing'])).status_code, 404)
+
+
+class LabelTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(STORE_TASK_MODE='eager', MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=2, details=0, suppliers=1, categories=1, brands=1)
+        cls.products = list(Product.objects.order_by('id'))
+
+    def test_barcode_images_are_rendered_once_and_validated_by_etag(self):
+        url = reverse('barcode-image', args=[self.products[0].barcode, 'png'])
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/png'))
+        etag = response['ETag']
+
+        with mock.patch('store.labels.barcode.get_barcode_class') as get_barcode_class:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        get_barcode_class.assert_not_called()
+
+    def post_sheet(self, product_ids, copies):
+        return self.client.post(
+            reverse('barcode-label-sheet'), {'products': product_ids, 'copies': copies}, content_type='application/json',
+        )
+
+    @override_settings(STORE_LABEL_SHEET_SYNC_LABELS=2, STORE_LABEL_SHEET_MAX_LABELS=4)
+    def test_large_sheets_are_rendered_by_a_job_and_oversized_ones_refused(self):
+        product_ids = [product.id for product in self.products]
+
+        response = self.post_sheet(product_ids[:1], 2)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/pdf'))
+
+        response = self.post_sheet(product_ids, 2)
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(reverse('job-status', args=[response.json()['job_id']])).json()
+        self.assertEqual(job['status'], 'SUCCESS')
+        self.assertEqual(self.client.get(job['result_url'])['Content-Type'], 'application/pdf')
+
+        response = self.post_sheet(product_ids, 3)
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductImportTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(STORE_TASK_MODE='eager', MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_store(products=2, details=0, suppliers=1, categories=1, brands=1)
+        cls.existing = Product.objects.order_by('id').first()
+
+    def run_import(self, content):
+        upload = SimpleUploadedFile('products.csv', content.encode(), content_type='text/csv')
+        response = self.client.post(reverse('job-product-import'), {'file': upload})
+        self.assertEqual(response.status_code, 202)
+        return self.client.get(reverse('job-status', args=[response.json()['job_id']])).json()
+
+    def test_import_creates_updates_and_reports_rejected_rows(self):
+        job = self.run_import(
+            'product_code,name,unit_type,category,brand,barcode\n'
+            f'{self.existing.product_code},Renamed,,Dairy,Amul,\n'
+            ',Fresh milk,litres,Dairy,Amul,\n'
+            ',No category,,,Amul,\n'
+        )
+
+        self.assertEqual(job['status'], 'SUCCESS')
+        self.assertEqual(
+            {key: job['result'][key] for key in ('rows', 'created', 'updated', 'errors')},
+            {'rows': 3, 'created': 1, 'updated': 1, 'errors': 1},
+        )
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.category.name), ('Renamed', 'Dairy'))
+        self.assertTrue(Product.objects.filter(name='Fresh milk', unit_type='litres').exists())
+
+        report = b''.join(self.client.get(job['result_url']).streaming_content).decode()
+        self.assertEqual(report.splitlines(), ['line,product_code,name,error', '4,,No category,category is required'])
+
+    def test_imported_codes_are_never_allocated_again(self):
+        self.run_import(
+            'product_code,name,unit_type,category,brand,barcode\n'
+            'P90000,Imported,,Dairy,Amul,2000000900005\n'
+        )
+
+        product = Product.objects.create(name='Next', category=Category.objects.first(), brand=Brand.objects.first())
+        self.assertEqual(product.product_code, 'P90001')
+        self.assertEqual(product.barcode, ean13('200000090001'))
+
+
+class DatabaseTuningTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_new_sqlite_connections_get_the_configured_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite pragmas')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -64000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    @mock.patch('store.db.replica_alias', return_value='replica')
+    def test_only_opted_in_reads_outside_transactions_go_to_the_replica(self, replica_alias):
+        router = ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Product), 'replica')
+            self.assertEqual(router.db_for_write(Product), 'default')
+            with transaction.atomic():
+                self.assertIsNone(router.db_for_read(Product))
+        self.assertFalse(router.allow_migrate('replica', 'store'))
 
-# Create your tests here.